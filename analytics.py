@@ -0,0 +1,406 @@
+"""
+Report aggregations for the attendance tracking system.
+
+Each aggregation runs on one of two engines, chosen per call (default:
+config.ANALYTICS_ENGINE):
+
+- "sqlite": GROUP BY in the application database (SQLite, or PostgreSQL
+  with DB_BACKEND=postgres) for the live rows, plus a pyarrow group-by over
+  the Parquet archive (see archive.py), combined in pandas.
+- "duckdb": one in-process DuckDB query over the SQLite file (attached
+  with DuckDB's sqlite extension) and the Parquet archive. If the sqlite
+  extension cannot be loaded, or the database is PostgreSQL, the live rows
+  are handed to DuckDB as Arrow tables instead.
+
+Both engines return the same pandas DataFrames, sorted by their key columns.
+Results are cached per data version (see cache.py).
+
+daily_by_status() can count by week, month or year instead of by day; the
+date is truncated to the first day of its bucket inside the GROUP BY (and
+in the archive's group-by), so long ranges return one row per bucket.
+"""
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import config
+import metrics
+import archive
+import cache
+import database
+import storage
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+ENGINES = ("sqlite", "duckdb")
+
+# Key columns by name: (SQL expression on attendance a JOIN users u, archive column, output label)
+_KEYS = {
+    "date": ("a.date", "date", "Date"),
+    "status": ("a.status", "status", "Status"),
+    "department": ("u.department", "department", "Department"),
+}
+
+BUCKETS = ("day", "week", "month", "year")
+
+# Expression truncating a date to the first day of its bucket (weeks start on Monday), per dialect
+_BUCKET_SQL = {
+    "sqlite": {
+        "week": "date({column}, 'weekday 0', '-6 days')",
+        "month": "date({column}, 'start of month')",
+        "year": "date({column}, 'start of year')",
+    },
+    # Dates are TEXT on PostgreSQL; the bucket is formatted back to the same YYYY-MM-DD text
+    "postgres": {bucket: f"to_char(date_trunc('{bucket}', {{column}}::date), 'YYYY-MM-DD')"
+                 for bucket in ("week", "month", "year")},
+    "duckdb": {bucket: f"CAST(CAST(date_trunc('{bucket}', CAST({{column}} AS DATE)) AS DATE) AS VARCHAR)"
+               for bucket in ("week", "month", "year")},
+}
+
+_SUMMARY_COLUMNS = {
+    "user_id": "User ID",
+    "name": "Name",
+    "department": "Department",
+    "days": "Days",
+    "present": "Present",
+    "late": "Late",
+    "half_day": "Half Day",
+    "first_date": "First Date",
+    "last_date": "Last Date",
+}
+
+def _resolve_engine(engine):
+    engine = engine or config.ANALYTICS_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown analytics engine: {engine}")
+    if engine == "duckdb" and duckdb is None:
+        raise ValueError("The duckdb analytics engine requires the duckdb package")
+    return engine
+
+def _filters(start_date, end_date, department, date_column="a.date", department_column="u.department"):
+    """Build a WHERE clause and its parameters for the common report filters."""
+    clauses = []
+    params = []
+    if start_date:
+        clauses.append(f"{date_column} >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append(f"{date_column} <= ?")
+        params.append(end_date)
+    if department:
+        clauses.append(f"{department_column} = ?")
+        params.append(department)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _key_expressions(keys, dialect, bucket, alias=True):
+    """Return the SQL expressions of the key columns, with the date truncated to its bucket."""
+    expressions = []
+    for key in keys:
+        column = _KEYS[key][0] if alias else _KEYS[key][1]
+        if key == "date" and bucket != "day":
+            column = _BUCKET_SQL[dialect][bucket].format(column=column)
+        expressions.append(f"{column} AS {key}")
+    return ", ".join(expressions)
+
+def _bucket_dates(dates, bucket):
+    """Truncate an Arrow array of YYYY-MM-DD strings to the first day of their bucket."""
+    if bucket == "day":
+        return dates
+    timestamps = pc.strptime(dates, format="%Y-%m-%d", unit="s")
+    return pc.strftime(pc.floor_temporal(timestamps, unit=bucket, week_starts_monday=True), format="%Y-%m-%d")
+
+def _finish(frame, keys):
+    """Label, type and sort an aggregated frame the same way for both engines."""
+    labels = [_KEYS[key][2] for key in keys]
+    frame = frame.rename(columns={key: _KEYS[key][2] for key in keys})[labels + ["Count"]]
+    frame["Count"] = frame["Count"].astype("int64")
+    if "Date" in labels:
+        frame["Date"] = pd.to_datetime(frame["Date"])
+    return frame.sort_values(labels).reset_index(drop=True)
+
+def _read_frame(conn, query, params):
+    """Run a query and return its result as a DataFrame."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(query, params)
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+
+# SQLite engine
+
+def _sqlite_count(keys, start_date, end_date, department, bucket="day"):
+    where, params = _filters(start_date, end_date, department)
+    expressions = _key_expressions(keys, storage.get_backend().name, bucket)
+    conn = storage.get_backend().connect()
+    try:
+        hot = _read_frame(
+            conn,
+            f"""
+            SELECT {expressions}, COUNT(*) AS Count
+            FROM attendance a
+            JOIN users u ON a.user_id = u.id
+            {where}
+            GROUP BY {", ".join(str(position) for position in range(1, len(keys) + 1))}
+            """,
+            params
+        )
+    finally:
+        conn.close()
+
+    cold = archive.read(start_date, end_date, department, columns=[_KEYS[key][1] for key in keys])
+    if cold.num_rows:
+        if "date" in keys:
+            cold = cold.set_column(cold.schema.get_field_index("date"), "date", _bucket_dates(cold["date"], bucket))
+        cold = cold.group_by(list(keys)).aggregate([([], "count_all")]).to_pandas()
+        cold = cold.rename(columns={"count_all": "Count"})
+        hot = pd.concat([hot, cold]).groupby(list(keys), as_index=False, dropna=False)["Count"].sum()
+    return hot
+
+def _sqlite_intern_summaries(start_date, end_date, department):
+    where, params = _filters(start_date, end_date, department)
+    conn = storage.get_backend().connect()
+    try:
+        hot = _read_frame(
+            conn,
+            f"""
+            SELECT a.user_id,
+                   COUNT(*) AS days,
+                   COUNT(*) FILTER (WHERE a.status = ?) AS present,
+                   COUNT(*) FILTER (WHERE a.status = ?) AS late,
+                   COUNT(*) FILTER (WHERE a.status = ?) AS half_day,
+                   MIN(a.date) AS first_date,
+                   MAX(a.date) AS last_date
+            FROM attendance a
+            JOIN users u ON a.user_id = u.id
+            {where}
+            GROUP BY a.user_id
+            """,
+            [config.STATUS_PRESENT, config.STATUS_LATE, config.STATUS_HALF_DAY] + params
+        )
+        users = _read_frame(conn, "SELECT id AS user_id, name, department FROM users", [])
+    finally:
+        conn.close()
+
+    cold = archive.read(start_date, end_date, department, columns=["user_id", "date", "status"])
+    if cold.num_rows:
+        cold = cold.append_column("present", pc.cast(pc.equal(cold["status"], config.STATUS_PRESENT), pa.int64()))
+        cold = cold.append_column("late", pc.cast(pc.equal(cold["status"], config.STATUS_LATE), pa.int64()))
+        cold = cold.append_column("half_day", pc.cast(pc.equal(cold["status"], config.STATUS_HALF_DAY), pa.int64()))
+        cold = cold.group_by("user_id").aggregate([
+            ([], "count_all"), ("present", "sum"), ("late", "sum"), ("half_day", "sum"),
+            ("date", "min"), ("date", "max"),
+        ]).to_pandas()
+        cold.columns = [{"count_all": "days", "present_sum": "present", "late_sum": "late",
+                         "half_day_sum": "half_day", "date_min": "first_date",
+                         "date_max": "last_date"}.get(column, column) for column in cold.columns]
+        hot = pd.concat([hot, cold]).groupby("user_id", as_index=False).agg(
+            days=("days", "sum"), present=("present", "sum"), late=("late", "sum"),
+            half_day=("half_day", "sum"), first_date=("first_date", "min"), last_date=("last_date", "max"))
+    return hot.merge(users, on="user_id", how="left")
+
+# DuckDB engine
+
+_sqlite_extension_available = None
+
+def _quote(value):
+    """Escape a string for use inside a single-quoted SQL literal."""
+    return value.replace("'", "''")
+
+def _duckdb_connection(start_date, end_date, department):
+    """
+    Open an in-memory DuckDB connection with an attendance_rows view over
+    the live SQLite rows and the Parquet archive, and a users view.
+
+    Without the sqlite extension (or on PostgreSQL), only the live rows
+    matching the report filters are copied over (as Arrow), using the
+    database's indexes.
+    """
+    global _sqlite_extension_available
+
+    con = duckdb.connect()
+    if storage.get_backend().name != "sqlite":
+        _sqlite_extension_available = False
+    if _sqlite_extension_available is not False:
+        try:
+            con.execute("LOAD sqlite")
+            con.execute(f"ATTACH '{_quote(config.DB_PATH)}' AS live (TYPE sqlite, READ_ONLY)")
+            _sqlite_extension_available = True
+        except duckdb.Error:
+            _sqlite_extension_available = False
+
+    if _sqlite_extension_available:
+        live_rows = """
+        SELECT a.user_id, a.date, a.status, u.department
+        FROM live.attendance a
+        JOIN live.users u ON a.user_id = u.id
+        """
+        live_users = "live.users"
+    else:
+        where, params = _filters(start_date, end_date, department)
+        conn = storage.get_backend().connect()
+        try:
+            for name, query, query_params in (
+                ("live_rows", f"""
+                    SELECT a.user_id, a.date, a.status, u.department
+                    FROM attendance a
+                    JOIN users u ON a.user_id = u.id
+                    {where}
+                 """, params),
+                ("live_users", "SELECT id, name, department FROM users", []),
+            ):
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                cursor.execute(query, query_params)
+                names = [column[0] for column in cursor.description]
+                columns = list(zip(*cursor.fetchall())) or [()] * len(names)
+                types = {"user_id": pa.int64(), "id": pa.int64()}
+                con.register(name, pa.table({
+                    column: pa.array(values, type=types.get(column, pa.string()))
+                    for column, values in zip(names, columns)
+                }))
+        finally:
+            conn.close()
+        live_rows = "SELECT * FROM live_rows"
+        live_users = "live_users"
+
+    query = f"""
+    CREATE VIEW attendance_rows AS
+    SELECT CAST(user_id AS BIGINT) AS user_id, CAST(date AS VARCHAR) AS date,
+           CAST(status AS VARCHAR) AS status, CAST(department AS VARCHAR) AS department
+    FROM ({live_rows})
+    """
+    if os.path.isdir(config.ARCHIVE_DIR) and any(
+            name.endswith(".parquet") for _, _, names in os.walk(config.ARCHIVE_DIR) for name in names):
+        pattern = _quote(os.path.join(config.ARCHIVE_DIR, "*", "*", "*.parquet"))
+        query += f"""
+        UNION ALL
+        SELECT user_id, date, status, department
+        FROM read_parquet('{pattern}', hive_partitioning = true)
+        """
+    con.execute(query)
+    con.execute(f"CREATE VIEW users AS SELECT CAST(id AS BIGINT) AS user_id, name, department FROM {live_users}")
+    return con
+
+def _duckdb_count(keys, start_date, end_date, department, bucket="day"):
+    where, params = _filters(start_date, end_date, department, "date", "department")
+    con = _duckdb_connection(start_date, end_date, department)
+    try:
+        return con.execute(
+            f"""
+            SELECT {_key_expressions(keys, "duckdb", bucket, alias=False)}, COUNT(*) AS Count
+            FROM attendance_rows
+            {where}
+            GROUP BY {", ".join(str(position) for position in range(1, len(keys) + 1))}
+            """,
+            params
+        ).df()
+    finally:
+        con.close()
+
+def _duckdb_intern_summaries(start_date, end_date, department):
+    where, params = _filters(start_date, end_date, department, "date", "department")
+    con = _duckdb_connection(start_date, end_date, department)
+    try:
+        return con.execute(
+            f"""
+            SELECT s.*, u.name, u.department
+            FROM (
+                SELECT user_id,
+                       COUNT(*) AS days,
+                       COUNT(*) FILTER (WHERE status = ?) AS present,
+                       COUNT(*) FILTER (WHERE status = ?) AS late,
+                       COUNT(*) FILTER (WHERE status = ?) AS half_day,
+                       MIN(date) AS first_date,
+                       MAX(date) AS last_date
+                FROM attendance_rows
+                {where}
+                GROUP BY user_id
+            ) s
+            LEFT JOIN users u ON s.user_id = u.user_id
+            """,
+            [config.STATUS_PRESENT, config.STATUS_LATE, config.STATUS_HALF_DAY] + params
+        ).df()
+    finally:
+        con.close()
+
+# Report aggregations
+
+def _count(keys, start_date, end_date, department, engine, bucket="day"):
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown time bucket: {bucket}")
+    if _resolve_engine(engine) == "duckdb":
+        frame = _duckdb_count(keys, start_date, end_date, department, bucket)
+    else:
+        frame = _sqlite_count(keys, start_date, end_date, department, bucket)
+    return _finish(frame, keys)
+
+@metrics.timed()
+@cache.cached(database.get_data_version)
+def status_distribution(start_date=None, end_date=None, department=None, engine=None):
+    """
+    Count attendance records by status.
+
+    Args:
+        start_date: Optional inclusive lower bound (YYYY-MM-DD)
+        end_date: Optional inclusive upper bound (YYYY-MM-DD)
+        department: Optional department name filter
+        engine: Optional engine, "sqlite" or "duckdb" (default: config.ANALYTICS_ENGINE)
+
+    Returns:
+        pandas.DataFrame: Status and Count columns
+    """
+    return _count(("status",), start_date, end_date, department, engine)
+
+@metrics.timed()
+@cache.cached(database.get_data_version)
+def daily_by_status(start_date=None, end_date=None, department=None, engine=None, bucket="day"):
+    """
+    Count attendance records by date and status.
+
+    Args: see status_distribution(), plus
+        bucket: "day", "week", "month" or "year"; each Date is then the first day of its bucket
+
+    Returns:
+        pandas.DataFrame: Date, Status and Count columns
+    """
+    return _count(("date", "status"), start_date, end_date, department, engine, bucket)
+
+@metrics.timed()
+@cache.cached(database.get_data_version)
+def department_by_status(start_date=None, end_date=None, department=None, engine=None):
+    """
+    Count attendance records by department and status.
+
+    Args: see status_distribution()
+
+    Returns:
+        pandas.DataFrame: Department, Status and Count columns
+    """
+    return _count(("department", "status"), start_date, end_date, department, engine)
+
+@metrics.timed()
+@cache.cached(database.get_data_version)
+def intern_summaries(start_date=None, end_date=None, department=None, engine=None):
+    """
+    Summarize each intern's attendance records.
+
+    Args: see status_distribution()
+
+    Returns:
+        pandas.DataFrame: One row per intern with recorded days, status
+        counts and first/last dates, sorted by name
+    """
+    if _resolve_engine(engine) == "duckdb":
+        frame = _duckdb_intern_summaries(start_date, end_date, department)
+    else:
+        frame = _sqlite_intern_summaries(start_date, end_date, department)
+
+    frame = frame[list(_SUMMARY_COLUMNS)].copy()
+    for column in ("user_id", "days", "present", "late", "half_day"):
+        frame[column] = frame[column].astype("int64")
+    for column in ("name", "department", "first_date", "last_date"):
+        frame[column] = frame[column].astype(object)
+    frame = frame.rename(columns=_SUMMARY_COLUMNS)
+    return frame.sort_values(["Name", "User ID"]).reset_index(drop=True)
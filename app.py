@@ -17,18 +17,25 @@ import config
 import utils
 import auth
 import database as db
+import metrics
+import profiling
 
 # Import pages
 from pages import login
 from pages.admin import dashboard as admin_dashboard
 from pages.admin import manage_interns
 from pages.admin import reports
+from pages.admin import performance
 from pages.intern import dashboard as intern_dashboard
 from pages.intern import attendance
 
 # Initialize database
 db.init_db()
 
+# Serve metrics to local scrapers when configured
+if config.METRICS_PORT:
+    metrics.start_http_server()
+
 # Initialize session state
 if "initialized" not in st.session_state:
     config.init_session_state()
@@ -66,7 +73,7 @@ def main():
                 st.markdown("### Navigation")
                 page = st.radio(
                     "Go to",
-                    ["Dashboard", "Manage Interns", "Reports"],
+                    ["Dashboard", "Manage Interns", "Reports", "Performance"],
                     label_visibility="collapsed"
                 )
 
@@ -91,18 +98,21 @@ def main():
                     st.rerun()
 
         # Display selected page
-        if role == config.ROLE_ADMIN:
-            if page == "Dashboard":
-                admin_dashboard.show()
-            elif page == "Manage Interns":
-                manage_interns.show()
-            elif page == "Reports":
-                reports.show()
-        else:
-            if page == "Dashboard":
-                intern_dashboard.show()
-            elif page == "Attendance":
-                attendance.show()
+        with profiling.profile_rerun(page, role):
+            if role == config.ROLE_ADMIN:
+                if page == "Dashboard":
+                    admin_dashboard.show()
+                elif page == "Manage Interns":
+                    manage_interns.show()
+                elif page == "Reports":
+                    reports.show()
+                elif page == "Performance":
+                    performance.show()
+            else:
+                if page == "Dashboard":
+                    intern_dashboard.show()
+                elif page == "Attendance":
+                    attendance.show()
 
 if __name__ == "__main__":
     main()
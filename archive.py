@@ -0,0 +1,132 @@
+"""
+Parquet archive of closed attendance months.
+
+Each archived month is one hive-partitioned Parquet file,
+data/archive/year=YYYY/month=MM/attendance.parquet, holding the month's
+attendance rows together with the intern's name, username and department
+as of archiving. Reads filter on the year/month partitions and push date,
+department and user predicates down to the Parquet row groups.
+
+database.archive_closed_months() moves rows out of SQLite into the archive
+and records each month in the archive_manifest table; database.iter_attendance()
+unions archived rows back into query results.
+
+Usage:
+    python -m archive [--keep-months 2] [--vacuum]
+"""
+import argparse
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import config
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("user_id", pa.int64()),
+    ("date", pa.string()),
+    ("check_in_time", pa.string()),
+    ("check_out_time", pa.string()),
+    ("status", pa.string()),
+    ("notes", pa.string()),
+    ("name", pa.string()),
+    ("username", pa.string()),
+    ("department", pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int32()), ("month", pa.int32())]), flavor="hive")
+
+def month_path(year, month):
+    """Return the Parquet file path of an archived month."""
+    return os.path.join(config.ARCHIVE_DIR, f"year={year}", f"month={month:02d}", "attendance.parquet")
+
+def write_month(year, month, rows):
+    """
+    Write a month's rows to its Parquet file, merging with rows already archived.
+
+    Rows already in the file with the same attendance id are replaced, so
+    re-archiving a month after an interrupted run does not duplicate rows.
+    The file is replaced atomically.
+
+    Args:
+        year: Year of the month
+        month: Month number
+        rows: Tuples in SCHEMA column order
+
+    Returns:
+        int: Number of rows in the file
+    """
+    path = month_path(year, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    table = pa.Table.from_pylist([dict(zip(SCHEMA.names, row)) for row in rows], schema=SCHEMA)
+    if os.path.exists(path):
+        existing = pq.read_table(path, schema=SCHEMA)
+        existing = existing.filter(pc.invert(pc.is_in(existing["id"], value_set=table["id"])))
+        table = pa.concat_tables([existing, table])
+
+    # Sorted by date, so the row group statistics narrow date range reads
+    table = table.sort_by([("date", "ascending"), ("name", "ascending")])
+
+    # Files starting with "_" are ignored by dataset discovery until renamed
+    temp_path = os.path.join(os.path.dirname(path), "_attendance.parquet.tmp")
+    pq.write_table(table, temp_path, compression="zstd")
+    os.replace(temp_path, path)
+    return table.num_rows
+
+def _month_filter(year, month, after):
+    """Partition expression for months on/after (or on/before) the given month."""
+    if after:
+        return (ds.field("year") > year) | ((ds.field("year") == year) & (ds.field("month") >= month))
+    return (ds.field("year") < year) | ((ds.field("year") == year) & (ds.field("month") <= month))
+
+def read(start_date=None, end_date=None, department=None, user_id=None, columns=None):
+    """
+    Read archived attendance rows.
+
+    Args:
+        start_date: Optional inclusive lower bound (YYYY-MM-DD)
+        end_date: Optional inclusive upper bound (YYYY-MM-DD)
+        department: Optional department name filter
+        user_id: Optional user filter
+        columns: Optional list of columns to read (default: all of SCHEMA)
+
+    Returns:
+        pyarrow.Table: Matching rows, in no particular order
+    """
+    columns = columns or SCHEMA.names
+    if not os.path.isdir(config.ARCHIVE_DIR):
+        return SCHEMA.empty_table().select(columns)
+
+    dataset = ds.dataset(config.ARCHIVE_DIR, format="parquet", partitioning=PARTITIONING)
+    expression = ds.scalar(True)
+    if start_date:
+        expression &= _month_filter(int(start_date[:4]), int(start_date[5:7]), after=True)
+        expression &= ds.field("date") >= start_date
+    if end_date:
+        expression &= _month_filter(int(end_date[:4]), int(end_date[5:7]), after=False)
+        expression &= ds.field("date") <= end_date
+    if department:
+        expression &= ds.field("department") == department
+    if user_id is not None:
+        expression &= ds.field("user_id") == user_id
+
+    return dataset.to_table(columns=columns, filter=expression)
+
+def main():
+    parser = argparse.ArgumentParser(description="Move closed attendance months into the Parquet archive.")
+    parser.add_argument("--keep-months", type=int, default=None,
+                        help=f"Months kept in SQLite, including the current one (default {config.ARCHIVE_KEEP_MONTHS})")
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim the freed space in the database file")
+    args = parser.parse_args()
+
+    import database as db
+
+    archived = db.archive_closed_months(args.keep_months, vacuum=args.vacuum)
+    for year, month, row_count in archived:
+        print(f"Archived {year}-{month:02d}: {row_count} rows")
+    if not archived:
+        print("Nothing to archive.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark of the report aggregation engines.
+
+Generates a synthetic history, optionally archives closed months to
+Parquet (see archive.py), then runs every aggregation in analytics.py on
+both the sqlite and duckdb engines over several date ranges and reports
+their latency. That both engines return the same results is tested in
+tests/test_analytics.py.
+
+Usage:
+    python -m benchmarks.analytics [--interns 1000] [--days 365] [--ranges 30,180,365]
+                                   [--archive] [--repeat 5] [--output analytics.json]
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+from benchmarks import synthetic
+from benchmarks.common import git_revision, measure, use_temp_database
+
+AGGREGATIONS = ("status_distribution", "daily_by_status", "department_by_status", "intern_summaries")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sqlite and duckdb report aggregations.")
+    parser.add_argument("--interns", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--ranges", default="30,180,365", help="comma-separated report lengths in days")
+    parser.add_argument("--archive", action="store_true", help="archive closed months to Parquet first")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Must happen before config/database are imported
+    use_temp_database()
+    import analytics
+    import database as db
+
+    dataset = synthetic.generate(args.interns, args.days, seed=args.seed)
+    archived = db.archive_closed_months() if args.archive else []
+    department = db.get_departments()[0]["name"]
+
+    results = {}
+    for days in (int(value) for value in args.ranges.split(",")):
+        end_date = dataset["last_date"]
+        start_date = (date.fromisoformat(end_date) - timedelta(days=days)).isoformat()
+        for dept in (None, department):
+            label = f"{days}d/{dept or 'all'}"
+            for name in AGGREGATIONS:
+                func = getattr(analytics, name)
+                results[f"{label}/{name}"] = {
+                    engine: measure(lambda: func(start_date, end_date, dept, engine=engine), args.repeat)
+                    for engine in analytics.ENGINES
+                }
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+            "archived_months": len(archived),
+        },
+        "dataset": dataset,
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
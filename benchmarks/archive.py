@@ -0,0 +1,109 @@
+"""
+Benchmark of the Parquet archive of closed months.
+
+Generates a synthetic history several months long, then times the hot-path
+queries (the last 30 days, all interns, one department and one intern),
+a report reaching into older months and the intern statistics rebuild,
+and measures the database file size, before and after moving closed months
+into the archive (see archive.py). Row counts of every query are compared
+before and after, to check that the union of SQLite and Parquet rows
+returns the same results.
+
+Usage:
+    python -m benchmarks.archive [--interns 1000] [--days 365] [--keep-months 2] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+from benchmarks import synthetic
+from benchmarks.common import git_revision, measure, use_temp_database
+
+def directory_size(path):
+    """Total size in bytes of the files under path."""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+def benchmark_queries(dataset, repeat):
+    """Time the hot-path and historical queries."""
+    import config
+    import database as db
+
+    end_date = dataset["last_date"]
+    recent_start = (date.fromisoformat(end_date) - timedelta(days=30)).isoformat()
+    history_start = (date.fromisoformat(end_date) - timedelta(days=180)).isoformat()
+    intern = db.get_all_users(role=config.ROLE_INTERN)[0]
+
+    return {
+        "recent_all": measure(lambda: db.get_all_attendance(recent_start, end_date), repeat),
+        "recent_department": measure(
+            lambda: db.get_all_attendance(recent_start, end_date, intern["department"]), repeat),
+        "recent_intern": measure(lambda: db.get_attendance(intern["id"], recent_start, end_date), repeat),
+        "history_department": measure(
+            lambda: db.get_all_attendance(history_start, end_date, intern["department"]), repeat),
+        "history_intern": measure(lambda: db.get_attendance(intern["id"], history_start, end_date), repeat),
+        "rebuild_intern_stats": measure(db.rebuild_intern_stats, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Parquet archive of closed months.")
+    parser.add_argument("--interns", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--keep-months", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Must happen before config/database are imported
+    db_path = use_temp_database()
+    import config
+    import database as db
+
+    dataset = synthetic.generate(args.interns, args.days, seed=args.seed)
+    before = {"db_bytes": os.path.getsize(db_path), "queries": benchmark_queries(dataset, args.repeat)}
+
+    start = time.perf_counter()
+    archived = db.archive_closed_months(args.keep_months, vacuum=True)
+    archive_seconds = time.perf_counter() - start
+
+    after = {
+        "db_bytes": os.path.getsize(db_path),
+        "archive_bytes": directory_size(config.ARCHIVE_DIR),
+        "queries": benchmark_queries(dataset, args.repeat),
+    }
+    mismatches = [
+        name for name, result in before["queries"].items()
+        if result.get("rows") != after["queries"][name].get("rows")
+    ]
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "keep_months": args.keep_months,
+            "repeat": args.repeat,
+        },
+        "dataset": dataset,
+        "archive": {
+            "months": len(archived),
+            "rows": sum(row_count for _, _, row_count in archived),
+            "seconds": round(archive_seconds, 3),
+        },
+        "before": before,
+        "after": after,
+        "row_count_mismatches": mismatches,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of chart payload sizes over long date ranges.
+
+Generates a synthetic history of several years, then builds the Reports
+page's trend chart and the admin dashboard's calendar heatmap for ranges of
+increasing length, twice:
+
+- daily: one point per day and status, and one annotated calendar cell per
+  day over the whole range (the charts before downsampling),
+- bucketed: the time bucket picked by charts.time_bucket(), and the capped
+  calendar of charts.calendar_heatmap().
+
+For each it reports the data points, whether WebGL is used, the size of
+the figure JSON sent to the browser and the time to aggregate and build it.
+
+Usage:
+    python -m benchmarks.charts [--interns 500] [--years 3] [--ranges 30,365,1095]
+                                [--output charts.json]
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+from benchmarks import synthetic
+from benchmarks.common import git_revision, use_temp_database
+
+def build(start_date, end_date, bucketed):
+    """Aggregate and build the trend and calendar figures for a range; returns their measurements."""
+    import analytics
+    import charts
+
+    charts.clear_cache()
+    start_str, end_str = start_date.isoformat(), end_date.isoformat()
+    days = (end_date - start_date).days + 1
+    results = {}
+
+    start = time.perf_counter()
+    bucket = charts.time_bucket(start_date, end_date)[0] if bucketed else "day"
+    trend = analytics.daily_by_status(start_str, end_str, bucket=bucket)
+    options = {} if bucketed else {"render_mode": "svg"}
+    fig = charts.plot("line", trend, x="Date", y="Count", color="Status", markers=True,
+                      title="Attendance by Status", **options)
+    seconds = time.perf_counter() - start
+    results["trend"] = {"bucket": bucket, "points": len(trend), "webgl": fig.data[0].type == "scattergl",
+                        "kib": round(len(fig.to_json()) / 1024, 1), "seconds": round(seconds, 3)}
+
+    start = time.perf_counter()
+    calendar_start = start_date if not bucketed else max(
+        start_date, end_date - timedelta(days=charts.config.CHART_CALENDAR_MAX_DAYS - 1))
+    status_by_date = analytics.daily_by_status(calendar_start.isoformat(), end_str)
+    status_by_date = status_by_date.assign(date=status_by_date["Date"].dt.strftime("%Y-%m-%d"))
+    day_statuses = status_by_date.sort_values("Count", ascending=False, kind="stable").drop_duplicates("date")
+    day_statuses = day_statuses.set_index("date").rename(columns={"Status": "status"})
+    day_statuses["check_ins"] = status_by_date.groupby("date")["Count"].sum()
+    limits = {} if bucketed else {"max_days": days, "annotated_days": days}
+    fig, shown_from = charts.calendar_heatmap(day_statuses, start_date, end_date, **limits)
+    seconds = time.perf_counter() - start
+    results["calendar"] = {"days": (end_date - shown_from).days + 1, "annotations": len(fig.layout.annotations),
+                           "kib": round(len(fig.to_json()) / 1024, 1), "seconds": round(seconds, 3)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chart payloads over long ranges.")
+    parser.add_argument("--interns", type=int, default=500)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--ranges", default="30,365,1095", help="comma-separated range lengths in days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Must happen before config/database are imported
+    use_temp_database()
+
+    dataset = synthetic.generate(args.interns, args.years * 365, seed=args.seed)
+    end_date = date.fromisoformat(dataset["last_date"])
+    runs = {}
+    for days in (int(value) for value in args.ranges.split(",")):
+        start_date = end_date - timedelta(days=days - 1)
+        runs[days] = {mode: build(start_date, end_date, mode == "bucketed") for mode in ("daily", "bucketed")}
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "dataset": dataset,
+        "ranges": runs,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
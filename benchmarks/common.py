@@ -0,0 +1,146 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a temporary database. Call use_temp_database()
+before importing config or database, since config.DB_PATH is read
+from the environment at import time.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Page modules by role, as dispatched from app.main()
+PAGES = {
+    "admin": {
+        "Dashboard": "pages.admin.dashboard",
+        "Manage Interns": "pages.admin.manage_interns",
+        "Reports": "pages.admin.reports",
+    },
+    "intern": {
+        "Dashboard": "pages.intern.dashboard",
+        "Attendance": "pages.intern.attendance",
+    },
+}
+
+def use_temp_database(directory=None):
+    """Point the application at a fresh SQLite file and return its path."""
+    directory = directory or tempfile.mkdtemp(prefix="attendance-bench-")
+    path = os.path.join(directory, "attendance.db")
+    os.environ["ATTENDANCE_DB_PATH"] = path
+    # Measure the queries themselves rather than cache hits, unless asked otherwise
+    os.environ.setdefault("CACHE_ENABLED", "false")
+    return path
+
+def seed_interns(count, departments=None):
+    """
+    Insert interns directly, sharing one password hash to skip per-user hashing.
+
+    Every intern's password is "intern".
+
+    Args:
+        count: Number of interns to create
+        departments: Optional department names to spread interns across
+
+    Returns:
+        list: The new interns' user IDs
+    """
+    import database as db
+    from passlib.hash import pbkdf2_sha256
+
+    departments = departments or [dept["name"] for dept in db.get_departments()]
+    password_hash = pbkdf2_sha256.hash("intern")
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    start_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0] + 1
+    cursor.executemany(
+        "INSERT INTO users (id, username, password_hash, role, name, email, department) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (user_id, f"intern{user_id}", password_hash, "intern", f"Intern {user_id}",
+             f"intern{user_id}@example.com", departments[user_id % len(departments)])
+            for user_id in range(start_id, start_id + count)
+        )
+    )
+    conn.commit()
+    conn.close()
+    return list(range(start_id, start_id + count))
+
+def percentile(samples, pct):
+    """Return the pct-th percentile (0-100) of a list of samples."""
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[max(min(int(pct), 99), 1) - 1]
+
+def summarize(samples):
+    """Summarize latency samples (seconds) as milliseconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+    }
+
+@contextmanager
+def timer(samples):
+    """Append the elapsed wall time of the block (seconds) to samples."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - start)
+
+def measure(func, repeat=5):
+    """
+    Call func repeatedly and summarize its wall time.
+
+    Returns:
+        dict: Latency summary, plus "rows" when func returns a list
+        and "error" if it raised
+    """
+    samples = []
+    result = None
+    try:
+        for _ in range(repeat):
+            with timer(samples):
+                result = func()
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    summary = summarize(samples)
+    if isinstance(result, list):
+        summary["rows"] = len(result)
+    return summary
+
+def page_app_test(module, user, timeout=600):
+    """
+    Build a headless AppTest that renders one page module's show() as user.
+
+    The page runs without the app.py shell (sidebar, navigation), so its
+    timings cover only the page itself.
+    """
+    import config
+    from streamlit.testing.v1 import AppTest
+
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    at = AppTest.from_string(f"import {module}\n{module}.show()\n", default_timeout=timeout)
+    at.session_state[config.USER_SESSION_KEY] = user
+    at.session_state[config.AUTH_STATUS_KEY] = True
+    at.session_state[config.USER_ROLE_KEY] = user["role"]
+    at.session_state["initialized"] = True
+    return at
+
+def git_revision():
+    """Return the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,86 @@
+"""
+Benchmark of per-call commits versus the group-commit writer.
+
+A burst of threads checks interns in concurrently, the way a shift start
+looks, for every combination of commit mode and synchronous setting.
+Each run uses a fresh temporary database and reports throughput, check-in
+latency and the number of committed transactions. Each transaction costs
+one journal and database fsync under synchronous=FULL.
+
+Usage:
+    python -m benchmarks.group_commit [--interns 2000] [--threads 32] [--journal-mode WAL]
+"""
+import argparse
+import json
+import tempfile
+import time
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import seed_interns, summarize, timer, use_temp_database
+
+def run_burst(user_ids, threads, day):
+    """Check every intern in from a pool of threads; return (seconds, latency samples)."""
+    import database as db
+
+    latencies = []
+
+    def check_in(user_id):
+        with timer(latencies):
+            db.record_check_in(user_id, day, f"{day} 09:{user_id % 60:02d}:00")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(check_in, user_ids))
+    return time.perf_counter() - start, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark group commit for check-in bursts.")
+    parser.add_argument("--interns", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--journal-mode", default="WAL", choices=["DELETE", "WAL"])
+    parser.add_argument("--max-delay-ms", type=int, default=5)
+    parser.add_argument("--max-batch", type=int, default=256)
+    args = parser.parse_args()
+
+    use_temp_database()
+    import config
+    import database as db
+
+    config.DB_JOURNAL_MODE = args.journal_mode
+    config.GROUP_COMMIT_MAX_DELAY_MS = args.max_delay_ms
+    config.GROUP_COMMIT_MAX_BATCH = args.max_batch
+
+    report = []
+    for synchronous in ("FULL", "NORMAL"):
+        for group_commit in (False, True):
+            config.DB_PATH = use_temp_database(tempfile.mkdtemp(prefix="attendance-bench-"))
+            config.DB_SYNCHRONOUS = synchronous
+            config.GROUP_COMMIT_ENABLED = group_commit
+            db.init_db()
+            user_ids = seed_interns(args.interns)
+
+            before = db.get_write_stats()
+            # A different day per run keeps the check-in dedup cache from answering
+            day = (date.today() - timedelta(days=len(report))).isoformat()
+            seconds, latencies = run_burst(user_ids, args.threads, day)
+            db.stop_group_commit()
+            after = db.get_write_stats()
+            transactions = after["transactions"] - before["transactions"]
+
+            report.append({
+                "mode": "group_commit" if group_commit else "per_call",
+                "synchronous": synchronous,
+                "journal_mode": args.journal_mode,
+                "check_ins": len(user_ids),
+                "threads": args.threads,
+                "seconds": round(seconds, 3),
+                "check_ins_per_second": round(len(user_ids) / seconds, 1),
+                "transactions": transactions,
+                "events_per_transaction": round(len(user_ids) / max(transactions, 1), 1),
+                "latency": summarize(latencies),
+            })
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
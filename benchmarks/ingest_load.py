@@ -0,0 +1,97 @@
+"""
+Load test for the check-in ingestion service (ingest.py).
+
+Starts the service in-process against a temporary database, drives it
+with aiohttp's local test client (no network listener needed), and
+reports acknowledgement latency (p50/p99) and committed events per
+second.
+
+Usage:
+    python -m benchmarks.ingest_load [--interns 2000] [--requests 4000]
+                                     [--batch 1] [--concurrency 100] [--wait]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from benchmarks.common import seed_interns, summarize, timer, use_temp_database
+
+def build_events(user_ids, total, day):
+    """Build a check-in for every intern, then check-outs, then duplicate punches."""
+    events = []
+    for i in range(total):
+        user_id = user_ids[i % len(user_ids)]
+        round_number = i // len(user_ids)
+        if round_number == 0:
+            minute = random.randint(0, 89)
+            time_str = f"{day} {8 + minute // 60:02d}:{minute % 60:02d}:00"
+            events.append({"action": "check_in", "user_id": user_id, "time": time_str})
+        else:
+            minute = random.randint(0, 59)
+            events.append({"action": "check_out", "user_id": user_id, "time": f"{day} 17:{minute:02d}:00"})
+    return events
+
+async def run(args):
+    from aiohttp.test_utils import TestClient, TestServer
+    import database as db
+    import ingest
+
+    user_ids = seed_interns(args.interns)
+    events = build_events(user_ids, args.requests * args.batch, time.strftime("%Y-%m-%d"))
+    bodies = [events[i:i + args.batch] for i in range(0, len(events), args.batch)]
+    path = "/events?wait=1" if args.wait else "/events"
+
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with TestClient(TestServer(ingest.create_app())) as client:
+        async def send(body):
+            async with semaphore:
+                with timer(latencies):
+                    response = await client.post(path, json=body if args.batch > 1 else body[0])
+                    await response.read()
+                if response.status not in (200, 202):
+                    raise RuntimeError(f"request failed with {response.status}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(body) for body in bodies))
+        acknowledged = time.perf_counter() - start
+
+        # Wait until every event has been committed or deduplicated
+        while True:
+            counters = db.get_action_counters()
+            handled = sum(c["recorded"] + c["deduplicated"] for c in counters.values())
+            if handled >= len(events):
+                break
+            await asyncio.sleep(0.005)
+        committed = time.perf_counter() - start
+
+    return {
+        "interns": args.interns,
+        "requests": len(bodies),
+        "events": len(events),
+        "events_per_request": args.batch,
+        "concurrency": args.concurrency,
+        "wait_for_commit": args.wait,
+        "latency": summarize(latencies),
+        "acknowledged_seconds": round(acknowledged, 3),
+        "committed_seconds": round(committed, 3),
+        "events_per_second": round(len(events) / committed, 1),
+        "counters": counters,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the check-in ingestion service.")
+    parser.add_argument("--interns", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--batch", type=int, default=1, help="events per request")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--wait", action="store_true", help="wait for the commit before responding")
+    args = parser.parse_args()
+
+    use_temp_database()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Headless page render latency benchmarks.
+
+Seeds a synthetic database, logs in through the real login form as an
+admin and as an intern using Streamlit's AppTest, then drives each page
+and its widgets (date range, department, intern selector). Every rerun
+is timed, and the wall time is split into phases:
+
+- db: time inside database.py functions, including iterating generators
+- figure: plotly.express chart construction (including figure cache lookups)
+  and figure updates/annotations
+- serialization: st.plotly_chart / st.dataframe turning figures and
+  frames into protobuf/Arrow
+- dataframe: the remainder of the rerun, which is dominated by pandas
+  work in the page (plus Streamlit script overhead)
+
+Usage:
+    python -m benchmarks.pages [--interns 1000] [--days 30] [--repeat 3] [--output pages.json]
+"""
+import argparse
+import functools
+import inspect
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from benchmarks import synthetic
+from benchmarks.common import REPO_DIR, git_revision, use_temp_database
+
+PHASES = ("db", "figure", "serialization")
+
+class PhaseTimer:
+    """
+    Attributes wall time to phases by wrapping functions in place.
+
+    Only the outermost wrapped call is counted, so a database call made
+    while building a figure (or vice versa) is not counted twice.
+    """
+
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self._active = False
+        self._patches = []
+
+    def reset(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+
+    @contextmanager
+    def _phase(self, phase):
+        if self._active:
+            yield
+            return
+        self._active = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[phase] += time.perf_counter() - start
+            self._active = False
+
+    def _timed_generator(self, phase, generator):
+        while True:
+            with self._phase(phase):
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+            yield item
+
+    def wrap(self, owner, name, phase):
+        """Replace owner.name with a version that counts its time towards phase."""
+        original = getattr(owner, name)
+        is_generator = inspect.isgeneratorfunction(original)
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            if is_generator:
+                return self._timed_generator(phase, original(*args, **kwargs))
+            with self._phase(phase):
+                return original(*args, **kwargs)
+
+        setattr(owner, name, wrapper)
+        self._patches.append((owner, name, original))
+
+    def install(self):
+        """Wrap database.py, plotly and the Streamlit serialization entry points."""
+        import plotly.express as px
+        import plotly.graph_objects as go
+        import streamlit as st
+        import database as db
+        import charts
+
+        for name, func in list(vars(db).items()):
+            if inspect.isfunction(func) and func.__module__ == db.__name__ and not name.startswith("_"):
+                self.wrap(db, name, "db")
+        self.wrap(charts, "plot", "figure")
+        for name in ("line", "pie", "bar", "imshow", "scatter"):
+            self.wrap(px, name, "figure")
+        for name in ("add_annotation", "update_layout"):
+            self.wrap(go.Figure, name, "figure")
+        for name in ("plotly_chart", "dataframe"):
+            self.wrap(st, name, "serialization")
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches = []
+
+def _find(widgets, label):
+    """Return the widget with the given label, or None if the page does not render it."""
+    return next((widget for widget in widgets if widget.label == label), None)
+
+class PageDriver:
+    """Drives app.py through AppTest and records per-rerun timings."""
+
+    def __init__(self, phase_timer, repeat):
+        from streamlit.testing.v1 import AppTest
+
+        self.phase_timer = phase_timer
+        self.repeat = repeat
+        self.at = AppTest.from_file(os.path.join(REPO_DIR, "app.py"), default_timeout=600)
+        self.results = {}
+
+    def _run_once(self, step):
+        self.phase_timer.reset()
+        start = time.perf_counter()
+        self.at.run()
+        wall = time.perf_counter() - start
+        if self.at.exception:
+            raise RuntimeError(f"{step}: {self.at.exception[0].message}")
+        phases = dict(self.phase_timer.totals)
+        phases["dataframe"] = max(wall - sum(phases.values()), 0.0)
+        return wall, phases
+
+    def step(self, name, action=None, repeat=None):
+        """Apply an optional widget action, then time `repeat` reruns in that state."""
+        if action is not None and action() is False:
+            self.results[name] = {"skipped": "widget not rendered"}
+            return
+        samples = [self._run_once(name) for _ in range(repeat or self.repeat)]
+        walls = sorted(wall for wall, _ in samples)
+        self.results[name] = {
+            "reruns": len(samples),
+            "wall_ms": round(walls[len(walls) // 2] * 1000, 2),
+            "phases_ms": {
+                phase: round(sum(p[phase] for _, p in samples) / len(samples) * 1000, 2)
+                for phase in PHASES + ("dataframe",)
+            },
+        }
+
+    def login(self, username, password):
+        """Submit the login form once (it sleeps briefly on success) and land on the dashboard."""
+        self.at.run()
+
+        def submit():
+            self.at.text_input[0].input(username)
+            self.at.text_input[1].input(password)
+            self.at.button[0].click()
+
+        self.step("login", submit, repeat=1)
+
+    def navigate(self, page):
+        def action():
+            self.at.sidebar.radio[0].set_value(page)
+        self.step(f"{page}: open", action)
+
+    def set_date(self, page, label, value):
+        def action():
+            widget = _find(self.at.date_input, label)
+            if widget is None:
+                return False
+            widget.set_value(value)
+        self.step(f"{page}: {label.lower()} = {value}", action)
+
+    def enter_text(self, page, label, value):
+        def action():
+            widget = _find(self.at.text_input, label)
+            if widget is None:
+                return False
+            widget.input(value)
+        self.step(f"{page}: {label.lower()} = {value!r}", action)
+
+    def select(self, page, label, index=1):
+        def action():
+            widget = _find(self.at.selectbox, label)
+            if widget is None or len(widget.options) <= index:
+                return False
+            widget.select_index(index)
+        self.step(f"{page}: {label.lower()} #{index}", action)
+
+def run(args):
+    import config
+    import database as db
+    import utils
+
+    dataset = synthetic.generate(args.interns, args.days, seed=args.seed)
+    long_range_start = utils.get_indian_time().date() - timedelta(days=args.days)
+    intern = db.get_all_users(role=config.ROLE_INTERN)[0]
+
+    phase_timer = PhaseTimer()
+    phase_timer.install()
+    try:
+        admin = PageDriver(phase_timer, args.repeat)
+        admin.login("admin", "admin123")
+        admin.step("Dashboard: rerun")
+        admin.set_date("Dashboard", "Start Date", long_range_start)
+        admin.select("Dashboard", "Department")
+        admin.navigate("Reports")
+        admin.set_date("Reports", "Start Date", long_range_start)
+        admin.select("Reports", "Department")
+        admin.enter_text("Reports", "Search Interns", "intern 1")
+        admin.select("Reports", "Select Intern")
+        admin.navigate("Manage Interns")
+        admin.enter_text("Manage Interns", "Search Interns", "intern 2")
+        admin.select("Manage Interns", "Select Intern")
+
+        intern_driver = PageDriver(phase_timer, args.repeat)
+        intern_driver.login(intern["username"], "intern")
+        intern_driver.step("Dashboard: rerun")
+        intern_driver.set_date("Dashboard", "Start Date", long_range_start)
+        intern_driver.navigate("Attendance")
+    finally:
+        phase_timer.uninstall()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+        },
+        "dataset": dataset,
+        "admin": admin.results,
+        "intern": intern_driver.results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page reruns with a per-phase breakdown.")
+    parser.add_argument("--interns", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    use_temp_database()
+    output = json.dumps(run(args), indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark of attendance status recomputation after a policy change.
+
+Generates a synthetic history (about 1M attendance rows by default), then
+adds a new default policy and a department policy part-way through the
+history, plus --schedules schedules for departments and single interns
+(some on one weekday, some for a limited period), and times
+database.recompute_statuses() over everything: once to apply the change
+and once more when nothing changes. A random sample of rows is
+re-evaluated one at a time with determine_status() to check the
+vectorized statuses, and to estimate how long a row-by-row pass would take;
+the time of the per-check-in schedule lookup is reported separately.
+
+Usage:
+    python -m benchmarks.policy [--interns 4000] [--days 365] [--schedules 500]
+                                [--sample 20000] [--output policy.json]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from benchmarks import synthetic
+from benchmarks.common import git_revision, use_temp_database
+
+def check_sample(sample_size, seed):
+    """Re-evaluate a sample of rows one at a time and compare with their stored status."""
+    import config
+    import database as db
+
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        """
+        SELECT a.user_id, a.date, a.check_in_time, a.status, u.department
+        FROM attendance a LEFT JOIN users u ON u.id = a.user_id
+        WHERE a.status IN (?, ?)
+        """,
+        (config.STATUS_PRESENT, config.STATUS_LATE)
+    )
+    rows = cursor.fetchall()
+    rules = db._get_work_rules(cursor)
+    conn.close()
+
+    sample = random.Random(seed).sample(rows, min(sample_size, len(rows)))
+    start = time.perf_counter()
+    mismatches = sum(
+        db.determine_status(check_in_time, db._policy_for(rules.policies, department, day),
+                            rules.schedules.lookup(user_id, department, day)) != status
+        for user_id, day, check_in_time, status, department in sample
+    )
+    seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scheduled = sum(rules.schedules.lookup(user_id, department, day) is not None
+                    for user_id, day, _, _, department in sample)
+    lookup_seconds = time.perf_counter() - start
+    return {
+        "rows": len(sample),
+        "mismatches": mismatches,
+        "scheduled": scheduled,
+        "seconds": round(seconds, 3),
+        "estimated_seconds_for_all": round(seconds / max(len(sample), 1) * len(rows), 3),
+        "schedule_lookup_us": round(lookup_seconds / max(len(sample), 1) * 1e6, 2),
+    }
+
+def add_schedules(count, first_date, last_date, seed):
+    """Add count random schedules over the history; returns how many of each kind were added."""
+    import database as db
+
+    rng = random.Random(seed)
+    departments = [department["name"] for department in db.get_departments()]
+    interns = [user["id"] for user in db.get_all_users(role="intern")]
+    first, days = date.fromisoformat(first_date), (date.fromisoformat(last_date) - date.fromisoformat(first_date)).days
+    kinds = {"department": 0, "intern": 0}
+    for i in range(count):
+        # One in ten schedules is for a department, the rest for single interns
+        kind = "department" if i % 10 == 0 else "intern"
+        kinds[kind] += 1
+        start_hour = rng.choice([8, 9, 10])
+        effective_from = first + timedelta(days=rng.randrange(days))
+        # Half the schedules are temporary, half the rest apply on one weekday only
+        effective_to = effective_from + timedelta(days=rng.randrange(7, 90)) if rng.random() < 0.5 else None
+        db.add_schedule(
+            f"{start_hour:02d}:{rng.choice([0, 30]):02d}", f"{start_hour + 8:02d}:00",
+            effective_from.isoformat(), effective_to.isoformat() if effective_to else None,
+            department=rng.choice(departments) if kind == "department" else None,
+            user_id=rng.choice(interns) if kind == "intern" else None,
+            weekday=rng.randrange(5) if rng.random() < 0.5 else None,
+        )
+    return kinds
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized status recomputation.")
+    parser.add_argument("--interns", type=int, default=4000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--schedules", type=int, default=500)
+    parser.add_argument("--sample", type=int, default=20000, help="rows re-evaluated one at a time")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Must happen before config/database are imported
+    use_temp_database()
+    import database as db
+
+    dataset = synthetic.generate(args.interns, args.days, seed=args.seed)
+    department = db.get_departments()[0]["name"]
+    midpoint = (date.fromisoformat(dataset["last_date"]) - timedelta(days=args.days // 2)).isoformat()
+    db.add_policy("09:15", 10, midpoint)
+    db.add_policy("10:00", 20, midpoint, department=department)
+    schedules = add_schedules(args.schedules, dataset["first_date"], dataset["last_date"], args.seed)
+
+    runs = {}
+    for run in ("apply", "unchanged"):
+        start = time.perf_counter()
+        result = db.recompute_statuses()
+        seconds = time.perf_counter() - start
+        runs[run] = {**result, "seconds": round(seconds, 3), "rows_per_second": round(result["rows"] / seconds)}
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "policy_change_from": midpoint,
+            "department_policy": department,
+            "schedules": schedules,
+        },
+        "dataset": dataset,
+        "recompute": runs,
+        "row_by_row_sample": check_sample(args.sample, args.seed),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
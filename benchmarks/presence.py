@@ -0,0 +1,190 @@
+"""
+Benchmark of the presence bitmap index.
+
+Generates a synthetic history, builds the presence index (see presence.py)
+and answers each cohort question both from the index and with the
+equivalent SQL over the attendance table, over several date ranges, for
+all interns and for one department:
+
+- interns present on every working day,
+- interns absent on --streak consecutive working days,
+- present and late rates per department,
+- present and late days per intern.
+
+Results are checked to be identical, and the latency of both is reported,
+along with the index build time and file size.
+
+Usage:
+    python -m benchmarks.presence [--interns 1000] [--days 365] [--ranges 7,30,365]
+                                  [--streak 3] [--repeat 20] [--output presence.json]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+from benchmarks import synthetic
+from benchmarks.common import git_revision, measure, use_temp_database
+
+_COHORT = "SELECT id FROM users WHERE role = 'intern' AND (:department IS NULL OR department = :department)"
+_CHECK_INS = """
+    FROM attendance a JOIN users u ON u.id = a.user_id
+    WHERE a.date BETWEEN :start AND :end AND a.check_in_time IS NOT NULL
+      AND strftime('%w', a.date) NOT IN ('0', '6')
+      AND u.role = 'intern' AND (:department IS NULL OR u.department = :department)
+"""
+
+def _query(sql, params):
+    import database as db
+
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(sql, params).fetchall()
+    conn.close()
+    return rows
+
+def _working_day(day, epoch):
+    weeks, weekday = divmod((day - epoch).days, 7)
+    return weeks * 5 + weekday
+
+def sql_present_every_day(start_date, end_date, department):
+    import database as db
+
+    working_days = db._count_working_days(date.fromisoformat(start_date), date.fromisoformat(end_date))
+    rows = _query(
+        f"SELECT a.user_id {_CHECK_INS} GROUP BY a.user_id HAVING COUNT(*) = :days ORDER BY a.user_id",
+        {"start": start_date, "end": end_date, "department": department, "days": working_days}
+    )
+    return [row[0] for row in rows]
+
+def sql_absent_streak(length, start_date, end_date, department):
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    epoch = start - timedelta(days=start.weekday() + 7)
+    # First and last working day of the range, as working-day numbers from the epoch
+    while start.weekday() >= 5:
+        start += timedelta(days=1)
+    while end.weekday() >= 5:
+        end -= timedelta(days=1)
+    rows = _query(
+        f"""
+        WITH cohort AS ({_COHORT}),
+        present AS (
+            SELECT a.user_id,
+                   CAST(julianday(a.date) - julianday(:epoch) AS INTEGER) / 7 * 5
+                   + CAST(julianday(a.date) - julianday(:epoch) AS INTEGER) % 7 AS day
+            {_CHECK_INS}
+            UNION ALL SELECT id, :first - 1 FROM cohort
+            UNION ALL SELECT id, :last + 1 FROM cohort
+        ),
+        gaps AS (
+            SELECT user_id, day - LAG(day) OVER (PARTITION BY user_id ORDER BY day) - 1 AS gap FROM present
+        )
+        SELECT user_id FROM gaps GROUP BY user_id HAVING MAX(gap) >= :length ORDER BY user_id
+        """,
+        {"start": start_date, "end": end_date, "department": department, "epoch": epoch.isoformat(),
+         "first": _working_day(start, epoch), "last": _working_day(end, epoch), "length": length}
+    )
+    return [row[0] for row in rows]
+
+def sql_attendance_rates(start_date, end_date, department):
+    import database as db
+
+    working_days = db._count_working_days(date.fromisoformat(start_date), date.fromisoformat(end_date))
+    params = {"start": start_date, "end": end_date, "department": department}
+    interns = dict(_query(
+        "SELECT department, COUNT(*) FROM users WHERE role = 'intern' "
+        "AND (:department IS NULL OR department = :department) GROUP BY department", params))
+    counts = {row[0]: row[1:] for row in _query(
+        f"SELECT u.department, COUNT(*), SUM(a.status = 'Late') {_CHECK_INS} GROUP BY u.department", params)}
+    rates = []
+    for dept in sorted(interns, key=lambda name: name or ""):
+        present, late = counts.get(dept, (0, 0))
+        possible = interns[dept] * working_days
+        rates.append({
+            "department": dept,
+            "interns": interns[dept],
+            "working_days": working_days,
+            "present_rate": present / possible if possible else 0.0,
+            "late_rate": late / possible if possible else 0.0,
+        })
+    return rates
+
+def sql_presence_counts(start_date, end_date, department):
+    params = {"start": start_date, "end": end_date, "department": department}
+    counts = {user_id: (0, 0) for (user_id,) in _query(_COHORT, params)}
+    for user_id, present, late in _query(
+            f"SELECT a.user_id, COUNT(*), SUM(a.status = 'Late') {_CHECK_INS} GROUP BY a.user_id", params):
+        counts[user_id] = (present, late)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the presence bitmap index against SQL.")
+    parser.add_argument("--interns", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--ranges", default="7,30,365", help="comma-separated query lengths in days")
+    parser.add_argument("--streak", type=int, default=3, help="consecutive absent working days")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Must happen before config/database are imported
+    use_temp_database()
+    import config
+    import database as db
+
+    dataset = synthetic.generate(args.interns, args.days, seed=args.seed)
+    department = db.get_departments()[0]["name"]
+
+    start = time.perf_counter()
+    db.rebuild_presence_index()
+    build_seconds = time.perf_counter() - start
+
+    queries = {
+        "present_every_day": (db.get_interns_present_every_day, sql_present_every_day),
+        f"absent_streak_{args.streak}": (
+            lambda *a: db.get_interns_absent_streak(args.streak, *a),
+            lambda *a: sql_absent_streak(args.streak, *a)),
+        "attendance_rates": (db.get_attendance_rates, sql_attendance_rates),
+        "presence_counts": (db.get_presence_counts, sql_presence_counts),
+    }
+
+    results = {}
+    mismatches = []
+    for days in (int(value) for value in args.ranges.split(",")):
+        end_date = dataset["last_date"]
+        start_date = (date.fromisoformat(end_date) - timedelta(days=days - 1)).isoformat()
+        for dept in (None, department):
+            for name, (index_query, sql_query) in queries.items():
+                label = f"{days}d/{dept or 'all'}/{name}"
+                if index_query(start_date, end_date, dept) != sql_query(start_date, end_date, dept):
+                    mismatches.append(label)
+                results[label] = {
+                    "index": measure(lambda: index_query(start_date, end_date, dept), args.repeat),
+                    "sql": measure(lambda: sql_query(start_date, end_date, dept), args.repeat),
+                }
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+        },
+        "dataset": dataset,
+        "index": {
+            "build_seconds": round(build_seconds, 3),
+            "file_bytes": os.path.getsize(config.PRESENCE_INDEX_PATH),
+        },
+        "results": results,
+        "mismatches": mismatches,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
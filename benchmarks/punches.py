@@ -0,0 +1,149 @@
+"""
+Benchmark of the punch log against the read-modify-write check-in path.
+
+Every intern punches in, out for lunch, back in and out for the day, from
+a pool of threads, for each write path:
+
+- update: database.record_events() writing attendance directly (a read
+  of the user-day before every write),
+- punch: record_events() with config.PUNCH_LOG_ENABLED, appending punches
+  while the background deriver folds them into attendance,
+- append: the same appends without the deriver, followed by one
+  database.derive_attendance() over all of them.
+
+Each run uses a fresh temporary database and reports punch throughput,
+per-call latency and committed transactions; the punch run also reports
+how long the deriver took to catch up after the last punch, and the
+append run the throughput of derivation alone. The derived attendance of
+both is checked to be identical.
+
+Usage:
+    python -m benchmarks.punches [--interns 2000] [--threads 32] [--group-commit] [--journal-mode WAL]
+"""
+import argparse
+import json
+import tempfile
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import seed_interns, summarize, timer, use_temp_database
+
+_DAY = ("09:{minute:02d}:00", "12:30:00", "13:{minute:02d}:00", "17:45:00")
+
+def punch_stream(user_ids, day):
+    """Return each intern's four punches of a day as record_events() events."""
+    return [
+        [{"action": "check_in" if i % 2 == 0 else "check_out", "user_id": user_id, "date": day,
+          "time": f"{day} {clock.format(minute=user_id % 60)}", "request_key": f"{user_id}:{i}"}
+         for i, clock in enumerate(_DAY)]
+        for user_id in user_ids
+    ]
+
+def run_burst(streams, threads, write):
+    """Write every intern's punches in order, interns in parallel; return (seconds, latency samples)."""
+    latencies = []
+
+    def punch(events):
+        for event in events:
+            with timer(latencies):
+                write(event)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(punch, streams))
+    return time.perf_counter() - start, latencies
+
+def derived_rows():
+    """Return the derived attendance rows, for comparing runs."""
+    import database as db
+
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        "SELECT user_id, date, check_in_time, check_out_time, worked_seconds, break_seconds, status "
+        "FROM attendance ORDER BY user_id, date"
+    )
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the append-only punch log.")
+    parser.add_argument("--interns", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--group-commit", action="store_true", help="commit through the group-commit writer")
+    parser.add_argument("--journal-mode", default="WAL", choices=["DELETE", "WAL"])
+    parser.add_argument("--synchronous", default="NORMAL", choices=["FULL", "NORMAL"])
+    args = parser.parse_args()
+
+    use_temp_database()
+    import config
+    import database as db
+
+    config.DB_JOURNAL_MODE = args.journal_mode
+    config.DB_SYNCHRONOUS = args.synchronous
+    config.GROUP_COMMIT_ENABLED = args.group_commit
+    day = date.today().isoformat()
+
+    def append(event):
+        # The write path of record_events() without its derivation
+        if config.GROUP_COMMIT_ENABLED:
+            return db._get_group_commit_writer().submit(
+                (event["action"], event["user_id"], event["date"], event["time"])).result()
+        return db._write_events([(event["action"], event["user_id"], event["date"], event["time"])])[0][0]
+
+    runs = {}
+    derived = {}
+    for mode in ("update", "punch", "append"):
+        config.DB_PATH = use_temp_database(tempfile.mkdtemp(prefix="attendance-bench-"))
+        config.PUNCH_LOG_ENABLED = mode != "update"
+        db.init_db()
+        streams = punch_stream(seed_interns(args.interns), day)
+        write = append if mode == "append" else (lambda event: db.record_events([event]))
+
+        before = db.get_write_stats()
+        seconds, latencies = run_burst(streams, args.threads, write)
+        db.stop_group_commit()
+        start = time.perf_counter()
+        db.stop_punch_deriver()
+        catch_up_seconds = time.perf_counter() - start
+        transactions = db.get_write_stats()["transactions"] - before["transactions"]
+        punch_count = len(latencies)
+        runs[mode] = {
+            "punches": punch_count,
+            "seconds": round(seconds, 3),
+            "punches_per_second": round(punch_count / seconds, 1),
+            "transactions": transactions,
+            "latency": summarize(latencies),
+        }
+        if mode == "punch":
+            runs[mode]["deriver_catch_up_seconds"] = round(catch_up_seconds, 3)
+        if mode == "append":
+            start = time.perf_counter()
+            result = db.derive_attendance()
+            derive_seconds = time.perf_counter() - start
+            runs[mode]["derive"] = {
+                **result,
+                "seconds": round(derive_seconds, 3),
+                "punches_per_second": round(result["punches"] / derive_seconds, 1),
+            }
+        if mode != "update":
+            derived[mode] = derived_rows()
+
+    report = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "interns": args.interns,
+            "threads": args.threads,
+            "group_commit": args.group_commit,
+            "journal_mode": args.journal_mode,
+            "synchronous": args.synchronous,
+        },
+        "runs": runs,
+        "derived_rows_match": derived["punch"] == derived["append"],
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
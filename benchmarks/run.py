@@ -0,0 +1,155 @@
+"""
+Benchmark suite for the whole application.
+
+For each dataset size, generates a synthetic database (see
+benchmarks/synthetic.py) and times:
+
+- every read and write function in database.py,
+- each page's show() rendered headlessly through Streamlit's AppTest,
+- the Excel and CSV exports of the reports table.
+
+The JSON report can be compared across commits.
+
+Usage:
+    python -m benchmarks.run [--sizes 1000,10000,100000] [--days 30] [--repeat 5]
+                             [--skip-pages] [--output report.json]
+"""
+import argparse
+import json
+import platform
+import tempfile
+import time
+from datetime import date, timedelta
+from benchmarks import synthetic
+from benchmarks.common import PAGES, git_revision, measure, page_app_test, use_temp_database
+
+def benchmark_queries(dataset, repeat):
+    """Time the database.py functions against the generated dataset."""
+    import config
+    import database as db
+
+    end_date = dataset["last_date"]
+    start_date = (date.fromisoformat(end_date) - timedelta(days=30)).isoformat()
+    intern = db.get_all_users(role=config.ROLE_INTERN)[0]
+    department = intern["department"]
+
+    results = {
+        "get_departments": measure(db.get_departments, repeat),
+        "get_all_users": measure(lambda: db.get_all_users(role=config.ROLE_INTERN), repeat),
+        "get_user": measure(lambda: db.get_user(intern["id"]), repeat),
+        "verify_user": measure(lambda: db.verify_user(intern["username"], "intern"), repeat),
+        "get_attendance": measure(lambda: db.get_attendance(intern["id"], start_date, end_date), repeat),
+        "get_all_attendance": measure(lambda: db.get_all_attendance(start_date, end_date), repeat),
+        "get_all_attendance_department": measure(
+            lambda: db.get_all_attendance(start_date, end_date, department), repeat),
+        "iter_attendance_count": measure(
+            lambda: sum(1 for _ in db.iter_attendance(start_date, end_date)), repeat),
+        "get_intern_stats": measure(lambda: db.get_intern_stats(intern["id"]), repeat),
+        "rebuild_intern_stats": measure(db.rebuild_intern_stats, 1),
+    }
+
+    # Writes go to a day after the dataset, one intern per call
+    write_day = (date.fromisoformat(end_date) + timedelta(days=1)).isoformat()
+    user_ids = iter([user["id"] for user in db.get_all_users(role=config.ROLE_INTERN)])
+    results["record_check_in"] = measure(
+        lambda: db.record_check_in(next(user_ids), write_day, f"{write_day} 09:05:00"), repeat * 10)
+    return results
+
+def benchmark_pages(repeat):
+    """Time each page's show() through AppTest, after one warm-up run."""
+    import config
+    import database as db
+
+    users = {
+        "admin": db.verify_user("admin", "admin123"),
+        "intern": db.get_all_users(role=config.ROLE_INTERN)[0],
+    }
+    results = {}
+    for role, pages in PAGES.items():
+        for page, module in pages.items():
+            at = page_app_test(module, users[role])
+
+            def rerun():
+                at.run()
+                if at.exception:
+                    raise RuntimeError(at.exception[0].message)
+
+            at.run()
+            results[f"{role}/{page}"] = measure(rerun, repeat)
+    return results
+
+def benchmark_exports(dataset, repeat):
+    """Time the Excel and CSV exports of the reports table for a 30-day range."""
+    import pandas as pd
+    import database as db
+    import utils
+
+    end_date = dataset["last_date"]
+    start_date = (date.fromisoformat(end_date) - timedelta(days=30)).isoformat()
+    df = pd.DataFrame(db.get_all_attendance(start_date, end_date))
+
+    # Same formatting as pages/admin/reports.py
+    display_df = df[['name', 'date', 'check_in_time', 'check_out_time', 'status', 'department']].copy()
+    display_df['check_in_time'] = display_df['check_in_time'].apply(utils.format_time)
+    display_df['check_out_time'] = display_df['check_out_time'].apply(utils.format_time)
+    display_df.columns = ['Name', 'Date', 'Check-in', 'Check-out', 'Status', 'Department']
+
+    return {
+        "rows": len(display_df),
+        "export_to_excel": measure(lambda: utils.export_to_excel(display_df), repeat),
+        "export_to_csv": measure(lambda: utils.export_to_csv(display_df), repeat),
+    }
+
+def run_size(interns, args):
+    """Generate a dataset of the given size and benchmark it."""
+    import config
+    import database as db
+
+    config.DB_PATH = use_temp_database(tempfile.mkdtemp(prefix="attendance-bench-"))
+    db.init_db()
+    dataset = synthetic.generate(interns, args.days, seed=args.seed)
+
+    result = {"dataset": dataset, "queries": benchmark_queries(dataset, args.repeat)}
+    if not args.skip_pages:
+        result["pages"] = benchmark_pages(args.repeat)
+    if not args.skip_exports:
+        result["exports"] = benchmark_exports(dataset, max(args.repeat // 2, 1))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark database queries, pages and exports.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated intern counts")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-pages", action="store_true")
+    parser.add_argument("--skip-exports", action="store_true")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Must happen before config/database are imported
+    use_temp_database()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "days": args.days,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "sizes": {},
+    }
+    for size in (int(value) for value in args.sizes.split(",")):
+        report["sizes"][str(size)] = run_size(size, args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
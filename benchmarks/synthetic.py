@@ -0,0 +1,127 @@
+"""
+Synthetic dataset generator for benchmarks.
+
+Creates interns spread across the departments table and a history of
+check-ins over working days (Monday to Friday). Each working day an
+intern is absent, late, on a half day or on time with the given
+probabilities. Statuses follow the same rule as database.determine_status.
+
+Usage:
+    python -m benchmarks.synthetic --interns 1000 --days 30 [--db PATH]
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+from benchmarks.common import seed_interns, use_temp_database
+
+def working_days(days, end_date=None):
+    """Return the working days in the `days` calendar days ending at end_date (default today)."""
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=days - 1)
+    return [
+        start_date + timedelta(days=offset)
+        for offset in range(days)
+        if (start_date + timedelta(days=offset)).weekday() < 5
+    ]
+
+def _attendance_rows(user_ids, days, late_rate, absent_rate, half_day_rate, rng):
+    """Yield (user_id, date, check_in_time, check_out_time, status) tuples."""
+    import config
+
+    start_hour, start_minute = map(int, config.WORK_START_TIME.split(":"))
+    work_start = start_hour * 60 + start_minute
+    late_after = work_start + config.LATE_THRESHOLD
+
+    for day in days:
+        day_str = day.isoformat()
+        for user_id in user_ids:
+            roll = rng.random()
+            if roll < absent_rate:
+                continue
+            if roll < absent_rate + late_rate:
+                check_in = rng.randint(late_after + 1, late_after + 90)
+            else:
+                check_in = rng.randint(work_start - 30, late_after)
+            if roll > 1 - half_day_rate:
+                check_out = rng.randint(12 * 60, 14 * 60)
+                status = config.STATUS_HALF_DAY
+            else:
+                check_out = rng.randint(16 * 60 + 30, 18 * 60 + 30)
+                status = config.STATUS_LATE if check_in > late_after else config.STATUS_PRESENT
+            yield (
+                user_id,
+                day_str,
+                f"{day_str} {check_in // 60:02d}:{check_in % 60:02d}:{rng.randint(0, 59):02d}",
+                f"{day_str} {check_out // 60:02d}:{check_out % 60:02d}:{rng.randint(0, 59):02d}",
+                status,
+            )
+
+def generate(interns, days=30, late_rate=0.15, absent_rate=0.08, half_day_rate=0.03, seed=42, end_date=None):
+    """
+    Populate the configured database with synthetic interns and attendance.
+
+    Args:
+        interns: Number of interns to create
+        days: Number of calendar days of history, ending at end_date
+        late_rate: Probability that an intern is late on a working day
+        absent_rate: Probability that an intern is absent on a working day
+        half_day_rate: Probability that an intern leaves for a half day
+        seed: Random seed, so runs are comparable across commits
+        end_date: Last day of history (default today)
+
+    Returns:
+        dict: Counts and timings of the generated data
+    """
+    import database as db
+    import storage
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    user_ids = seed_interns(interns)
+    days = working_days(days, end_date)
+
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    rows = list(_attendance_rows(user_ids, days, late_rate, absent_rate, half_day_rate, rng))
+    storage.get_backend().bulk_insert(
+        cursor, "attendance", ("user_id", "date", "check_in_time", "check_out_time", "status"), rows)
+    attendance_rows = len(rows)
+    conn.commit()
+    conn.close()
+
+    db.rebuild_intern_stats()
+    return {
+        "interns": interns,
+        "working_days": len(days),
+        "attendance_rows": attendance_rows,
+        "first_date": days[0].isoformat() if days else None,
+        "last_date": days[-1].isoformat() if days else None,
+        "generate_seconds": round(time.perf_counter() - start, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic attendance dataset.")
+    parser.add_argument("--interns", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--late-rate", type=float, default=0.15)
+    parser.add_argument("--absent-rate", type=float, default=0.08)
+    parser.add_argument("--half-day-rate", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="database file to populate (default: a new temporary file)")
+    args = parser.parse_args()
+
+    if args.db:
+        import os
+        os.environ["ATTENDANCE_DB_PATH"] = os.path.abspath(args.db)
+        path = os.environ["ATTENDANCE_DB_PATH"]
+    else:
+        path = use_temp_database()
+
+    summary = generate(args.interns, args.days, args.late_rate, args.absent_rate, args.half_day_rate, args.seed)
+    summary["db_path"] = path
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
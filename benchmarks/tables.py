@@ -0,0 +1,175 @@
+"""
+Benchmark of the Reports page's attendance table data path.
+
+Generates a synthetic history (about 100k attendance rows in the range by
+default) and builds the Reports page's formatted attendance table, up to
+the bytes Streamlit sends to the browser, along each path:
+
+- records: database.get_all_attendance() records, a pandas DataFrame
+  formatted with utils.format_time() per value, converted to Arrow by
+  Streamlit (the path before the Arrow tables),
+- arrow: database.get_attendance_table(), formatted in Arrow compute and
+  handed to Streamlit as an Arrow table,
+- duckdb: the same query read into Arrow by DuckDB's sqlite extension,
+  formatted in Arrow compute, for reference (skipped when unavailable).
+
+Each path runs in its own spawned process. Its first run reports the peak
+memory of Python objects (tracemalloc) and of Arrow buffers (the pyarrow
+memory pool), the others its latency over --repeat runs. The formatted
+tables of all paths are checked to be equal.
+
+Usage:
+    python -m benchmarks.tables [--interns 1000] [--days 140] [--repeat 5] [--output tables.json]
+"""
+import argparse
+import json
+import multiprocessing
+import time
+import tracemalloc
+from datetime import date, timedelta
+from benchmarks import synthetic
+from benchmarks.common import git_revision, summarize, timer, use_temp_database
+
+PATHS = ("records", "arrow", "duckdb")
+
+_COLUMNS = ['name', 'date', 'check_in_time', 'check_out_time', 'status', 'department']
+_LABELS = ['Name', 'Date', 'Check-in', 'Check-out', 'Status', 'Department']
+
+def _format(table):
+    """Format an Arrow attendance table for display, as the Reports page does."""
+    import pyarrow as pa
+    import utils
+
+    return pa.table({
+        'Name': table['name'],
+        'Date': table['date'],
+        'Check-in': utils.format_time_column(table['check_in_time']),
+        'Check-out': utils.format_time_column(table['check_out_time']),
+        'Status': table['status'],
+        'Department': table['department'],
+    })
+
+def records_path(start_date, end_date):
+    """Build the table bytes from records and a pandas DataFrame; returns (bytes, formatted table)."""
+    import pandas as pd
+    import database as db
+    import utils
+    from streamlit import dataframe_util
+
+    df = pd.DataFrame(db.get_all_attendance(start_date, end_date))
+    display_df = df[_COLUMNS].copy()
+    display_df['date'] = pd.to_datetime(display_df['date']).dt.strftime('%Y-%m-%d')
+    display_df['check_in_time'] = display_df['check_in_time'].apply(utils.format_time)
+    display_df['check_out_time'] = display_df['check_out_time'].apply(utils.format_time)
+    display_df.columns = _LABELS
+    return dataframe_util.convert_pandas_df_to_arrow_bytes(display_df), display_df
+
+def arrow_path(start_date, end_date):
+    """Build the table bytes from an Arrow table read column-wise from the cursor."""
+    import database as db
+    from streamlit import dataframe_util
+
+    display_table = _format(db.get_attendance_table(start_date, end_date, columns=_COLUMNS))
+    return dataframe_util.convert_arrow_table_to_arrow_bytes(display_table), display_table
+
+def duckdb_path(start_date, end_date):
+    """Build the table bytes from an Arrow table read by DuckDB's sqlite extension."""
+    import duckdb
+    import config
+    from streamlit import dataframe_util
+
+    con = duckdb.connect()
+    try:
+        con.execute("LOAD sqlite")
+        con.execute(f"ATTACH '{config.DB_PATH}' AS live (TYPE sqlite, READ_ONLY)")
+        table = con.execute(
+            """
+            SELECT u.name, CAST(a.date AS VARCHAR) AS date, CAST(a.check_in_time AS VARCHAR) AS check_in_time,
+                   CAST(a.check_out_time AS VARCHAR) AS check_out_time, a.status, u.department
+            FROM live.attendance a
+            JOIN live.users u ON a.user_id = u.id
+            WHERE a.date >= ? AND a.date <= ?
+            ORDER BY a.date DESC, u.name
+            """,
+            [start_date, end_date]
+        ).arrow()
+    finally:
+        con.close()
+    if hasattr(table, "read_all"):
+        table = table.read_all()
+    display_table = _format(table)
+    return dataframe_util.convert_arrow_table_to_arrow_bytes(display_table), display_table
+
+def run_path(path, start_date, end_date, repeat):
+    """Run one path in this process; returns its memory, latency and formatted rows."""
+    build = {"records": records_path, "arrow": arrow_path, "duckdb": duckdb_path}[path]
+    # Imported before measuring, so module objects are not counted
+    import pandas  # noqa: F401
+    import pyarrow as pa
+    import utils  # noqa: F401
+    import streamlit.dataframe_util  # noqa: F401
+
+    tracemalloc.start()
+    try:
+        payload, table = build(start_date, end_date)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        python_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    arrow_peak = pa.default_memory_pool().max_memory()
+    rows = table.to_pylist() if hasattr(table, "to_pylist") else table.to_dict("records")
+
+    latencies = []
+    for _ in range(repeat):
+        with timer(latencies):
+            build(start_date, end_date)
+    return {
+        "rows": len(rows),
+        "payload_kib": round(len(payload) / 1024, 1),
+        "python_peak_mib": round(python_peak / 2 ** 20, 1),
+        "arrow_peak_mib": round(arrow_peak / 2 ** 20, 1),
+        "latency": summarize(latencies),
+        "table": rows,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the attendance table data paths.")
+    parser.add_argument("--interns", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=140)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    # Must happen before config/database are imported; spawned processes inherit the environment
+    use_temp_database()
+
+    dataset = synthetic.generate(args.interns, args.days, seed=args.seed)
+    start_date = (date.fromisoformat(dataset["last_date"]) - timedelta(days=args.days - 1)).isoformat()
+
+    context = multiprocessing.get_context("spawn")
+    paths = {}
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for path in PATHS:
+            paths[path] = pool.apply(run_path, (path, start_date, dataset["last_date"], args.repeat))
+
+    tables = {path: result.pop("table") for path, result in paths.items() if "table" in result}
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "dataset": dataset,
+        "paths": paths,
+        "tables_match": all(table == tables["records"] for table in tables.values()),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Query result cache shared by the application's worker processes.
+
+Results of database.py reads and analytics.py aggregations are cached in
+two tiers:
+
+- memory: an LRU of config.CACHE_MEMORY_SIZE entries in each process.
+- shared: optional, selected by config.CACHE_SHARED. "disk" keeps results
+  in config.CACHE_DIR, shared by the processes on one host; "redis" uses
+  the Redis-compatible server at config.REDIS_URL, shared by every host.
+  Both expire entries after config.CACHE_TTL_SECONDS.
+
+Shared entries are encoded as JSON, never pickled, so whoever can write to
+the shared tier cannot make the application run code. Records must be
+registered with serializable() to be rebuilt, and DataFrames and Arrow
+tables are embedded in the Arrow IPC format. Results of other types are
+only cached in memory.
+
+Every cache key includes the database's data version (see
+database.get_data_version()), which each write transaction increments.
+A write in one worker therefore invalidates the entries of all workers,
+and stale entries are never read; they simply age out.
+"""
+import base64
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as time_of_day
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import config
+
+# Shared entries
+_RECORD_TYPES = {}
+
+def serializable(record_type):
+    """Register a namedtuple record type, so shared tiers can rebuild cached results containing it."""
+    _RECORD_TYPES[f"{record_type.__module__}.{record_type.__qualname__}"] = record_type
+    return record_type
+
+def _arrow_bytes(table):
+    """Serialize an Arrow table in the IPC stream format, as base64 text."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii")
+
+def _arrow_table(text):
+    """Read an Arrow table written by _arrow_bytes."""
+    return pa.ipc.open_stream(base64.b64decode(text)).read_all()
+
+def _dataframe(text, objects):
+    """Read a DataFrame encoded by _to_json, restoring its object columns."""
+    table = _arrow_table(text)
+    frame = table.to_pandas()
+    for i in objects:
+        frame.isetitem(i, pd.Series(table.column(i).to_pylist(), index=frame.index, dtype=object))
+    return frame
+
+def _to_json(value):
+    """
+    Convert a cached result to JSON-compatible values, tagging the types JSON lacks.
+
+    Raises:
+        TypeError: If the result contains a value that cannot be shared
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, tuple):
+        if hasattr(value, "_fields"):
+            name = f"{type(value).__module__}.{type(value).__qualname__}"
+            if _RECORD_TYPES.get(name) is not type(value):
+                raise TypeError(f"{name} is not registered with cache.serializable")
+            return {"__record__": [name, [_to_json(item) for item in value]]}
+        return {"__tuple__": [_to_json(item) for item in value]}
+    if isinstance(value, dict):
+        return {"__dict__": [[_to_json(key), _to_json(item)] for key, item in value.items()]}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, time_of_day):
+        return {"__time__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, np.generic):
+        return _to_json(value.item())
+    try:
+        if isinstance(value, pd.DataFrame):
+            # Arrow reads strings back as pandas' string dtype; remember which columns were objects
+            objects = [i for i, dtype in enumerate(value.dtypes) if dtype == object]
+            return {"__dataframe__": [_arrow_bytes(pa.Table.from_pandas(value)), objects]}
+        if isinstance(value, pa.Table):
+            return {"__table__": _arrow_bytes(value)}
+    except pa.ArrowException as e:
+        raise TypeError(f"cannot encode {type(value).__name__}: {e}") from None
+    raise TypeError(f"cannot share a cached {type(value).__name__}")
+
+_DECODERS = {
+    "__record__": lambda value: _RECORD_TYPES[value[0]]._make(value[1]),
+    "__tuple__": tuple,
+    "__dict__": dict,
+    "__datetime__": datetime.fromisoformat,
+    "__date__": date.fromisoformat,
+    "__time__": time_of_day.fromisoformat,
+    "__decimal__": Decimal,
+    "__dataframe__": lambda value: _dataframe(*value),
+    "__table__": _arrow_table,
+}
+
+def _from_json(obj):
+    """json.loads object hook rebuilding the values tagged by _to_json."""
+    if len(obj) == 1:
+        (tag, value), = obj.items()
+        if tag in _DECODERS:
+            return _DECODERS[tag](value)
+    return obj
+
+def _dumps(value, expires_at):
+    """
+    Encode a cached result for a shared tier.
+
+    Raises:
+        TypeError: If the result cannot be shared
+    """
+    return json.dumps({"expires_at": expires_at, "value": _to_json(value)}, separators=(",", ":")).encode()
+
+def _loads(data):
+    """
+    Decode an entry written by _dumps().
+
+    Returns:
+        tuple: (expiry timestamp, cached result)
+
+    Raises:
+        ValueError: If the entry is corrupt or holds an unregistered record type
+    """
+    try:
+        entry = json.loads(data, object_hook=_from_json)
+        return entry["expires_at"], entry["value"]
+    except (KeyError, TypeError, IndexError, pa.ArrowException) as e:
+        raise ValueError(f"invalid cache entry: {e}") from None
+
+class MemoryTier:
+    """In-process LRU."""
+    name = "memory"
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def size(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class DiskTier:
+    """JSON entries in a directory shared by the processes on one host."""
+    name = "disk"
+    _PRUNE_EVERY = 100
+
+    def __init__(self, directory, ttl, max_entries):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at, value = _loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value):
+        try:
+            data = _dumps(value, time.time() + self.ttl)
+        except TypeError:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        self._writes += 1
+        if self._writes % self._PRUNE_EVERY == 0:
+            self._prune()
+
+    def _prune(self):
+        """Delete expired entries, then the oldest ones beyond max_entries."""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        entries.sort()
+        expired_before = time.time() - self.ttl
+        excess = len(entries) - self.max_entries
+        for i, (modified, path) in enumerate(entries):
+            if modified < expired_before or i < excess:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def size(self):
+        return len(glob.glob(os.path.join(self.directory, "*.json")))
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+class RedisTier:
+    """Entries in a Redis-compatible server shared by every host."""
+    name = "redis"
+    _PREFIX = "attendance:cache:"
+
+    def __init__(self, url, ttl):
+        import redis
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+        self._errors = (redis.RedisError,)
+
+    def get(self, key):
+        try:
+            data = self._client.get(self._PREFIX + key)
+        except self._errors:
+            return None
+        if data is None:
+            return None
+        try:
+            return _loads(data)[1]
+        except ValueError:
+            return None
+
+    def set(self, key, value):
+        try:
+            data = _dumps(value, time.time() + self.ttl)
+        except TypeError:
+            return
+        try:
+            self._client.set(self._PREFIX + key, data, ex=self.ttl)
+        except self._errors:
+            pass
+
+    def size(self):
+        try:
+            return sum(1 for _ in self._client.scan_iter(self._PREFIX + "*"))
+        except self._errors:
+            return None
+
+    def clear(self):
+        try:
+            for key in self._client.scan_iter(self._PREFIX + "*"):
+                self._client.delete(key)
+        except self._errors:
+            pass
+
+_tiers = None
+_tiers_lock = threading.Lock()
+_counters = {}
+
+def _get_tiers():
+    """Create the configured tiers on first use."""
+    global _tiers
+    with _tiers_lock:
+        if _tiers is None:
+            tiers = [MemoryTier(config.CACHE_MEMORY_SIZE)]
+            if config.CACHE_SHARED == "disk":
+                tiers.append(DiskTier(config.CACHE_DIR, config.CACHE_TTL_SECONDS, config.CACHE_DISK_MAX_ENTRIES))
+            elif config.CACHE_SHARED == "redis":
+                tiers.append(RedisTier(config.REDIS_URL, config.CACHE_TTL_SECONDS))
+            elif config.CACHE_SHARED not in ("", "none"):
+                raise ValueError(f"Unknown CACHE_SHARED tier: {config.CACHE_SHARED}")
+            for tier in tiers:
+                _counters[tier.name] = {"hits": 0, "misses": 0}
+            _tiers = tiers
+        return _tiers
+
+def _count(tier, outcome):
+    with _tiers_lock:
+        _counters[tier.name][outcome] += 1
+
+def _copy(value):
+    """Give each caller its own list/DataFrame, so callers cannot modify cached results."""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return value
+
+def cached(version):
+    """
+    Cache a function's results in the configured tiers.
+
+    Args:
+        version: Callable returning the current data version; results
+            are cached per version
+
+    Returns:
+        callable: Decorator
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not config.CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = hashlib.sha1(repr((name, version(), tuple(bound.arguments.items()))).encode()).hexdigest()
+
+            tiers = _get_tiers()
+            for i, tier in enumerate(tiers):
+                value = tier.get(key)
+                if value is not None:
+                    _count(tier, "hits")
+                    # Promote to the faster tiers
+                    for faster in tiers[:i]:
+                        faster.set(key, value)
+                    return _copy(value)
+                _count(tier, "misses")
+
+            value = func(*args, **kwargs)
+            if value is not None:
+                for tier in tiers:
+                    tier.set(key, value)
+            return _copy(value)
+
+        return wrapper
+    return decorator
+
+def get_cache_stats():
+    """
+    Get per-tier cache counters.
+
+    Returns:
+        list: One dict per tier with its name, entries, hits, misses and hit rate
+    """
+    stats = []
+    for tier in _get_tiers():
+        counters = dict(_counters[tier.name])
+        lookups = counters["hits"] + counters["misses"]
+        stats.append({
+            "tier": tier.name,
+            "entries": tier.size(),
+            **counters,
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+        })
+    return stats
+
+def clear():
+    """Drop all cached results and reset the counters."""
+    for tier in _get_tiers():
+        tier.clear()
+        _counters[tier.name] = {"hits": 0, "misses": 0}
@@ -0,0 +1,253 @@
+"""
+Cached plotly figures for the attendance tracking system.
+
+Building a figure with plotly express costs tens of milliseconds, and pages
+rebuild every chart on each rerun even when only an unrelated widget changed.
+plot() keys figures by a hash of the aggregated input frame and the chart
+options, and returns the figure built for an identical frame earlier.
+
+Long date ranges are kept to a bounded payload: time_bucket() picks the
+daily, weekly, monthly or yearly buckets that keep trend lines within
+config.CHART_MAX_POINTS points (aggregated in SQL by
+analytics.daily_by_status()), line and scatter charts with more than
+config.CHART_WEBGL_POINTS points are drawn with WebGL, and
+calendar_heatmap() shows at most config.CHART_CALENDAR_MAX_DAYS days,
+annotating cells only for short ranges. While profiling is on (see
+profiling.is_enabled()), the JSON size of every figure built is kept for
+the Performance page (get_payload_stats()); measuring it serializes the
+figure once more.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import pandas as pd
+import plotly.express as px
+import config
+import metrics
+import profiling
+
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+_cache_counters = {"hits": 0, "misses": 0}
+_payloads = {}
+
+# Time buckets: (analytics bucket, days per bucket, chart title prefix)
+_BUCKETS = (("day", 1, "Daily"), ("week", 7, "Weekly"), ("month", 365.25 / 12, "Monthly"), ("year", 365.25, "Yearly"))
+
+STATUS_COLORS = {
+    config.STATUS_PRESENT: '#28a745',  # Green
+    config.STATUS_LATE: '#ffc107',     # Yellow
+    config.STATUS_HALF_DAY: '#17a2b8', # Blue
+    config.STATUS_ABSENT: '#dc3545'    # Red
+}
+
+# Numeric value of each status in calendar heatmaps
+_STATUS_VALUES = {
+    config.STATUS_PRESENT: 3,
+    config.STATUS_LATE: 2,
+    config.STATUS_HALF_DAY: 1,
+    config.STATUS_ABSENT: 0
+}
+
+_DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def _json_default(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+def _cache_key(kind, frame, options, layout, traces=None):
+    """Hash the chart kind, options, layout, trace updates and the frame's labels, dtypes and values."""
+    digest = hashlib.sha1()
+    digest.update(kind.encode())
+    digest.update(json.dumps([options, layout, traces], sort_keys=True, default=_json_default).encode())
+    digest.update(json.dumps([list(frame.columns), list(frame.dtypes.astype(str))], default=str).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+    return digest.hexdigest()
+
+def plot(kind, frame, layout=None, traces=None, **options):
+    """
+    Build a plotly express figure, reusing the figure built for identical input.
+
+    The returned figure may be shared with other sessions, so callers must
+    not modify it; pass layout changes (including annotations) through
+    `layout` and trace changes through `traces` instead.
+
+    Args:
+        kind: Name of the plotly express function, e.g. "line", "pie", "bar" or "imshow"
+        frame: Aggregated DataFrame to plot
+        layout: Arguments for fig.update_layout()
+        traces: Arguments for fig.update_traces()
+        **options: Arguments for the plotly express function
+
+    Returns:
+        plotly.graph_objects.Figure: The figure
+    """
+    points = frame.size if kind == "imshow" else len(frame)
+    if kind in ("line", "scatter") and points > config.CHART_WEBGL_POINTS:
+        options.setdefault("render_mode", "webgl")
+    key = _cache_key(kind, frame, options, layout, traces)
+
+    with _figure_cache_lock:
+        fig = _figure_cache.get(key)
+        if fig is not None:
+            _figure_cache.move_to_end(key)
+            _cache_counters["hits"] += 1
+            return fig
+        _cache_counters["misses"] += 1
+
+    with metrics.span(f"charts.{kind}"):
+        fig = getattr(px, kind)(frame, **options)
+        if layout:
+            fig.update_layout(**layout)
+        if traces:
+            fig.update_traces(**traces)
+    payload = None
+    if profiling.is_enabled():
+        payload = {
+            "kind": kind,
+            "points": points,
+            "webgl": options.get("render_mode") == "webgl",
+            "bytes": len(fig.to_json()),
+        }
+
+    with _figure_cache_lock:
+        if payload is not None:
+            _payloads[options.get("title") or kind] = payload
+        _figure_cache[key] = fig
+        while len(_figure_cache) > config.FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return fig
+
+def time_bucket(start_date, end_date, max_points=None):
+    """
+    Pick the finest time bucket that keeps a trend line within a number of points.
+
+    Args:
+        start_date: First date of the range
+        end_date: Last date of the range
+        max_points: Optional cap (default: config.CHART_MAX_POINTS)
+
+    Returns:
+        tuple: (bucket for analytics.daily_by_status(), chart title prefix such as "Weekly")
+    """
+    days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    max_points = max_points or config.CHART_MAX_POINTS
+    for bucket, bucket_days, label in _BUCKETS:
+        if days / bucket_days <= max_points:
+            break
+    return bucket, label
+
+def calendar_heatmap(days, start_date, end_date, title="Attendance Calendar", max_days=None, annotated_days=None):
+    """
+    Build a week-by-weekday calendar heatmap of daily statuses.
+
+    Ranges longer than max_days show their most recent max_days days. Cells
+    carry the date and status as hover text, and are also annotated when
+    the range shown has at most annotated_days days.
+
+    Args:
+        days: DataFrame indexed by date (YYYY-MM-DD) with a status column and
+            optionally a check_ins column; missing days count as absent
+        start_date: First date of the range
+        end_date: Last date of the range
+        title: Chart title
+        max_days: Optional cap on days shown (default: config.CHART_CALENDAR_MAX_DAYS)
+        annotated_days: Optional annotation limit (default: config.CHART_CALENDAR_ANNOTATED_DAYS)
+
+    Returns:
+        tuple: (figure, first date shown)
+    """
+    max_days = max_days or config.CHART_CALENDAR_MAX_DAYS
+    annotated_days = config.CHART_CALENDAR_ANNOTATED_DAYS if annotated_days is None else annotated_days
+    end_date = pd.Timestamp(end_date)
+    start_date = max(pd.Timestamp(start_date), end_date - pd.Timedelta(days=max_days - 1))
+
+    calendar_df = pd.DataFrame({'date': pd.date_range(start=start_date, end=end_date)})
+    iso = calendar_df['date'].dt.isocalendar()
+    calendar_df['week'] = iso['year'].astype(str) + "-W" + iso['week'].astype(str).str.zfill(2)
+    calendar_df['day'] = calendar_df['date'].dt.day_name()
+    calendar_df['date_str'] = calendar_df['date'].dt.strftime('%Y-%m-%d')
+    calendar_df['status'] = calendar_df['date_str'].map(days['status']).fillna(config.STATUS_ABSENT)
+    calendar_df['status_value'] = calendar_df['status'].map(_STATUS_VALUES)
+    calendar_df['label'] = calendar_df['date_str'] + "<br>" + calendar_df['status']
+    if 'check_ins' in days:
+        check_ins = calendar_df['date_str'].map(days['check_ins']).fillna(0).astype(int)
+        calendar_df['label'] += " (" + check_ins.astype(str) + " check-ins)"
+        calendar_df['text'] = calendar_df['date'].dt.day.astype(str) + "<br>" + check_ins.astype(str) + " " + calendar_df['status']
+    else:
+        calendar_df['text'] = calendar_df['date'].dt.day.astype(str) + "<br>" + calendar_df['status']
+
+    # Week rows (ISO year and week, so long ranges do not fold onto one year) by weekday columns
+    calendar_pivot = calendar_df.pivot_table(index='week', columns='day', values='status_value', aggfunc='first')
+    calendar_pivot = calendar_pivot.reindex(columns=_DAY_ORDER)
+    hover = calendar_df.pivot(index='week', columns='day', values='label').reindex(
+        index=calendar_pivot.index, columns=_DAY_ORDER).fillna("")
+
+    annotations = []
+    if len(calendar_df) <= annotated_days:
+        week_positions = {week: i for i, week in enumerate(calendar_pivot.index)}
+        day_positions = {day: j for j, day in enumerate(calendar_pivot.columns)}
+        annotations = [
+            dict(
+                x=day_positions[row.day],
+                y=week_positions[row.week],
+                text=row.text,
+                showarrow=False,
+                font=dict(color="white" if row.status in [config.STATUS_ABSENT, config.STATUS_PRESENT] else "black")
+            )
+            for row in calendar_df.itertuples(index=False)
+        ]
+
+    fig = plot(
+        "imshow",
+        calendar_pivot,
+        labels=dict(x="Day of Week", y="Week", color="Status"),
+        x=calendar_pivot.columns,
+        y=calendar_pivot.index,
+        color_continuous_scale=[
+            [0.0, STATUS_COLORS[config.STATUS_ABSENT]],
+            [0.33, STATUS_COLORS[config.STATUS_HALF_DAY]],
+            [0.66, STATUS_COLORS[config.STATUS_LATE]],
+            [1.0, STATUS_COLORS[config.STATUS_PRESENT]]
+        ],
+        title=title,
+        layout=dict(
+            plot_bgcolor='rgba(0,0,0,0)',
+            height=max(400, 22 * len(calendar_pivot)),
+            xaxis=dict(side="top"),
+            coloraxis_showscale=False,
+            annotations=annotations
+        ),
+        traces=dict(customdata=hover.values, hovertemplate="%{customdata}<extra></extra>"),
+    )
+    return fig, start_date.date()
+
+def get_payload_stats():
+    """
+    Get the size of the last figure built for each chart while profiling.
+
+    Returns:
+        list: Dicts with the chart title, kind, data points, whether WebGL is used and JSON bytes
+    """
+    with _figure_cache_lock:
+        return [{"chart": chart, **payload} for chart, payload in _payloads.items()]
+
+def get_cache_stats():
+    """
+    Get figure cache counters.
+
+    Returns:
+        dict: Number of cached figures, hits and misses
+    """
+    with _figure_cache_lock:
+        return {"size": len(_figure_cache), **_cache_counters}
+
+def clear_cache():
+    """Drop all cached figures and reset the counters."""
+    with _figure_cache_lock:
+        _figure_cache.clear()
+        _payloads.clear()
+        _cache_counters["hits"] = 0
+        _cache_counters["misses"] = 0
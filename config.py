@@ -13,7 +13,23 @@ load_dotenv()
 BASE_DIR = Path(__file__).parent
 
 # Database
-DB_PATH = os.path.join(BASE_DIR, "data", "attendance.db")
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")  # sqlite or postgres (see storage.py)
+DB_PATH = os.getenv("ATTENDANCE_DB_PATH", os.path.join(BASE_DIR, "data", "attendance.db"))
+DATABASE_URL = os.getenv("DATABASE_URL")  # PostgreSQL connection string, for DB_BACKEND=postgres
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+FETCH_BATCH_SIZE = 500  # Rows pulled per fetchmany() call when streaming results
+
+# Write durability: FULL syncs on every commit; NORMAL (safe with WAL) may lose
+# the last commits on power loss but never corrupts the database
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "FULL")
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "DELETE")  # WAL for concurrent readers
+
+# Group commit: check-in/out writes are queued and committed together by a
+# writer thread, trading a few milliseconds of latency for fewer fsyncs
+GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "false").lower() in ("1", "true", "yes")
+GROUP_COMMIT_MAX_DELAY_MS = int(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "256"))
 
 # Application settings
 APP_NAME = "Blaze"
@@ -40,6 +56,88 @@ WORK_START_TIME = "09:00"  # 9 AM
 WORK_END_TIME = "17:00"    # 5 PM
 LATE_THRESHOLD = 30        # Minutes
 
+# Intern search pickers
+USER_SEARCH_LIMIT = 20  # Matches offered per search
+INTERN_PAGE_SIZE = 100  # Interns shown per page of the Intern List
+
+# Status recomputation (database.recompute_statuses)
+STATUS_RECOMPUTE_BATCH = 100000  # Rows evaluated and written back per transaction
+
+# Punch log: append check-ins/outs to punch_events and derive attendance from
+# them in the background (database.PunchDeriver), keeping every session and
+# break of a day
+PUNCH_LOG_ENABLED = os.getenv("PUNCH_LOG_ENABLED", "false").lower() in ("1", "true", "yes")
+PUNCH_DERIVE_BATCH = 10000  # Punches folded into attendance per transaction
+PUNCH_DERIVE_DELAY_MS = int(os.getenv("PUNCH_DERIVE_DELAY_MS", "200"))  # Wait for more punches before deriving
+
+# Check-in/out deduplication
+ACTION_DEDUP_WINDOW = 10   # Seconds a repeated check-in/out is answered from memory
+ACTION_CACHE_SIZE = 1024   # Recent check-in/out requests remembered per process
+
+# Check-in ingestion service (ingest.py)
+INGEST_HOST = os.getenv("INGEST_HOST", "127.0.0.1")
+INGEST_PORT = int(os.getenv("INGEST_PORT", "8502"))
+INGEST_API_TOKEN = os.getenv("INGEST_API_TOKEN")  # Required as a Bearer token when set
+INGEST_QUEUE_SIZE = 10000    # Events accepted but not yet committed before returning 503
+INGEST_BATCH_SIZE = 500      # Maximum events committed per transaction
+INGEST_BATCH_DELAY_MS = 20   # Maximum time an event waits for its batch to fill
+INGEST_RETRY_DELAY_MS = 100  # First wait before retrying a batch that failed to commit
+INGEST_RETRY_MAX_DELAY_MS = 5000  # Longest wait between retries; acknowledged events are never dropped
+
+# Instrumentation (metrics.py)
+METRICS_WINDOW = 1024       # Recent samples per metric used for p50/p95/p99
+METRICS_MAX_SHAPES = 20     # Distinct argument shapes tracked per metric
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0")) or None  # Serve /metrics locally when set
+
+# Slow query log (slow_queries.py)
+# Off by default: tracing adds a callback to every statement and VM progress check of every connection
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_THRESHOLD_MS = int(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_PROGRESS_STEPS = 1000  # SQLite VM instructions between progress callbacks
+SLOW_QUERY_LOG_PATH = os.getenv("SLOW_QUERY_LOG_PATH", os.path.join(os.path.dirname(DB_PATH), "slow_queries.jsonl"))
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+
+# Parquet archive of closed months (archive.py)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(DB_PATH), "archive"))
+ARCHIVE_KEEP_MONTHS = int(os.getenv("ARCHIVE_KEEP_MONTHS", "2"))  # Including the current month
+
+# Presence bitmap index (presence.py)
+PRESENCE_INDEX_PATH = os.getenv("PRESENCE_INDEX_PATH", os.path.join(os.path.dirname(DB_PATH), "presence.npz"))
+PRESENCE_SAVE_EVERY = 1000  # Check-ins indexed between saves of the index file
+
+# Report aggregation engine (analytics.py): sqlite or duckdb
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "sqlite")
+
+# Headless reports (report.py)
+REPORT_DIR = os.getenv("REPORT_DIR", os.path.join(os.path.dirname(DB_PATH), "reports"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", str(os.cpu_count() or 1)))
+
+# Figure cache (charts.py)
+FIGURE_CACHE_SIZE = 128  # Most recently used figures kept in memory
+
+# Chart downsampling (charts.py)
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "200"))  # Points per trend line before coarser time buckets
+CHART_WEBGL_POINTS = int(os.getenv("CHART_WEBGL_POINTS", "1000"))  # Line/scatter points above which WebGL is used
+CHART_CALENDAR_MAX_DAYS = int(os.getenv("CHART_CALENDAR_MAX_DAYS", "371"))  # Most recent days in calendar heatmaps
+CHART_CALENDAR_ANNOTATED_DAYS = int(os.getenv("CHART_CALENDAR_ANNOTATED_DAYS", "93"))  # Days with cell annotations
+
+# Query result cache (cache.py)
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_MEMORY_SIZE = int(os.getenv("CACHE_MEMORY_SIZE", "256"))  # Results kept in each process
+CACHE_SHARED = os.getenv("CACHE_SHARED", "none")  # Shared tier: none, disk or redis
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(DB_PATH), "cache"))
+CACHE_DISK_MAX_ENTRIES = int(os.getenv("CACHE_DISK_MAX_ENTRIES", "2000"))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "3600"))  # Shared tier entries expire after this
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Page profiling (profiling.py)
+PROFILING_ENABLED = os.getenv("PROFILE_PAGES", "false").lower() in ("1", "true", "yes")
+PROFILER = os.getenv("PROFILER", "cprofile")  # cprofile or pyinstrument
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "data", "profiles"))
+PROFILE_MAX_RUNS = 200  # Older profiles are deleted
+
 # Initialize session state
 def init_session_state():
     """Initialize the session state variables."""
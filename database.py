@@ -1,50 +1,177 @@
 """
 Database operations for the attendance tracking system.
 """
+import atexit
+import bisect
+import calendar
+import heapq
+import logging
 import os
-import sqlite3
+import queue
+import threading
+import uuid
+from concurrent.futures import Future, wait
+from collections import OrderedDict, namedtuple
+import numpy as np
 import pandas as pd
-from datetime import datetime
+import pyarrow as pa
+from datetime import datetime, timedelta
+from itertools import groupby
+from time import monotonic, sleep
 import config
+import metrics
+import archive
+import cache
+import presence
+import punches
+import schedules
+import storage
 from passlib.hash import pbkdf2_sha256
 import pytz
 
+logger = logging.getLogger(__name__)
+
 # Ensure data directory exists
 os.makedirs(os.path.dirname(config.DB_PATH), exist_ok=True)
 
+# Row types
+# Password hashes are left out of User records, which are cached and may be shared (see verify_user)
+USER_COLUMNS = ("id", "username", "role", "name", "email", "department", "created_at")
+ATTENDANCE_COLUMNS = ("id", "user_id", "date", "check_in_time", "check_out_time", "status", "notes")
+DEPARTMENT_COLUMNS = ("id", "name")
+POLICY_COLUMNS = ("id", "department", "work_start", "late_threshold", "effective_from")
+PUNCH_COLUMNS = ("id", "user_id", "date", "kind", "time")
+SCHEDULE_COLUMNS = ("id", "department", "user_id", "weekday", "start_time", "end_time", "effective_from", "effective_to")
+
+class _RecordMixin:
+    """Mapping-style access for row records, so row['column'] keeps working."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        """Return the value of a column, or default if the record has no such column."""
+        return getattr(self, key, default)
+
+    def keys(self):
+        """Return the column names of the record."""
+        return self._fields
+
+@cache.serializable
+class User(_RecordMixin, namedtuple("User", USER_COLUMNS)):
+    """A row of the users table."""
+    __slots__ = ()
+
+@cache.serializable
+class AttendanceRecord(_RecordMixin, namedtuple(
+        "AttendanceRecord", ATTENDANCE_COLUMNS + ("name", "username", "department"),
+        defaults=(None, None, None))):
+    """A row of the attendance table, joined with the owning user's name, username and department."""
+    __slots__ = ()
+
+@cache.serializable
+class InternStats(_RecordMixin, namedtuple("InternStats", (
+        "user_id", "present_count", "late_count", "half_day_count", "absent_count", "days_recorded",
+        "current_streak", "longest_streak", "average_check_in", "total_hours", "first_date", "last_date"))):
+    """Precomputed attendance statistics for one intern (see get_intern_stats)."""
+    __slots__ = ()
+
+@cache.serializable
+class Department(_RecordMixin, namedtuple("Department", DEPARTMENT_COLUMNS)):
+    """A row of the departments table."""
+    __slots__ = ()
+
+@cache.serializable
+class Policy(_RecordMixin, namedtuple("Policy", POLICY_COLUMNS)):
+    """A row of the attendance_policies table; department None is the default policy."""
+    __slots__ = ()
+
+@cache.serializable
+class Punch(_RecordMixin, namedtuple("Punch", PUNCH_COLUMNS)):
+    """A row of the punch_events table; kind is punches.PUNCH_IN or punches.PUNCH_OUT."""
+    __slots__ = ()
+
+@cache.serializable
+class Schedule(_RecordMixin, namedtuple("Schedule", SCHEDULE_COLUMNS)):
+    """A row of the schedules table; weekday None applies to every day."""
+    __slots__ = ()
+
+def _iter_records(cursor, record_type, batch_size=None):
+    """Yield records lazily from an executed cursor, fetching rows in batches."""
+    batch_size = batch_size or config.FETCH_BATCH_SIZE
+    make = record_type._make
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield make(row)
+
+def _read_table(cursor, schema, batch_size=None):
+    """
+    Read an executed cursor into a pyarrow Table.
+
+    Rows are fetched in batches and turned into one Arrow array per column
+    and batch, without building a record per row.
+    """
+    batch_size = batch_size or config.FETCH_BATCH_SIZE
+    batches = []
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        batches.append(pa.record_batch(
+            [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema))
+    return pa.Table.from_batches(batches, schema=schema)
+
+@metrics.timed()
 def get_db_connection():
-    """Create a database connection and return the connection object."""
-    conn = sqlite3.connect(config.DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Create a database connection (see storage.py) and return the connection object."""
+    return storage.get_backend().connect()
 
+@metrics.timed()
 def init_db():
     """Initialize the database with required tables."""
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    storage.get_backend().init_database(cursor)
+    # Column types differ between the backends (see storage.py)
+    types = storage.get_backend().types
+
     # Create users table
-    cursor.execute('''
+    cursor.execute(f'''
     CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        id {types['id']},
         username TEXT UNIQUE NOT NULL,
         password_hash TEXT NOT NULL,
         role TEXT NOT NULL,
         name TEXT NOT NULL,
         email TEXT UNIQUE NOT NULL,
         department TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        created_at {types['timestamp']} DEFAULT {types['now']}
     )
     ''')
 
+    # Full-text index over users' names, usernames, emails and departments;
+    # an empty search lists users by name
+    storage.get_backend().init_user_search(cursor)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_role_name ON users (role, name)')
+
     # Create attendance table
-    cursor.execute('''
+    cursor.execute(f'''
     CREATE TABLE IF NOT EXISTS attendance (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        id {types['id']},
         user_id INTEGER NOT NULL,
-        date DATE NOT NULL,
-        check_in_time TIMESTAMP,
-        check_out_time TIMESTAMP,
+        date {types['date']} NOT NULL,
+        check_in_time {types['timestamp']},
+        check_out_time {types['timestamp']},
         status TEXT,
         notes TEXT,
         FOREIGN KEY (user_id) REFERENCES users (id),
@@ -52,10 +179,144 @@ def init_db():
     )
     ''')
 
-    # Create departments table
+    # Policy that determined each row's status (see attendance_policies)
+    storage.get_backend().add_column(cursor, "attendance", "policy_id", "INTEGER")
+
+    # Create attendance policies table. Each row is a version of the lateness
+    # rule for one department (or, with department NULL, every department
+    # without its own policy), in effect from effective_from until a later version
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS attendance_policies (
+        id {types['id']},
+        department TEXT,
+        work_start TEXT NOT NULL,
+        late_threshold INTEGER NOT NULL,
+        effective_from {types['date']} NOT NULL,
+        created_at {types['timestamp']} DEFAULT {types['now']}
+    )
+    ''')
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM attendance_policies)")
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            "INSERT INTO attendance_policies (department, work_start, late_threshold, effective_from) VALUES (?, ?, ?, ?)",
+            (None, config.WORK_START_TIME, config.LATE_THRESHOLD, _POLICY_EPOCH)
+        )
+
+    # Create schedules table. Each row sets the working hours of a department
+    # or one intern (user_id), on one weekday (0 = Monday) or every day
+    # (weekday NULL), from effective_from to effective_to (NULL: open-ended).
+    # A schedule's start time replaces the policy's work_start (see schedules.py)
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS schedules (
+        id {types['id']},
+        department TEXT,
+        user_id INTEGER,
+        weekday INTEGER,
+        start_time TEXT NOT NULL,
+        end_time TEXT NOT NULL,
+        effective_from {types['date']} NOT NULL,
+        effective_to {types['date']},
+        created_at {types['timestamp']} DEFAULT {types['now']},
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+    # Schedule that determined each row's status, if any
+    storage.get_backend().add_column(cursor, "attendance", "schedule_id", "INTEGER")
+
+    # Create punch events table: with PUNCH_LOG_ENABLED, every check-in/out is
+    # appended here and derive_attendance() folds it into attendance (see punches.py)
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS punch_events (
+        id {types['id']},
+        user_id INTEGER NOT NULL,
+        date {types['date']} NOT NULL,
+        kind TEXT NOT NULL,
+        time {types['timestamp']} NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_punch_events_user_date ON punch_events (user_id, date)')
+    # Fold state of each user-day derived from punches
+    storage.get_backend().add_column(cursor, "attendance", "open_since", types["timestamp"])
+    storage.get_backend().add_column(cursor, "attendance", "worked_seconds", "INTEGER")
+    storage.get_backend().add_column(cursor, "attendance", "break_seconds", "INTEGER")
+
+    # Per-user lookups use the UNIQUE(user_id, date) index; date range reports
+    # across all users use this one
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance (date)')
+
+    # Create archive manifest table, one row per month moved to Parquet (see archive.py)
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS archive_manifest (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        first_date {types['date']} NOT NULL,
+        last_date {types['date']} NOT NULL,
+        archived_at {types['timestamp']} DEFAULT {types['now']},
+        PRIMARY KEY (year, month)
+    )
+    ''')
+
+    # Create metadata table; data_version is incremented by every write
+    # transaction and keys the query cache (see cache.py)
     cursor.execute('''
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute("INSERT INTO meta (key, value) VALUES ('data_version', 0) ON CONFLICT (key) DO NOTHING")
+    # Incremented when a user is added or changed; keys the presence index's department masks
+    cursor.execute("INSERT INTO meta (key, value) VALUES ('users_version', 0) ON CONFLICT (key) DO NOTHING")
+    # Incremented when a policy or schedule is added; keys the compiled work rules
+    cursor.execute("INSERT INTO meta (key, value) VALUES ('rules_version', 0) ON CONFLICT (key) DO NOTHING")
+    # Incremented when the check-in or status of an existing attendance row changes; keys the presence index
+    cursor.execute("INSERT INTO meta (key, value) VALUES ('status_version', 0) ON CONFLICT (key) DO NOTHING")
+    # Highest punch event ID folded into attendance
+    cursor.execute("INSERT INTO meta (key, value) VALUES ('punch_watermark', 0) ON CONFLICT (key) DO NOTHING")
+    # Identifies this database to files derived from it, such as the presence index
+    cursor.execute(
+        "INSERT INTO meta (key, value) VALUES ('database_id', ?) ON CONFLICT (key) DO NOTHING",
+        (uuid.uuid4().int >> 97,)
+    )
+
+    # Create per-intern statistics table, maintained on every check-in/out
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS intern_stats (
+        user_id INTEGER PRIMARY KEY,
+        present_count INTEGER NOT NULL DEFAULT 0,
+        late_count INTEGER NOT NULL DEFAULT 0,
+        half_day_count INTEGER NOT NULL DEFAULT 0,
+        days_recorded INTEGER NOT NULL DEFAULT 0,
+        working_days_recorded INTEGER NOT NULL DEFAULT 0,
+        first_date {types['date']},
+        last_date {types['date']},
+        current_streak INTEGER NOT NULL DEFAULT 0,
+        longest_streak INTEGER NOT NULL DEFAULT 0,
+        check_in_minutes_total INTEGER NOT NULL DEFAULT 0,
+        check_in_count INTEGER NOT NULL DEFAULT 0,
+        worked_seconds_total INTEGER NOT NULL DEFAULT 0,
+        updated_at {types['timestamp']} DEFAULT {types['now']},
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+    # Absences are counted against days recorded on working days only
+    added_working_days = storage.get_backend().add_column(
+        cursor, "intern_stats", "working_days_recorded", "INTEGER NOT NULL DEFAULT 0")
+
+    # Backfill statistics for databases created before the table (or its newest column) existed
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM intern_stats), EXISTS (SELECT 1 FROM attendance)")
+    has_stats, has_attendance = cursor.fetchone()
+    if has_attendance and (not has_stats or added_working_days):
+        _refresh_intern_stats(cursor)
+
+    # Create departments table
+    cursor.execute(f'''
     CREATE TABLE IF NOT EXISTS departments (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        id {types['id']},
         name TEXT UNIQUE NOT NULL
     )
     ''')
@@ -79,7 +340,51 @@ def init_db():
     conn.commit()
     conn.close()
 
+# Data version
+def _bump_data_version(cursor):
+    """Increment the data version in the caller's write transaction, invalidating cached reads."""
+    cursor.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+def _bump_users_version(cursor):
+    """Increment the users version in the caller's write transaction, invalidating the department masks."""
+    cursor.execute("UPDATE meta SET value = value + 1 WHERE key = 'users_version'")
+
+def _bump_rules_version(cursor):
+    """Increment the rules version in the caller's write transaction, invalidating the work rules."""
+    cursor.execute("UPDATE meta SET value = value + 1 WHERE key = 'rules_version'")
+
+def _bump_status_version(cursor):
+    """
+    Increment the status version in the caller's write transaction, invalidating the presence index.
+
+    The index only catches up on rows added since it was built, so every
+    change to the check-in or status of an existing attendance row must
+    bump this version.
+    """
+    cursor.execute("UPDATE meta SET value = value + 1 WHERE key = 'status_version'")
+
+def get_data_version():
+    """
+    Get the current data version.
+
+    Every transaction that changes users, departments or attendance
+    increments it, in every process sharing the database, so it can key
+    cached query results.
+
+    Returns:
+        int: The data version
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM meta WHERE key = 'data_version'")
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
 # User operations
+_USER_SELECT = ", ".join(USER_COLUMNS)
+
+@metrics.timed()
 def add_user(username, password, role, name, email, department=None):
     """Add a new user to the database."""
     conn = get_db_connection()
@@ -91,50 +396,184 @@ def add_user(username, password, role, name, email, department=None):
             "INSERT INTO users (username, password_hash, role, name, email, department) VALUES (?, ?, ?, ?, ?, ?)",
             (username, hash_password, role, name, email, department)
         )
+        _bump_users_version(cursor)
+        _bump_data_version(cursor)
         conn.commit()
         return True
-    except sqlite3.IntegrityError:
+    except storage.IntegrityError:
         return False
     finally:
         conn.close()
 
+@metrics.timed()
 def verify_user(username, password):
     """Verify user credentials and return user data if valid."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
+    cursor.row_factory = None
+    cursor.execute(f"SELECT password_hash, {_USER_SELECT} FROM users WHERE username = ?", (username,))
+    row = cursor.fetchone()
     conn.close()
 
-    if user and pbkdf2_sha256.verify(password, user['password_hash']):
-        return dict(user)
+    if row and pbkdf2_sha256.verify(password, row[0]):
+        return User._make(row[1:])
     return None
 
+@metrics.timed()
+@cache.cached(get_data_version)
 def get_user(user_id):
     """Get user by ID."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    user = cursor.fetchone()
+    cursor.row_factory = None
+    cursor.execute(f"SELECT {_USER_SELECT} FROM users WHERE id = ?", (user_id,))
+    row = cursor.fetchone()
     conn.close()
 
-    return dict(user) if user else None
+    return User._make(row) if row else None
+
+@metrics.timed()
+def iter_users(role=None, batch_size=None):
+    """Yield users lazily, optionally filtered by role."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+
+        if role:
+            cursor.execute(f"SELECT {_USER_SELECT} FROM users WHERE role = ?", (role,))
+        else:
+            cursor.execute(f"SELECT {_USER_SELECT} FROM users")
+
+        yield from _iter_records(cursor, User, batch_size)
+    finally:
+        conn.close()
 
+@metrics.timed()
+@cache.cached(get_data_version)
 def get_all_users(role=None):
     """Get all users, optionally filtered by role."""
+    return list(iter_users(role))
+
+@metrics.timed()
+@cache.cached(get_data_version)
+def get_user_names(user_ids):
+    """
+    Get the names of a few users by ID.
+
+    Args:
+        user_ids: Sorted tuple of user IDs
+
+    Returns:
+        dict: {user ID: name} for the users that exist
+    """
+    if not user_ids:
+        return {}
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"SELECT id, name FROM users WHERE id IN ({', '.join('?' * len(user_ids))})", tuple(user_ids))
+    names = dict(cursor.fetchall())
+    conn.close()
+    return names
 
+@metrics.timed()
+@cache.cached(get_data_version)
+def count_users(role=None):
+    """Count users, optionally filtered by role."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
     if role:
-        cursor.execute("SELECT * FROM users WHERE role = ?", (role,))
+        cursor.execute("SELECT COUNT(*) FROM users WHERE role = ?", (role,))
     else:
-        cursor.execute("SELECT * FROM users")
-
-    users = [dict(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT COUNT(*) FROM users")
+    count = cursor.fetchone()[0]
     conn.close()
+    return count
+
+USER_TABLE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("username", pa.string()),
+    ("role", pa.string()),
+    ("name", pa.string()),
+    ("email", pa.string()),
+    ("department", pa.string()),
+    ("created_at", pa.string()),
+])
+
+@metrics.timed()
+@cache.cached(get_data_version)
+def get_users_table(role=None, limit=None, offset=0):
+    """
+    Get users as a pyarrow Table, without their password hashes.
+
+    Args:
+        role: Optional role filter
+        limit: Optional maximum number of users, for one page of a list
+        offset: Number of users skipped before the page
+
+    Returns:
+        pyarrow.Table: USER_TABLE_SCHEMA columns, ordered by ID
+    """
+    query = f"SELECT {', '.join(USER_TABLE_SCHEMA.names)} FROM users"
+    params = []
+    if role:
+        query += " WHERE role = ?"
+        params.append(role)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        return _read_table(cursor, USER_TABLE_SCHEMA)
+    finally:
+        conn.close()
 
+@metrics.timed()
+@cache.cached(get_data_version)
+def search_users(prefix, limit=None, role=None):
+    """
+    Search users by name, username, email or department.
+
+    Every word of prefix must match the start of a word in one of those
+    fields (so "pri sha" finds "Priya Sharma"). With an empty prefix the
+    first users by name are returned.
+
+    Args:
+        prefix: Search text typed by the user
+        limit: Optional maximum number of users returned (default: config.USER_SEARCH_LIMIT)
+        role: Optional role to restrict the search to
+
+    Returns:
+        list: Matching User records, best matches first
+    """
+    limit = limit or config.USER_SEARCH_LIMIT
+    terms = (prefix or "").split()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    if terms:
+        storage.get_backend().search_users(cursor, USER_COLUMNS, terms, role, limit)
+    elif role:
+        cursor.execute(f"SELECT {_USER_SELECT} FROM users WHERE role = ? ORDER BY name LIMIT ?", (role, limit))
+    else:
+        cursor.execute(f"SELECT {_USER_SELECT} FROM users ORDER BY name LIMIT ?", (limit,))
+    users = [User._make(row) for row in cursor.fetchall()]
+    conn.close()
     return users
 
+def search_interns(prefix, limit=None):
+    """Search interns as search_users does; the search function of utils.select_intern."""
+    return search_users(prefix, limit, role=config.ROLE_INTERN)
+
+@metrics.timed()
 def update_user(user_id, name=None, email=None, department=None):
     """Update user information."""
     conn = get_db_connection()
@@ -157,6 +596,8 @@ def update_user(user_id, name=None, email=None, department=None):
         query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = ?"
         params.append(user_id)
         cursor.execute(query, params)
+        _bump_users_version(cursor)
+        _bump_data_version(cursor)
         conn.commit()
         success = True
     else:
@@ -165,6 +606,7 @@ def update_user(user_id, name=None, email=None, department=None):
     conn.close()
     return success
 
+@metrics.timed()
 def change_password(user_id, new_password):
     """Change user password."""
     conn = get_db_connection()
@@ -172,14 +614,54 @@ def change_password(user_id, new_password):
     hash_password = pbkdf2_sha256.hash(new_password)
 
     cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (hash_password, user_id))
+    _bump_data_version(cursor)
     conn.commit()
     conn.close()
     return True
 
 # Attendance operations
-def record_check_in(user_id, date=None, time=None):
-    """Record check-in time for a user."""
-    # Get current time in India (GMT+5:30)
+# Idempotent attendance actions
+_recent_actions = OrderedDict()  # request key -> (recorded at, result)
+_recent_actions_lock = threading.Lock()
+_action_counters = {
+    "check_in": {"recorded": 0, "deduplicated": 0},
+    "check_out": {"recorded": 0, "deduplicated": 0},
+}
+
+def _get_recent_action(action, request_key):
+    """Return the remembered result of a recent request, counting the hit, or None."""
+    with _recent_actions_lock:
+        entry = _recent_actions.get(request_key)
+        if entry is None:
+            return None
+        recorded_at, result = entry
+        if monotonic() - recorded_at > config.ACTION_DEDUP_WINDOW:
+            del _recent_actions[request_key]
+            return None
+        _action_counters[action]["deduplicated"] += 1
+        return result
+
+def _remember_action(action, request_key, result):
+    """Remember the result of a request so duplicates within the window skip the database."""
+    with _recent_actions_lock:
+        _action_counters[action]["recorded"] += 1
+        _recent_actions[request_key] = (monotonic(), result)
+        _recent_actions.move_to_end(request_key)
+        while len(_recent_actions) > config.ACTION_CACHE_SIZE:
+            _recent_actions.popitem(last=False)
+
+def _count_deduplicated(action):
+    """Count a request answered without touching the database."""
+    with _recent_actions_lock:
+        _action_counters[action]["deduplicated"] += 1
+
+def get_action_counters():
+    """Get counts of recorded and deduplicated check-in/out requests in this process."""
+    with _recent_actions_lock:
+        return {action: dict(counts) for action, counts in _action_counters.items()}
+
+def _resolve_action_time(date, time):
+    """Fill in missing date/time with the current time in India (GMT+5:30)."""
     india_tz = pytz.timezone('Asia/Kolkata')
     now = datetime.now(pytz.UTC).astimezone(india_tz)
 
@@ -187,122 +669,1143 @@ def record_check_in(user_id, date=None, time=None):
         date = now.strftime("%Y-%m-%d")
     if time is None:
         time = now.strftime("%Y-%m-%d %H:%M:%S")
+    return date, time
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def _is_archived(cursor, date):
+    """Check whether a date falls in (or before) a month moved to the Parquet archive."""
+    cursor.execute("SELECT 1 FROM archive_manifest WHERE last_date >= ? LIMIT 1", (date,))
+    return cursor.fetchone() is not None
 
-    # Check if an entry already exists for this user and date
-    cursor.execute("SELECT * FROM attendance WHERE user_id = ? AND date = ?", (user_id, date))
-    existing = cursor.fetchone()
+def _apply_check_in(cursor, user_id, date, time):
+    """Write a check-in on an open cursor without committing; returns False for archived dates."""
+    # Archived months are closed
+    if _is_archived(cursor, date):
+        return False
 
-    if existing:
-        # Update existing entry
-        cursor.execute(
-            "UPDATE attendance SET check_in_time = ? WHERE user_id = ? AND date = ?",
-            (time, user_id, date)
-        )
+    # Check if an entry already exists for this user and date, and find the user's department
+    cursor.execute(
+        """
+        SELECT u.department, a.id, a.check_in_time
+        FROM users u LEFT JOIN attendance a ON a.user_id = u.id AND a.date = ?
+        WHERE u.id = ?
+        """,
+        (date, user_id)
+    )
+    department, existing_id, existing_check_in = cursor.fetchone() or (None, None, None)
+    rules = _get_work_rules(cursor)
+    policy = _policy_for(rules.policies, department, date)
+    schedule = rules.schedules.lookup(user_id, department, date)
+    schedule_id = schedule.id if schedule else None
+
+    if existing_id is not None:
+        # Keep the original check-in; only fill it in if it is missing
+        if not existing_check_in:
+            cursor.execute(
+                """
+                UPDATE attendance SET check_in_time = ?, status = ?, policy_id = ?, schedule_id = ?
+                WHERE user_id = ? AND date = ?
+                """,
+                (time, determine_status(time, policy, schedule), policy.id, schedule_id, user_id, date)
+            )
+            _refresh_intern_stats(cursor, user_id)
+            # The row may be below the presence index's watermark
+            _bump_status_version(cursor)
     else:
         # Create new entry
+        status = determine_status(time, policy, schedule)
         cursor.execute(
-            "INSERT INTO attendance (user_id, date, check_in_time, status) VALUES (?, ?, ?, ?)",
-            (user_id, date, time, determine_status(time))
+            """
+            INSERT INTO attendance (user_id, date, check_in_time, status, policy_id, schedule_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, date, time, status, policy.id, schedule_id)
         )
+        _update_stats_on_check_in(cursor, user_id, date, time, status)
+    return True
 
-    conn.commit()
-    conn.close()
+def _apply_check_out(cursor, user_id, date, time):
+    """Write a check-out on an open cursor without committing; returns False if not checked in."""
+    # Archived months are closed
+    if _is_archived(cursor, date):
+        return False
+
+    # Check if an entry exists for this user and date
+    cursor.execute("SELECT * FROM attendance WHERE user_id = ? AND date = ?", (user_id, date))
+    existing = cursor.fetchone()
+
+    if not existing:
+        # No check-in record found
+        return False
+
+    cursor.execute(
+        "UPDATE attendance SET check_out_time = ? WHERE user_id = ? AND date = ?",
+        (time, user_id, date)
+    )
+    _update_stats_on_check_out(
+        cursor, user_id,
+        _worked_seconds(existing['check_in_time'], time, existing['worked_seconds'])
+        - _worked_seconds(existing['check_in_time'], existing['check_out_time'], existing['worked_seconds'])
+    )
     return True
 
-def record_check_out(user_id, date=None, time=None):
-    """Record check-out time for a user."""
-    # Get current time in India (GMT+5:30)
-    india_tz = pytz.timezone('Asia/Kolkata')
-    now = datetime.now(pytz.UTC).astimezone(india_tz)
+def _append_punch(kind):
+    """Return a writer appending punches of one kind; appends read nothing and always succeed."""
+    def append(cursor, user_id, date, time):
+        cursor.execute("INSERT INTO punch_events (user_id, date, kind, time) VALUES (?, ?, ?, ?)",
+                       (user_id, date, kind, time))
+        return True
+    return append
 
-    if date is None:
-        date = now.strftime("%Y-%m-%d")
-    if time is None:
-        time = now.strftime("%Y-%m-%d %H:%M:%S")
+_ACTION_WRITERS = {
+    "check_in": _apply_check_in,
+    "check_out": _apply_check_out,
+}
+_PUNCH_WRITERS = {
+    "check_in": _append_punch(punches.PUNCH_IN),
+    "check_out": _append_punch(punches.PUNCH_OUT),
+}
+
+def _get_writers():
+    """Return the check-in/out writers of the configured write path."""
+    return _PUNCH_WRITERS if config.PUNCH_LOG_ENABLED else _ACTION_WRITERS
+
+# Write statistics
+_write_stats = {"transactions": 0, "events": 0}
+_write_stats_lock = threading.Lock()
+
+def _count_transaction(event_count):
+    """Count a committed write transaction and the events it carried."""
+    with _write_stats_lock:
+        _write_stats["transactions"] += 1
+        _write_stats["events"] += event_count
+
+def get_write_stats():
+    """Get the number of committed check-in/out transactions and events in this process."""
+    with _write_stats_lock:
+        return dict(_write_stats)
+
+def _apply_writes(cursor, writes):
+    """
+    Apply (action, user_id, date, time) writes inside an open transaction, each in its own savepoint.
 
+    A write that raises is rolled back to its savepoint, so it does not
+    undo the others.
+
+    Returns:
+        list: (result, error) per write; error is the exception of a failed write, otherwise None
+    """
+    writers = _get_writers()
+    outcomes = []
+    for action, user_id, date, time in writes:
+        cursor.execute("SAVEPOINT event")
+        try:
+            outcomes.append((writers[action](cursor, user_id, date, time), None))
+            cursor.execute("RELEASE SAVEPOINT event")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT event")
+            cursor.execute("RELEASE SAVEPOINT event")
+            outcomes.append((None, e))
+    # Punches change nothing readable until derive_attendance() folds them
+    if any(result for result, _ in outcomes) and not config.PUNCH_LOG_ENABLED:
+        _bump_data_version(cursor)
+    return outcomes
+
+def _write_events(writes):
+    """Apply (action, user_id, date, time) writes in one transaction and return their (result, error) outcomes."""
     conn = get_db_connection()
     cursor = conn.cursor()
+    try:
+        storage.get_backend().begin(cursor)
+        outcomes = _apply_writes(cursor, writes)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    _count_transaction(len(writes))
+    return outcomes
 
-    # Check if an entry exists for this user and date
-    cursor.execute("SELECT * FROM attendance WHERE user_id = ? AND date = ?", (user_id, date))
-    existing = cursor.fetchone()
+class GroupCommitWriter:
+    """
+    Background writer that commits check-in/out events in shared transactions.
 
-    if existing:
-        # Update existing entry
-        cursor.execute(
-            "UPDATE attendance SET check_out_time = ? WHERE user_id = ? AND date = ?",
-            (time, user_id, date)
+    Callers submit events and receive a Future. A writer thread collects
+    events for up to max_delay_ms or max_batch events, applies them in a
+    single transaction (one fsync instead of one per event) and then
+    completes each caller's Future. Every event runs in its own savepoint,
+    so one failing event does not roll back the rest of its group.
+    """
+
+    def __init__(self, max_delay_ms=None, max_batch=None):
+        self.max_delay = (config.GROUP_COMMIT_MAX_DELAY_MS if max_delay_ms is None else max_delay_ms) / 1000
+        self.max_batch = max_batch or config.GROUP_COMMIT_MAX_BATCH
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, write):
+        """Queue an (action, user_id, date, time) write and return a Future for its result."""
+        future = Future()
+        self._queue.put((write, future))
+        return future
+
+    def stop(self):
+        """Commit everything already submitted, then stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        """Block for one write, then gather more until the batch is full or the delay expires."""
+        item = self._queue.get()
+        if item is None:
+            return [], True
+
+        batch = [item]
+        deadline = monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        stopping = False
+        try:
+            while not stopping:
+                batch, stopping = self._collect()
+                if batch:
+                    self._commit(conn, cursor, batch)
+        finally:
+            conn.close()
+
+    def _commit(self, conn, cursor, batch):
+        try:
+            storage.get_backend().begin(cursor)
+            outcomes = _apply_writes(cursor, [write for write, _ in batch])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        _count_transaction(len(batch))
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+_group_commit_writer = None
+_group_commit_lock = threading.Lock()
+
+def _get_group_commit_writer():
+    """Return the process-wide group-commit writer, starting it on first use."""
+    global _group_commit_writer
+    with _group_commit_lock:
+        if _group_commit_writer is None:
+            _group_commit_writer = GroupCommitWriter()
+            atexit.register(stop_group_commit)
+        return _group_commit_writer
+
+def stop_group_commit():
+    """Flush and stop the group-commit writer, if it is running."""
+    global _group_commit_writer
+    with _group_commit_lock:
+        writer, _group_commit_writer = _group_commit_writer, None
+    if writer is not None:
+        writer.stop()
+
+@metrics.timed()
+def record_check_in(user_id, date=None, time=None, request_key=None):
+    """
+    Record check-in time for a user.
+
+    Check-ins are idempotent: the first check-in of the day is kept, and a
+    repeated request with the same request_key (by default one key per user
+    and day) within config.ACTION_DEDUP_WINDOW seconds is answered from
+    memory without touching the database.
+
+    Args:
+        user_id: The user checking in
+        date: Optional attendance date (default: today in IST)
+        time: Optional check-in timestamp (default: now in IST)
+        request_key: Optional client-supplied idempotency key
+
+    Returns:
+        bool: True if the user is checked in for the day
+    """
+    result = record_events([{
+        "action": "check_in", "user_id": user_id, "date": date, "time": time, "request_key": request_key
+    }])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+@metrics.timed()
+def record_check_out(user_id, date=None, time=None, request_key=None):
+    """
+    Record check-out time for a user.
+
+    Repeated requests with the same request_key (by default one key per user
+    and day) within config.ACTION_DEDUP_WINDOW seconds are answered from
+    memory without touching the database.
+
+    Args:
+        user_id: The user checking out
+        date: Optional attendance date (default: today in IST)
+        time: Optional check-out timestamp (default: now in IST)
+        request_key: Optional client-supplied idempotency key
+
+    Returns:
+        bool: True if recorded, False if the user has not checked in
+    """
+    result = record_events([{
+        "action": "check_out", "user_id": user_id, "date": date, "time": time, "request_key": request_key
+    }])[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+@metrics.timed()
+def record_events(events):
+    """
+    Record a batch of check-in/out events in a single transaction.
+
+    Each event is a dict with "action" ("check_in" or "check_out") and
+    "user_id", and optionally "date", "time" and "request_key". Events are
+    applied in order, so a check-in and check-out of the same user can
+    share a batch. Duplicates of recent requests are answered from memory.
+
+    With config.PUNCH_LOG_ENABLED the events are only appended to
+    punch_events; a background thread folds them into attendance shortly
+    after (see PunchDeriver). A check-out without a check-in is therefore
+    accepted, and ignored by the fold.
+
+    Every event is written in its own savepoint, so an event that fails
+    (e.g. for an unknown user) does not undo the others, and the results of
+    the rest are still returned. A failure of the whole transaction raises,
+    or with group commit fails every event of that batch.
+
+    Args:
+        events: List of event dicts
+
+    Returns:
+        list: One result per event: the bool record_check_in/record_check_out
+        would return, or the exception that made the event fail
+    """
+    results = [None] * len(events)
+    pending = []
+    duplicates = []  # (index, index of the first event with the same key)
+    batch_keys = {}
+
+    for index, event in enumerate(events):
+        action = event["action"]
+        date, time = _resolve_action_time(event.get("date"), event.get("time"))
+        request_key = event.get("request_key") or f"{action}:{event['user_id']}:{date}"
+        cached = _get_recent_action(action, request_key)
+        if cached is not None:
+            results[index] = cached
+        elif request_key in batch_keys:
+            duplicates.append((index, batch_keys[request_key]))
+        else:
+            batch_keys[request_key] = index
+            pending.append((index, action, event["user_id"], date, time, request_key))
+
+    if pending:
+        writes = [(action, user_id, date, time) for _, action, user_id, date, time, _ in pending]
+        if config.GROUP_COMMIT_ENABLED:
+            futures = [_get_group_commit_writer().submit(write) for write in writes]
+            # Wait for every event, so one failure does not hide the outcome of the others
+            wait(futures)
+            outcomes = [(None, future.exception()) if future.exception() else (future.result(), None)
+                        for future in futures]
+        else:
+            outcomes = _write_events(writes)
+        for (index, *_), (result, error) in zip(pending, outcomes):
+            results[index] = error if error is not None else result
+        if config.PUNCH_LOG_ENABLED:
+            _get_punch_deriver().notify()
+
+        for index, action, _, _, _, request_key in pending:
+            # Failed events are not remembered, so a retry still goes through; check-outs are, so a
+            # repeated check-out within the window keeps the first one's time
+            if results[index] is True:
+                _remember_action(action, request_key, results[index])
+
+    for index, first_index in duplicates:
+        results[index] = results[first_index]
+        _count_deduplicated(events[index]["action"])
+
+    return results
+
+# Punch log
+_derive_lock = threading.Lock()
+
+def _departments_of(cursor, user_ids):
+    """Return {user_id: department} for a collection of user IDs."""
+    user_ids = list(user_ids)
+    departments = {}
+    for i in range(0, len(user_ids), 900):
+        chunk = user_ids[i:i + 900]
+        cursor.execute(f"SELECT id, department FROM users WHERE id IN ({', '.join('?' for _ in chunk)})", chunk)
+        departments.update(cursor.fetchall())
+    return departments
+
+def _derive_batch(cursor, stats_cursor, batch_size, update_stats=True):
+    """
+    Fold the next batch of punches above the watermark into attendance, in the caller's transaction.
+
+    Args:
+        cursor: Cursor returning tuples
+        stats_cursor: Cursor on the same connection for the intern statistics helpers
+        batch_size: Punches folded per batch
+        update_stats: Whether to maintain intern_stats (rebuilds recompute it afterwards)
+
+    Returns:
+        tuple: (punches folded, user-days changed), or None if none are pending
+    """
+    cursor.execute("SELECT value FROM meta WHERE key = 'punch_watermark'")
+    watermark = cursor.fetchone()[0]
+    cursor.execute("SELECT id, user_id, date, kind, time FROM punch_events WHERE id > ? ORDER BY id LIMIT ?",
+                   (watermark, batch_size))
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    last_id = rows[-1][0]
+
+    # Archived months are closed
+    cursor.execute("SELECT MAX(last_date) FROM archive_manifest")
+    archived_until = cursor.fetchone()[0] or ""
+    new_punches = {}
+    for punch_id, user_id, date, kind, time in rows:
+        if date > archived_until:
+            new_punches.setdefault((user_id, date), []).append((time, punch_id, kind))
+
+    # Current state of the affected user-days
+    existing = {}
+    by_date = {}
+    for user_id, date in new_punches:
+        by_date.setdefault(date, []).append(user_id)
+    for date, user_ids in by_date.items():
+        for i in range(0, len(user_ids), 900):
+            chunk = user_ids[i:i + 900]
+            cursor.execute(
+                f"""
+                SELECT user_id, id, check_in_time, check_out_time, open_since, worked_seconds, break_seconds,
+                       status, policy_id, schedule_id
+                FROM attendance WHERE date = ? AND user_id IN ({', '.join('?' for _ in chunk)})
+                """,
+                (date, *chunk)
+            )
+            for user_id, *row in cursor.fetchall():
+                existing[(user_id, date)] = row
+
+    changes = []  # (user_id, date, existing row or None, new state)
+    migrated = []  # Punches of rows written before the punch log
+    for (user_id, date), day_punches in new_punches.items():
+        row = existing.get((user_id, date))
+        state = punches.state_from_row(*row[1:6]) if row else None
+        legacy = []
+        if state is not None and row[4] is None:
+            # Copy the row's session into the log, so rebuilds keep it
+            legacy = [(row[1], 0, punches.PUNCH_IN)] + ([(row[2], 0, punches.PUNCH_OUT)] if row[2] else [])
+            migrated += [(user_id, date, kind, time) for time, _, kind in legacy]
+        day_punches.sort()
+        if state is not None and day_punches[0][0] < punches.last_punch_time(state):
+            # Out of order: fold the day again from all of its punches
+            cursor.execute(
+                "SELECT time, id, kind FROM punch_events WHERE user_id = ? AND date = ? AND id <= ?",
+                (user_id, date, last_id)
+            )
+            day_punches = sorted(cursor.fetchall() + legacy)
+            state = None
+        state = punches.fold(state, ((kind, time) for time, _, kind in day_punches))
+        if state is not None and (row is None or tuple(state) != punches.state_from_row(*row[1:6])):
+            changes.append((user_id, date, row, state))
+
+    cursor.execute("UPDATE meta SET value = ? WHERE key = 'punch_watermark'", (last_id,))
+    # Above the watermark, so the next batch folds them again; that refolds the day idempotently
+    cursor.executemany("INSERT INTO punch_events (user_id, date, kind, time) VALUES (?, ?, ?, ?)", migrated)
+    if not changes:
+        return len(rows), 0
+
+    # Statuses follow the first check-in, unless set otherwise (e.g. Half Day)
+    evaluate = [i for i, (_, _, row, state) in enumerate(changes)
+                if row is None or row[1] is None
+                or (row[1] != state.check_in_time and row[6] in (None, config.STATUS_PRESENT, config.STATUS_LATE))]
+    statuses = {}
+    if evaluate:
+        departments = _departments_of(cursor, {changes[i][0] for i in evaluate})
+        new_statuses, policy_ids, schedule_ids = _evaluate_statuses(
+            _get_work_rules(cursor),
+            [changes[i][0] for i in evaluate],
+            np.array([departments.get(changes[i][0]) for i in evaluate], dtype=object),
+            [changes[i][1] for i in evaluate],
+            [changes[i][3].check_in_time for i in evaluate],
         )
-        conn.commit()
-        success = True
-    else:
-        # No check-in record found
-        success = False
+        for i, status, policy_id, schedule_id in zip(evaluate, new_statuses.tolist(), policy_ids.tolist(),
+                                                     schedule_ids.tolist()):
+            statuses[i] = (status, None if policy_id < 0 else policy_id, None if schedule_id < 0 else schedule_id)
+
+    inserts, updates = [], []
+    refresh_users = set()
+    statuses_changed = False
+    for i, (user_id, date, row, state) in enumerate(changes):
+        status, policy_id, schedule_id = statuses.get(i, (row and row[6], row and row[7], row and row[8]))
+        if row is None:
+            inserts.append((user_id, date, *state, status, policy_id, schedule_id))
+        else:
+            updates.append((*state, status, policy_id, schedule_id, row[0]))
+            if row[1] != state.check_in_time or row[6] != status:
+                # The presence index and streaks depend on these
+                refresh_users.add(user_id)
+                statuses_changed = True
+    cursor.executemany(
+        """
+        INSERT INTO attendance (user_id, date, check_in_time, check_out_time, open_since, worked_seconds,
+                                break_seconds, status, policy_id, schedule_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        inserts
+    )
+    cursor.executemany(
+        """
+        UPDATE attendance SET check_in_time = ?, check_out_time = ?, open_since = ?, worked_seconds = ?,
+                              break_seconds = ?, status = ?, policy_id = ?, schedule_id = ?
+        WHERE id = ?
+        """,
+        updates
+    )
+
+    if update_stats:
+        for i, (user_id, date, row, state) in sorted(enumerate(changes), key=lambda change: change[1][1]):
+            if user_id in refresh_users:
+                continue
+            if row is None:
+                _update_stats_on_check_in(stats_cursor, user_id, date, state.check_in_time, statuses[i][0])
+                previous_worked = 0
+            else:
+                previous_worked = _worked_seconds(row[1], row[2], row[4])
+            if state.worked_seconds != previous_worked:
+                _update_stats_on_check_out(stats_cursor, user_id, state.worked_seconds - previous_worked)
+        for user_id in refresh_users:
+            _refresh_intern_stats(stats_cursor, user_id)
+    if statuses_changed:
+        _bump_status_version(cursor)
+    _bump_data_version(cursor)
+    return len(rows), len(changes)
+
+@metrics.timed()
+def derive_attendance(batch_size=None):
+    """
+    Fold punches appended since the last derivation into daily attendance.
+
+    Punches are folded in batches of config.PUNCH_DERIVE_BATCH, one
+    transaction per batch, onto the state stored in each affected
+    attendance row (see punches.py); statuses are evaluated in one
+    vectorized pass per batch.
+
+    Args:
+        batch_size: Optional punches per batch
+
+    Returns:
+        dict: Punches folded and user-days changed
+    """
+    batch_size = batch_size or config.PUNCH_DERIVE_BATCH
+    folded = changed = 0
+    with _derive_lock:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        stats_cursor = conn.cursor()
+        try:
+            while True:
+                # Cheap check before taking the write lock
+                cursor.execute(
+                    "SELECT EXISTS (SELECT 1 FROM punch_events "
+                    "WHERE id > (SELECT value FROM meta WHERE key = 'punch_watermark'))"
+                )
+                if not cursor.fetchone()[0]:
+                    break
+                # Locking punch_events waits for in-flight appends, so no lower ID commits after the watermark
+                storage.get_backend().begin(cursor, lock_table="punch_events")
+                result = _derive_batch(cursor, stats_cursor, batch_size)
+                if result is None:
+                    conn.rollback()
+                    break
+                conn.commit()
+                folded += result[0]
+                changed += result[1]
+        finally:
+            conn.close()
+    return {"punches": folded, "days": changed}
+
+class PunchDeriver:
+    """
+    Background thread that folds appended punches into attendance.
+
+    notify() wakes it; it then waits config.PUNCH_DERIVE_DELAY_MS for more
+    punches and derives them all in one pass, so bursts of check-ins share
+    derivation transactions instead of paying for one each. A failed pass
+    is retried on the next notification; the punches stay in the log.
+    """
+
+    def __init__(self, delay_ms=None):
+        self.delay = (config.PUNCH_DERIVE_DELAY_MS if delay_ms is None else delay_ms) / 1000
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="punch-deriver", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Schedule a derivation pass."""
+        self._wake.set()
+
+    def stop(self):
+        """Derive everything already appended, then stop the thread."""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait()
+            if not self._stopping:
+                self._wake.clear()
+                sleep(self.delay)
+            try:
+                derive_attendance()
+            except Exception:
+                logger.exception("Deriving attendance from punches failed; retrying on the next punch")
+
+_punch_deriver = None
+_punch_deriver_lock = threading.Lock()
+
+def _get_punch_deriver():
+    """Return the process-wide punch deriver, starting it on first use."""
+    global _punch_deriver
+    with _punch_deriver_lock:
+        if _punch_deriver is None:
+            _punch_deriver = PunchDeriver()
+            atexit.register(stop_punch_deriver)
+        return _punch_deriver
+
+def stop_punch_deriver():
+    """Derive pending punches and stop the punch deriver, if it is running."""
+    global _punch_deriver
+    with _punch_deriver_lock:
+        deriver, _punch_deriver = _punch_deriver, None
+    if deriver is not None:
+        deriver.stop()
+
+@metrics.timed()
+def rebuild_attendance_from_punches():
+    """
+    Derive attendance again from the whole punch log, in one transaction.
+
+    Rows of user-days with punches are replaced (archived months are kept);
+    rows without punches, such as those written before the punch log, are
+    left alone. Intern statistics are recomputed afterwards.
+
+    Returns:
+        dict: Punches folded and user-days derived
+    """
+    folded = changed = 0
+    with _derive_lock:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        stats_cursor = conn.cursor()
+        try:
+            storage.get_backend().begin(cursor, lock_table="punch_events")
+            cursor.execute("SELECT MAX(last_date) FROM archive_manifest")
+            archived_until = cursor.fetchone()[0] or ""
+            cursor.execute(
+                """
+                DELETE FROM attendance
+                WHERE date > ? AND EXISTS (
+                    SELECT 1 FROM punch_events p WHERE p.user_id = attendance.user_id AND p.date = attendance.date
+                )
+                """,
+                (archived_until,)
+            )
+            cursor.execute("UPDATE meta SET value = 0 WHERE key = 'punch_watermark'")
+            while True:
+                result = _derive_batch(cursor, stats_cursor, config.PUNCH_DERIVE_BATCH, update_stats=False)
+                if result is None:
+                    break
+                folded += result[0]
+                changed += result[1]
+            _refresh_intern_stats(stats_cursor)
+            # Row IDs changed, so the presence index must be rebuilt too
+            _bump_status_version(cursor)
+            _bump_data_version(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+    return {"punches": folded, "days": changed}
 
+@metrics.timed()
+def get_punches(user_id, date):
+    """Get a user's punches on a date, in time order."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(
+        f"SELECT {', '.join(PUNCH_COLUMNS)} FROM punch_events WHERE user_id = ? AND date = ? ORDER BY time, id",
+        (user_id, date)
+    )
+    rows = [Punch._make(row) for row in cursor.fetchall()]
     conn.close()
-    return success
+    return rows
 
-def determine_status(check_in_time):
-    """Determine attendance status based on check-in time."""
+@metrics.timed()
+def determine_status(check_in_time, policy=None, schedule=None):
+    """
+    Determine attendance status based on check-in time, under a policy (default: config).
+
+    A schedule, if given, replaces the policy's start of the working day;
+    the late threshold still comes from the policy.
+    """
     india_tz = pytz.timezone('Asia/Kolkata')
+    if schedule:
+        work_start_time = schedule.start_time
+    else:
+        work_start_time = policy.work_start if policy else config.WORK_START_TIME
+    late_threshold = policy.late_threshold if policy else config.LATE_THRESHOLD
 
     if isinstance(check_in_time, str):
         # Parse the string time and make it timezone-aware
-        check_in_time = datetime.strptime(check_in_time, "%Y-%m-%d %H:%M:%S")
-        check_in_time = india_tz.localize(check_in_time)
+        check_in_time = india_tz.localize(_parse_timestamp(check_in_time))
 
     # Create work start time with the same date as check-in time
-    work_start_str = f"{check_in_time.strftime('%Y-%m-%d')} {config.WORK_START_TIME}:00"
+    work_start_str = f"{check_in_time.strftime('%Y-%m-%d')} {work_start_time}:00"
     work_start = datetime.strptime(work_start_str, "%Y-%m-%d %H:%M:%S")
     work_start = india_tz.localize(work_start)
 
     # If check-in is later than threshold, mark as late
     if check_in_time > work_start:
         minutes_late = (check_in_time - work_start).seconds // 60
-        if minutes_late > config.LATE_THRESHOLD:
+        if minutes_late > late_threshold:
             return config.STATUS_LATE
 
     return config.STATUS_PRESENT
 
-def get_attendance(user_id, start_date=None, end_date=None):
-    """Get attendance records for a user within a date range."""
+# Attendance policies
+_POLICY_EPOCH = "1970-01-01"  # Effective date of the initial default policy
+_DEFAULT_POLICY = Policy(None, None, config.WORK_START_TIME, config.LATE_THRESHOLD, _POLICY_EPOCH)
+WorkRules = namedtuple("WorkRules", ("policies", "schedules"))
+_work_rules = (None, None)  # ((database ID, rules version), WorkRules)
+_work_rules_lock = threading.Lock()
+
+def _get_work_rules(cursor):
+    """
+    Return the rules that determine check-in statuses.
+
+    The policies are {department: (effective dates, policy versions)}, each
+    sorted by effective date; the schedules are compiled into a
+    schedules.ScheduleIndex. Both are loaded once per rules version, which
+    only add_policy() and add_schedule() increment, so a policy or schedule
+    added by any process is used by the next check-in everywhere, while
+    check-ins themselves neither query either table nor recompile the index.
+    """
+    global _work_rules
+    cursor.execute("SELECT key, value FROM meta WHERE key IN ('database_id', 'rules_version')")
+    meta = dict(cursor.fetchall())
+    version = (meta['database_id'], meta['rules_version'])
+    with _work_rules_lock:
+        if _work_rules[0] != version:
+            cursor.execute(f"SELECT {', '.join(POLICY_COLUMNS)} FROM attendance_policies ORDER BY effective_from, id")
+            table = {}
+            for row in cursor.fetchall():
+                policy = Policy._make(row)
+                dates, policies = table.setdefault(policy.department, ([], []))
+                # A later version with the same effective date replaces the earlier one
+                if dates and dates[-1] == policy.effective_from:
+                    policies[-1] = policy
+                else:
+                    dates.append(policy.effective_from)
+                    policies.append(policy)
+            cursor.execute(f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedules ORDER BY id")
+            index = schedules.ScheduleIndex(Schedule._make(row) for row in cursor.fetchall())
+            _work_rules = (version, WorkRules(table, index))
+        return _work_rules[1]
+
+def _work_start_seconds(work_start):
+    """Return a start of the working day (HH:MM) in seconds after midnight."""
+    hours, minutes = map(int, work_start.split(":"))
+    return (hours * 60 + minutes) * 60
+
+def _policy_for(table, department, date):
+    """Return the policy in effect for a department on a date, falling back to the default policy."""
+    for key in (department, None):
+        if key in table:
+            dates, policies = table[key]
+            i = bisect.bisect_right(dates, date[:10]) - 1
+            if i >= 0:
+                return policies[i]
+    return _DEFAULT_POLICY
+
+# Character positions of a "YYYY-MM-DD HH:MM:SS" timestamp
+_TIMESTAMP_SEPARATORS = [4, 7, 10, 13, 16]
+_TIMESTAMP_SEPARATOR_CODES = np.array([ord(c) for c in "-- ::"])
+_TIMESTAMP_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+
+def _parse_timestamp(value):
+    """Parse an ISO 8601 check-in timestamp, raising ValueError for anything else."""
+    return datetime.fromisoformat(value)
+
+def _evaluate_statuses(rules, user_ids, departments, dates, check_in_times):
+    """
+    Determine the statuses of many check-ins at once, as determine_status would.
+
+    Args:
+        rules: Work rules from _get_work_rules()
+        user_ids: User ID of each check-in
+        departments: Department of each check-in
+        dates: Date of each check-in (YYYY-MM-DD)
+        check_in_times: Check-in timestamps (YYYY-MM-DD HH:MM:SS; other ISO 8601 forms are parsed
+            one by one)
+
+    Returns:
+        tuple: (statuses, policy IDs, schedule IDs) as NumPy arrays, -1 for no policy/schedule
+    """
+    count = len(dates)
+    table = rules.policies
+    dates = np.asarray(dates, dtype="U10")
+    departments = pd.Series(departments, dtype=object)
+    policy_ids = np.full(count, -1, dtype=np.int64)
+    work_start = np.full(count, _work_start_seconds(_DEFAULT_POLICY.work_start), dtype=np.int64)
+    threshold = np.full(count, _DEFAULT_POLICY.late_threshold, dtype=np.int64)
+
+    # Default policy first, then department policies where one is in effect
+    groups = [(None, np.arange(count))] + [
+        (department, positions) for department, positions in departments.groupby(departments).indices.items()
+    ]
+    for department, positions in groups:
+        if department not in table:
+            continue
+        effective_dates, policies = table[department]
+        version = np.searchsorted(np.asarray(effective_dates, dtype="U10"), dates[positions], side="right") - 1
+        found = version >= 0
+        positions, version = positions[found], version[found]
+        policy_ids[positions] = np.array([policy.id for policy in policies])[version]
+        work_start[positions] = np.array([_work_start_seconds(policy.work_start) for policy in policies])[version]
+        threshold[positions] = np.array([policy.late_threshold for policy in policies])[version]
+
+    # Schedules replace the policy's start of the day
+    schedule_ids = np.full(count, -1, dtype=np.int64)
+    if len(rules.schedules):
+        found = rules.schedules.lookup_many(np.asarray(user_ids, dtype=np.int64), departments.to_numpy(), dates)
+        scheduled = found >= 0
+        schedule_ids[scheduled] = np.array([schedule.id for schedule in rules.schedules.schedules])[found[scheduled]]
+        work_start[scheduled] = np.array(
+            [_work_start_seconds(schedule.start_time) for schedule in rules.schedules.schedules])[found[scheduled]]
+
+    # Seconds of the day, read straight from the digits of "YYYY-MM-DD HH:MM:SS" timestamps
+    check_in_times = np.asarray(check_in_times, dtype=str)
+    regular = np.char.str_len(check_in_times) == 19
+    codes = check_in_times.astype("U19").view(np.uint32).reshape(count, 19).astype(np.int64)
+    regular &= (codes[:, _TIMESTAMP_SEPARATORS] == _TIMESTAMP_SEPARATOR_CODES).all(axis=1)
+    digits = codes[:, _TIMESTAMP_DIGITS] - ord("0")
+    regular &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    seconds = ((digits[:, 8] * 10 + digits[:, 9]) * 3600 + (digits[:, 10] * 10 + digits[:, 11]) * 60
+               + digits[:, 12] * 10 + digits[:, 13])
+    # Other shapes (fractional seconds, a "T" separator, no seconds) are parsed, or fail, one by one
+    for i in np.flatnonzero(~regular).tolist():
+        check_in = _parse_timestamp(str(check_in_times[i]))
+        seconds[i] = check_in.hour * 3600 + check_in.minute * 60 + check_in.second
+    late_by = seconds - work_start
+    late = (late_by > 0) & (late_by // 60 > threshold)
+    return np.where(late, config.STATUS_LATE, config.STATUS_PRESENT), policy_ids, schedule_ids
+
+@metrics.timed()
+def get_policies():
+    """Get every attendance policy version, newest first."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"SELECT {', '.join(POLICY_COLUMNS)} FROM attendance_policies ORDER BY effective_from DESC, id DESC")
+    policies = [Policy._make(row) for row in cursor.fetchall()]
+    conn.close()
+    return policies
+
+@metrics.timed()
+def add_policy(work_start, late_threshold, effective_from, department=None):
+    """
+    Add a version of the lateness rule.
+
+    New check-ins use it from effective_from on; existing rows keep their
+    status until recompute_statuses() is run.
+
+    Args:
+        work_start: Start of the working day (HH:MM)
+        late_threshold: Minutes after work_start before a check-in is late
+        effective_from: First date the policy applies to (YYYY-MM-DD)
+        department: Optional department; None changes the default policy
+
+    Returns:
+        int: The new policy's ID
+    """
+    datetime.strptime(work_start, "%H:%M")
+    effective_from = _parse_date(effective_from).isoformat()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO attendance_policies (department, work_start, late_threshold, effective_from)
+        VALUES (?, ?, ?, ?) RETURNING id
+        """,
+        (department, work_start, int(late_threshold), effective_from)
+    )
+    policy_id = cursor.fetchone()[0]
+    _bump_rules_version(cursor)
+    _bump_data_version(cursor)
+    conn.commit()
+    conn.close()
+    return policy_id
+
+# Schedules
+@metrics.timed()
+def get_schedules():
+    """Get every schedule, newest first."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedules ORDER BY effective_from DESC, id DESC")
+    rows = [Schedule._make(row) for row in cursor.fetchall()]
+    conn.close()
+    return rows
+
+@metrics.timed()
+def get_schedule(user_id, date=None):
+    """
+    Get the schedule in effect for an intern on a date.
+
+    Args:
+        user_id: The intern's user ID
+        date: Optional date (YYYY-MM-DD), defaults to today
+
+    Returns:
+        Schedule: The schedule, or None if the policy's working day applies
+    """
+    date = date or datetime.now(pytz.timezone('Asia/Kolkata')).strftime("%Y-%m-%d")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("SELECT department FROM users WHERE id = ?", (user_id,))
+    row = cursor.fetchone()
+    schedule = _get_work_rules(cursor).schedules.lookup(user_id, row[0], date) if row else None
+    conn.close()
+    return schedule
+
+@metrics.timed()
+def add_schedule(start_time, end_time, effective_from, effective_to=None, department=None, user_id=None,
+                 weekday=None):
+    """
+    Add a schedule for a department or one intern.
+
+    New check-ins use it from effective_from on; existing rows keep their
+    status until recompute_statuses() is run.
+
+    Args:
+        start_time: Start of the working day (HH:MM)
+        end_time: End of the working day (HH:MM)
+        effective_from: First date the schedule applies to (YYYY-MM-DD)
+        effective_to: Optional last date the schedule applies to (YYYY-MM-DD)
+        department: Department the schedule applies to
+        user_id: Intern the schedule applies to, instead of a department
+        weekday: Optional weekday (0 = Monday); None applies to every day
+
+    Returns:
+        int: The new schedule's ID
+    """
+    if (department is None) == (user_id is None):
+        raise ValueError("A schedule applies to either a department or an intern")
+    if datetime.strptime(end_time, "%H:%M") <= datetime.strptime(start_time, "%H:%M"):
+        raise ValueError("end_time must be after start_time")
+    if weekday is not None and not 0 <= weekday <= 6:
+        raise ValueError("weekday must be from 0 (Monday) to 6 (Sunday)")
+    effective_from = _parse_date(effective_from).isoformat()
+    if effective_to is not None:
+        effective_to = _parse_date(effective_to).isoformat()
+        if effective_to < effective_from:
+            raise ValueError("effective_to must not be before effective_from")
+
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.execute(
+        """
+        INSERT INTO schedules (department, user_id, weekday, start_time, end_time, effective_from, effective_to)
+        VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING id
+        """,
+        (department, user_id, weekday, start_time, end_time, effective_from, effective_to)
+    )
+    schedule_id = cursor.fetchone()[0]
+    _bump_rules_version(cursor)
+    _bump_data_version(cursor)
+    conn.commit()
+    conn.close()
+    return schedule_id
 
-    query = "SELECT * FROM attendance WHERE user_id = ?"
-    params = [user_id]
+@metrics.timed()
+def recompute_statuses(start_date=None, end_date=None, department=None, batch_size=None):
+    """
+    Re-evaluate attendance statuses under the policies and schedules in effect on each date.
+
+    Rows are read in batches of config.STATUS_RECOMPUTE_BATCH by row ID,
+    evaluated in one vectorized pass per batch and the changed ones written
+    back with executemany, one transaction per batch, together with the
+    affected interns' present and late counts. Only statuses derived from
+    the check-in time (Present, Late) are re-evaluated; archived months are
+    closed and keep theirs.
 
+    Args:
+        start_date: Optional first date (YYYY-MM-DD)
+        end_date: Optional last date (YYYY-MM-DD)
+        department: Optional department filter
+        batch_size: Optional rows per batch
+
+    Returns:
+        dict: Rows examined, rows changed and interns with changed rows
+    """
+    batch_size = batch_size or config.STATUS_RECOMPUTE_BATCH
+    filters = ""
+    params = []
     if start_date:
-        query += " AND date >= ?"
+        filters += " AND a.date >= ?"
         params.append(start_date)
     if end_date:
-        query += " AND date <= ?"
+        filters += " AND a.date <= ?"
         params.append(end_date)
+    if department:
+        filters += " AND u.department = ?"
+        params.append(department)
 
-    query += " ORDER BY date DESC"
-    cursor.execute(query, params)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    backend = storage.get_backend()
+    examined = changed = 0
+    affected_users = set()
+    last_id = 0
+    try:
+        rules = _get_work_rules(cursor)
+        while True:
+            backend.begin(cursor, lock_table="attendance")
+            cursor.execute(
+                f"""
+                SELECT a.id, a.user_id, a.date, a.check_in_time, a.status, a.policy_id, a.schedule_id, u.department
+                FROM attendance a LEFT JOIN users u ON u.id = a.user_id
+                WHERE a.id > ? AND a.check_in_time IS NOT NULL AND a.status IN (?, ?){filters}
+                ORDER BY a.id
+                LIMIT ?
+                """,
+                (last_id, config.STATUS_PRESENT, config.STATUS_LATE, *params, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                conn.rollback()
+                break
+            ids, user_ids, dates, check_in_times, statuses, policy_ids, schedule_ids, departments = (
+                np.array(column, dtype=object) for column in zip(*rows)
+            )
+            new_statuses, new_policy_ids, new_schedule_ids = _evaluate_statuses(
+                rules, user_ids, departments, dates, check_in_times)
 
-    attendance = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+            status_changed = new_statuses != statuses.astype(str)
+            rule_changed = (
+                (new_policy_ids != np.array([-1 if p is None else p for p in policy_ids], dtype=np.int64))
+                | (new_schedule_ids != np.array([-1 if s is None else s for s in schedule_ids], dtype=np.int64))
+            )
+            updates = status_changed | rule_changed
+            if updates.any():
+                cursor.executemany(
+                    "UPDATE attendance SET status = ?, policy_id = ?, schedule_id = ? WHERE id = ?",
+                    zip(new_statuses[updates].tolist(),
+                        [None if p < 0 else p for p in new_policy_ids[updates].tolist()],
+                        [None if s < 0 else s for s in new_schedule_ids[updates].tolist()],
+                        ids[updates].tolist())
+                )
+                _bump_data_version(cursor)
+            if status_changed.any():
+                # Every change moves a day between present_count and late_count
+                late_delta = pd.Series(np.where(new_statuses[status_changed] == config.STATUS_LATE, 1, -1))
+                late_delta = late_delta.groupby(user_ids[status_changed].astype(np.int64)).sum()
+                cursor.executemany(
+                    "UPDATE intern_stats SET present_count = present_count - ?, late_count = late_count + ? "
+                    "WHERE user_id = ?",
+                    [(delta, delta, user_id) for user_id, delta in late_delta.items() if delta]
+                )
+                _bump_status_version(cursor)
+            conn.commit()
 
-    return attendance
+            examined += len(rows)
+            changed += int(status_changed.sum())
+            affected_users.update(user_ids[status_changed].tolist())
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
 
-def get_all_attendance(start_date=None, end_date=None, department=None):
-    """Get all attendance records within a date range, optionally filtered by department."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    return {"rows": examined, "changed": changed, "interns": len(affected_users)}
+
+_ATTENDANCE_SELECT = ", ".join(f"a.{col}" for col in ATTENDANCE_COLUMNS) + ", u.name, u.username, u.department"
+
+@metrics.timed()
+def iter_attendance(start_date=None, end_date=None, department=None, user_id=None, batch_size=None,
+                    by_user=False):
+    """
+    Yield attendance records lazily, newest first.
+
+    Rows are pulled from the cursor with fetchmany() in batches of batch_size
+    (default: config.FETCH_BATCH_SIZE), so callers that only stream or
+    aggregate never hold the full result list. If the range reaches into
+    archived months, their rows follow the SQLite rows; they are all older,
+    since archived months no longer accept writes.
+
+    With by_user, records come ordered by user ID and then date, oldest
+    first, so they can be grouped per intern in one pass; archived rows are
+    merged into each intern's run.
 
-    query = """
-    SELECT a.*, u.name, u.username, u.department
+    A single user's records (user_id given) include rows whose user no
+    longer exists, with name, username and department None; range-wide
+    queries only return rows of existing users.
+
+    Args:
+        start_date: Optional inclusive lower bound (YYYY-MM-DD)
+        end_date: Optional inclusive upper bound (YYYY-MM-DD)
+        department: Optional department name filter
+        user_id: Optional user filter
+        batch_size: Optional number of rows per fetch
+        by_user: Order by user ID and date instead of newest first
+
+    Yields:
+        AttendanceRecord: One record per attendance row
+    """
+    join = "LEFT JOIN" if user_id is not None else "JOIN"
+    query = f"""
+    SELECT {_ATTENDANCE_SELECT}
     FROM attendance a
-    JOIN users u ON a.user_id = u.id
+    {join} users u ON a.user_id = u.id
     WHERE 1=1
     """
     params = []
 
+    if user_id is not None:
+        query += " AND a.user_id = ?"
+        params.append(user_id)
     if start_date:
         query += " AND a.date >= ?"
         params.append(start_date)
@@ -313,24 +1816,668 @@ def get_all_attendance(start_date=None, end_date=None, department=None):
         query += " AND u.department = ?"
         params.append(department)
 
-    query += " ORDER BY a.date DESC, u.name"
-    cursor.execute(query, params)
+    query += " ORDER BY a.user_id, a.date" if by_user else " ORDER BY a.date DESC, u.name"
+
+    conn = get_db_connection()
+    try:
+        archived_through = conn.execute("SELECT MAX(last_date) FROM archive_manifest").fetchone()[0]
+        archived = archived_through and (not start_date or start_date <= archived_through)
+
+        cursor = storage.get_backend().stream(conn)
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        records = _iter_records(cursor, AttendanceRecord, batch_size)
+        if by_user and archived:
+            records = heapq.merge(_iter_archived(start_date, end_date, department, user_id, batch_size, by_user),
+                                  records, key=lambda record: (record.user_id, record.date))
+            archived = False
+        yield from records
+    finally:
+        conn.close()
+
+    if archived:
+        yield from _iter_archived(start_date, end_date, department, user_id, batch_size)
+
+def _iter_archived(start_date, end_date, department, user_id, batch_size=None, by_user=False):
+    """Yield archived attendance records, newest first or by user ID and date."""
+    table = archive.read(start_date, end_date, department, user_id)
+    if by_user:
+        table = table.sort_by([("user_id", "ascending"), ("date", "ascending")])
+    else:
+        table = table.sort_by([("date", "descending"), ("name", "ascending")])
+    make = AttendanceRecord._make
+    for batch in table.to_batches(max_chunksize=batch_size or config.FETCH_BATCH_SIZE):
+        for row in zip(*(column.to_pylist() for column in batch.columns)):
+            yield make(row)
+
+@metrics.timed()
+@cache.cached(get_data_version)
+def get_attendance(user_id, start_date=None, end_date=None):
+    """Get attendance records for a user within a date range."""
+    return list(iter_attendance(start_date, end_date, user_id=user_id))
+
+@metrics.timed()
+@cache.cached(get_data_version)
+def get_all_attendance(start_date=None, end_date=None, department=None):
+    """Get all attendance records within a date range, optionally filtered by department."""
+    return list(iter_attendance(start_date, end_date, department))
+
+@metrics.timed()
+@cache.cached(get_data_version)
+def get_attendance_table(start_date=None, end_date=None, department=None, user_id=None, columns=None):
+    """
+    Get attendance records as a pyarrow Table, newest first.
+
+    Holds the same rows as iter_attendance(), including a deleted user's rows
+    when user_id is given, but reads them column-wise
+    from the cursor into Arrow arrays (see _read_table()) and takes archived
+    months from the Parquet archive as Arrow directly, so pages can format
+    and display them without a list of records or a pandas DataFrame.
 
-    attendance = [dict(row) for row in cursor.fetchall()]
+    Args:
+        start_date: Optional inclusive lower bound (YYYY-MM-DD)
+        end_date: Optional inclusive upper bound (YYYY-MM-DD)
+        department: Optional department name filter
+        user_id: Optional user filter
+        columns: Optional list of columns to read (default: all of archive.SCHEMA,
+            the attendance columns plus name, username and department)
+
+    Returns:
+        pyarrow.Table: The selected columns
+    """
+    schema = pa.schema([archive.SCHEMA.field(column) for column in columns or archive.SCHEMA.names])
+    expressions = [f"u.{column}" if column in ("name", "username", "department") else f"a.{column}"
+                   for column in schema.names]
+    clauses = []
+    params = []
+    if user_id is not None:
+        clauses.append("a.user_id = ?")
+        params.append(user_id)
+    if start_date:
+        clauses.append("a.date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("a.date <= ?")
+        params.append(end_date)
+    if department:
+        clauses.append("u.department = ?")
+        params.append(department)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+    conn = get_db_connection()
+    try:
+        archived_through = conn.execute("SELECT MAX(last_date) FROM archive_manifest").fetchone()[0]
+
+        cursor = storage.get_backend().stream(conn)
+        cursor.row_factory = None
+        cursor.execute(
+            f"""
+            SELECT {", ".join(expressions)}
+            FROM attendance a
+            {"LEFT JOIN" if user_id is not None else "JOIN"} users u ON a.user_id = u.id
+            {where}
+            ORDER BY a.date DESC, u.name
+            """,
+            params
+        )
+        table = _read_table(cursor, schema)
+    finally:
+        conn.close()
+
+    if archived_through and (not start_date or start_date <= archived_through):
+        # Read the sort columns too, even when they are not selected
+        read_columns = [column for column in archive.SCHEMA.names if column in schema.names or column in ("date", "name")]
+        archived = archive.read(start_date, end_date, department, user_id, columns=read_columns)
+        archived = archived.sort_by([("date", "descending"), ("name", "ascending")]).select(schema.names)
+        table = pa.concat_tables([table, archived.cast(schema)])
+    return table
+
+@metrics.timed()
+def archive_closed_months(keep_months=None, vacuum=False):
+    """
+    Move closed months out of the attendance table into the Parquet archive.
+
+    Every month before the last keep_months months (default:
+    config.ARCHIVE_KEEP_MONTHS, counting the current one) is written to
+    archive.month_path(), recorded in archive_manifest and deleted from
+    SQLite, one month per transaction. The write lock is held while a month
+    is written, so no check-in can slip in between the copy and the delete.
+    Archived months no longer accept check-ins or check-outs.
+
+    Args:
+        keep_months: Optional number of recent months kept in SQLite
+        vacuum: Whether to VACUUM the database afterwards to shrink the file
+
+    Returns:
+        list: (year, month, row_count) of each archived month
+    """
+    keep_months = config.ARCHIVE_KEEP_MONTHS if keep_months is None else keep_months
+    today = datetime.now(pytz.UTC).astimezone(pytz.timezone('Asia/Kolkata')).date()
+    year, month = divmod(today.year * 12 + today.month - 1 - (keep_months - 1), 12)
+    cutoff = f"{year}-{month + 1:02d}-01"
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    archived = []
+    try:
+        cursor.execute("SELECT DISTINCT substr(date, 1, 7) FROM attendance WHERE date < ? ORDER BY 1", (cutoff,))
+        for year_month in [row[0] for row in cursor.fetchall()]:
+            year, month = int(year_month[:4]), int(year_month[5:7])
+            first_date = f"{year_month}-01"
+            last_date = f"{year_month}-{calendar.monthrange(year, month)[1]:02d}"
+
+            storage.get_backend().begin(cursor, lock_table="attendance")
+            try:
+                cursor.execute(
+                    f"""
+                    SELECT {_ATTENDANCE_SELECT}
+                    FROM attendance a
+                    LEFT JOIN users u ON a.user_id = u.id
+                    WHERE a.date BETWEEN ? AND ?
+                    """,
+                    (first_date, last_date)
+                )
+                rows = cursor.fetchall()
+                row_count = archive.write_month(year, month, rows)
+                cursor.execute(
+                    f"""
+                    INSERT INTO archive_manifest (year, month, path, row_count, first_date, last_date)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (year, month) DO UPDATE SET
+                        row_count = excluded.row_count,
+                        archived_at = {storage.get_backend().types['now']}
+                    """,
+                    (year, month, os.path.relpath(archive.month_path(year, month), config.ARCHIVE_DIR),
+                     row_count, first_date, last_date)
+                )
+                cursor.execute("DELETE FROM attendance WHERE date BETWEEN ? AND ?", (first_date, last_date))
+                _bump_data_version(cursor)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            archived.append((year, month, len(rows)))
+
+        if vacuum and archived:
+            storage.get_backend().vacuum(conn)
+    finally:
+        conn.close()
+
+    return archived
+
+# Intern statistics
+_STATUS_COUNT_COLUMNS = {
+    config.STATUS_PRESENT: "present_count",
+    config.STATUS_LATE: "late_count",
+    config.STATUS_HALF_DAY: "half_day_count",
+}
+
+def _parse_date(value):
+    """Parse a YYYY-MM-DD string (or date) into a date."""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+def _previous_working_day(day):
+    """Return the working day (Monday to Friday) before the given date."""
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+def _count_working_days(start, end):
+    """Count working days (Monday to Friday) in the inclusive range [start, end]."""
+    if end < start:
+        return 0
+    total_days = (end - start).days + 1
+    full_weeks, remainder = divmod(total_days, 7)
+    count = full_weeks * 5
+    for offset in range(remainder):
+        if (start + timedelta(days=offset)).weekday() < 5:
+            count += 1
+    return count
+
+def _minutes_of_day(timestamp):
+    """Return minutes after midnight of a 'YYYY-MM-DD HH:MM:SS' timestamp."""
+    return int(timestamp[11:13]) * 60 + int(timestamp[14:16])
+
+def _worked_seconds(check_in_time, check_out_time, worked_seconds=None):
+    """
+    Return the worked seconds of an attendance row.
+
+    Rows derived from the punch log carry their time inside sessions in
+    worked_seconds; rows written before it (worked_seconds NULL) count from
+    check-in to check-out, or 0 if either is missing.
+    """
+    if worked_seconds is not None:
+        return worked_seconds
+    if not check_in_time or not check_out_time:
+        return 0
+    check_in = datetime.strptime(check_in_time, "%Y-%m-%d %H:%M:%S")
+    check_out = datetime.strptime(check_out_time, "%Y-%m-%d %H:%M:%S")
+    return max(int((check_out - check_in).total_seconds()), 0)
+
+def _compute_stats(user_id, rows):
+    """Fold a user's attendance rows (date, check_in_time, check_out_time, status, worked_seconds), oldest first."""
+    counts = dict.fromkeys(_STATUS_COUNT_COLUMNS.values(), 0)
+    days_recorded = working_days_recorded = current_streak = longest_streak = 0
+    check_in_minutes = check_in_count = worked_seconds = 0
+    first_date = last_date = None
+
+    for date, check_in_time, check_out_time, status, row_worked_seconds in rows:
+        day = _parse_date(date)
+        if status in _STATUS_COUNT_COLUMNS:
+            counts[_STATUS_COUNT_COLUMNS[status]] += 1
+        days_recorded += 1
+        if day.weekday() < 5:
+            working_days_recorded += 1
+
+        if last_date is not None and last_date == _previous_working_day(day):
+            current_streak += 1
+        else:
+            current_streak = 1
+        longest_streak = max(longest_streak, current_streak)
+        first_date = first_date or day
+        last_date = day
+
+        if check_in_time:
+            check_in_minutes += _minutes_of_day(check_in_time)
+            check_in_count += 1
+        worked_seconds += _worked_seconds(check_in_time, check_out_time, row_worked_seconds)
+
+    return (user_id, counts["present_count"], counts["late_count"], counts["half_day_count"],
+            days_recorded, working_days_recorded, first_date and first_date.isoformat(), last_date and last_date.isoformat(),
+            current_streak, longest_streak, check_in_minutes, check_in_count, worked_seconds)
+
+def _refresh_intern_stats(cursor, user_id=None):
+    """Recompute intern_stats from the attendance table for one user, or for everyone."""
+    query = "SELECT user_id, date, check_in_time, check_out_time, status, worked_seconds FROM attendance"
+    params = []
+    if user_id is not None:
+        query += " WHERE user_id = ?"
+        params.append(user_id)
+        cursor.execute("DELETE FROM intern_stats WHERE user_id = ?", (user_id,))
+    else:
+        cursor.execute("DELETE FROM intern_stats")
+    query += " ORDER BY user_id, date"
+
+    read_cursor = storage.get_backend().stream(cursor.connection)
+    read_cursor.row_factory = None
+    read_cursor.execute(query, params)
+
+    # Archived months count too; merge them in (user_id, date) order. The archive keeps check-in and
+    # check-out only, so its days count as one session
+    archived = archive.read(user_id=user_id, columns=["user_id", "date", "check_in_time", "check_out_time", "status"])
+    archived = archived.sort_by([("user_id", "ascending"), ("date", "ascending")])
+    archived_rows = (row + (None,) for row in zip(*(column.to_pylist() for column in archived.columns)))
+    rows = heapq.merge(archived_rows, read_cursor, key=lambda row: (row[0], row[1]))
+
+    stats = [
+        _compute_stats(uid, (row[1:] for row in user_rows))
+        for uid, user_rows in groupby(rows, key=lambda row: row[0])
+    ]
+    storage.get_backend().bulk_insert(
+        cursor,
+        "intern_stats",
+        ("user_id", "present_count", "late_count", "half_day_count", "days_recorded", "working_days_recorded",
+         "first_date", "last_date", "current_streak", "longest_streak", "check_in_minutes_total", "check_in_count",
+         "worked_seconds_total"),
+        stats
+    )
+
+def _update_stats_on_check_in(cursor, user_id, date, time, status):
+    """Fold a newly inserted attendance row into the user's running statistics."""
+    cursor.execute("SELECT last_date, current_streak FROM intern_stats WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    day = _parse_date(date)
+
+    if row is None:
+        current_streak = 1
+        cursor.execute("INSERT INTO intern_stats (user_id, first_date) VALUES (?, ?)", (user_id, date))
+    else:
+        last_date = _parse_date(row['last_date']) if row['last_date'] else None
+        if last_date is not None and day <= last_date:
+            # Back-filled day: streaks depend on ordering, so recompute from scratch
+            _refresh_intern_stats(cursor, user_id)
+            return
+        if last_date is not None and last_date == _previous_working_day(day):
+            current_streak = row['current_streak'] + 1
+        else:
+            current_streak = 1
+
+    status_column = _STATUS_COUNT_COLUMNS.get(status)
+    status_update = f"{status_column} = {status_column} + 1," if status_column else ""
+    cursor.execute(
+        f"""
+        UPDATE intern_stats SET
+            {status_update}
+            days_recorded = days_recorded + 1,
+            working_days_recorded = working_days_recorded + ?,
+            last_date = ?,
+            current_streak = ?,
+            longest_streak = CASE WHEN longest_streak > ? THEN longest_streak ELSE ? END,
+            check_in_minutes_total = check_in_minutes_total + ?,
+            check_in_count = check_in_count + 1,
+            updated_at = {storage.get_backend().types['now']}
+        WHERE user_id = ?
+        """,
+        (int(day.weekday() < 5), date, current_streak, current_streak, current_streak, _minutes_of_day(time),
+         user_id)
+    )
+
+def _update_stats_on_check_out(cursor, user_id, delta):
+    """Add the worked seconds a check-out added to an attendance row to the user's running statistics."""
+    cursor.execute(
+        f"""
+        UPDATE intern_stats SET
+            worked_seconds_total = worked_seconds_total + ?,
+            updated_at = {storage.get_backend().types['now']}
+        WHERE user_id = ?
+        """,
+        (delta, user_id)
+    )
+
+@metrics.timed()
+def rebuild_intern_stats(user_id=None):
+    """Recompute the precomputed intern statistics from the attendance table."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    _refresh_intern_stats(cursor, user_id)
+    _bump_data_version(cursor)
+    conn.commit()
     conn.close()
+    return True
+
+@metrics.timed()
+def get_intern_stats(user_id, as_of=None):
+    """
+    Get the precomputed attendance statistics for an intern.
+
+    Counts and totals are read from the intern_stats table with a single
+    primary-key lookup. Absences are the working days (Monday to Friday)
+    since the intern's first attendance without a record; weekend records
+    do not offset them, and today only counts once it has passed.
+
+    Args:
+        user_id: The intern's user ID
+        as_of: Optional date to evaluate absences and streaks at (default: today in IST)
+
+    Returns:
+        InternStats, or None if the intern has no attendance yet
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM intern_stats WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    if row is None:
+        return None
+
+    if as_of is None:
+        as_of = datetime.now(pytz.UTC).astimezone(pytz.timezone('Asia/Kolkata')).date()
+    first_date = _parse_date(row['first_date'])
+    last_date = _parse_date(row['last_date'])
+
+    # Today is not an absence until it is over
+    elapsed_until = as_of if last_date >= as_of else as_of - timedelta(days=1)
+    absent_count = max(_count_working_days(first_date, elapsed_until) - row['working_days_recorded'], 0)
+
+    # The streak is broken once a working day has been missed
+    current_streak = row['current_streak']
+    if last_date < _previous_working_day(as_of):
+        current_streak = 0
+
+    average_check_in = None
+    if row['check_in_count']:
+        average_minutes = row['check_in_minutes_total'] // row['check_in_count']
+        average_check_in = f"{average_minutes // 60:02d}:{average_minutes % 60:02d}"
+
+    return InternStats(
+        user_id=user_id,
+        present_count=row['present_count'],
+        late_count=row['late_count'],
+        half_day_count=row['half_day_count'],
+        absent_count=absent_count,
+        days_recorded=row['days_recorded'],
+        current_streak=current_streak,
+        longest_streak=row['longest_streak'],
+        average_check_in=average_check_in,
+        total_hours=round(row['worked_seconds_total'] / 3600, 1),
+        first_date=row['first_date'],
+        last_date=row['last_date'],
+    )
+
+# Presence index
+_presence_index = None  # presence.PresenceIndex of this process
+_presence_lock = threading.Lock()
+_presence_unsaved = 0  # Check-ins indexed since the index was last saved
+_presence_masks = (None, {})  # ((database ID, users version), {department: bit mask of its interns})
+
+def _presence_rows(cursor, after_id=0):
+    """Return (ids, user_ids, dates, late) arrays of the live check-ins with a row ID above after_id."""
+    cursor.execute(
+        "SELECT id, user_id, date, status FROM attendance WHERE id > ? AND check_in_time IS NOT NULL",
+        (after_id,)
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return [], [], [], []
+    ids, user_ids, dates, statuses = zip(*rows)
+    return ids, user_ids, dates, [status == config.STATUS_LATE for status in statuses]
+
+def _build_presence_index(cursor, database_id, status_version):
+    """Index every check-in, live and archived."""
+    ids, user_ids, dates, late = _presence_rows(cursor)
+    table = archive.read(columns=["id", "user_id", "date", "status", "check_in_time"])
+    table = table.filter(table["check_in_time"].is_valid())
+    ids = list(ids) + table["id"].to_pylist()
+    user_ids = list(user_ids) + table["user_id"].to_pylist()
+    dates = list(dates) + table["date"].to_pylist()
+    late = list(late) + [status == config.STATUS_LATE for status in table["status"].to_pylist()]
+
+    if dates:
+        first_date = _parse_date(min(dates))
+    else:
+        first_date = datetime.now(pytz.UTC).astimezone(pytz.timezone('Asia/Kolkata')).date()
+    index = presence.PresenceIndex(presence.monday_of(first_date), database_id=database_id,
+                                   status_version=status_version)
+    index.add(ids, user_ids, dates, late)
+    return index
+
+def _get_presence_index(rebuild=False):
+    """
+    Return the presence index, caught up with every check-in committed so far,
+    and the bit masks of the interns of each department.
+
+    The saved index is loaded on first use. New check-ins add attendance
+    rows, so rows with an ID above the index's watermark, written by any
+    process, are all it needs to catch up on; writes that change the
+    check-in or status of an existing row (a check-in filling in a row
+    without one, a re-fold of punches, a status recompute) bump the status
+    version instead. The index is rebuilt if it is missing, belongs to
+    another database, the status version changed since it was built or a
+    check-in predates its first week. Rows edited outside this module need
+    rebuild_presence_index(). Must be called with _presence_lock held.
+    """
+    global _presence_index, _presence_unsaved, _presence_masks
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    try:
+        cursor.execute("SELECT key, value FROM meta WHERE key IN ('database_id', 'users_version', 'status_version')")
+        meta = dict(cursor.fetchall())
+        database_id, status_version = meta['database_id'], meta['status_version']
 
-    return attendance
+        index = None if rebuild else _presence_index
+        if index is None and not rebuild:
+            index = presence.PresenceIndex.load(config.PRESENCE_INDEX_PATH)
+        # Changed check-ins and statuses affect rows already indexed
+        if index is not None and (index.database_id, index.status_version) != (database_id, status_version):
+            index = None
+        if index is not None:
+            ids, user_ids, dates, late = _presence_rows(cursor, index.watermark)
+            if index.add(ids, user_ids, dates, late):
+                _presence_unsaved += len(ids)
+            else:
+                index = None
+
+        if index is None:
+            index = _build_presence_index(cursor, database_id, status_version)
+            _presence_unsaved = 0
+            index.save(config.PRESENCE_INDEX_PATH)
+        elif _presence_unsaved >= config.PRESENCE_SAVE_EVERY:
+            _presence_unsaved = 0
+            index.save(config.PRESENCE_INDEX_PATH)
+
+        if _presence_index is None:
+            atexit.register(_save_presence_index)
+        _presence_index = index
+
+        # Interns and their departments only change with the users version, not with check-ins
+        version, masks = _presence_masks
+        if version != (database_id, meta['users_version']) or any(len(mask) != index.present.shape[1] for mask in masks.values()):
+            cursor.execute("SELECT department, id FROM users WHERE role = ? ORDER BY department", (config.ROLE_INTERN,))
+            masks = {
+                department: index.mask([user_id for _, user_id in rows])
+                for department, rows in groupby(cursor.fetchall(), key=lambda row: row[0])
+            }
+            _presence_masks = ((database_id, meta['users_version']), masks)
+        return index, masks
+    finally:
+        conn.close()
+
+def _save_presence_index():
+    """Save check-ins indexed since the last save."""
+    global _presence_unsaved
+    with _presence_lock:
+        if _presence_index is not None and _presence_unsaved:
+            _presence_index.save(config.PRESENCE_INDEX_PATH)
+            _presence_unsaved = 0
+
+def _cohort_mask(index, masks, department=None):
+    """Return the bit mask of all interns, or of one department's interns."""
+    if department is not None:
+        return masks.get(department, index.mask([]))
+    mask = index.mask([])
+    for dept_mask in masks.values():
+        mask |= dept_mask
+    return mask
+
+@metrics.timed()
+def rebuild_presence_index():
+    """Rebuild the presence index from the attendance table and the archive."""
+    with _presence_lock:
+        _get_presence_index(rebuild=True)
+    return True
+
+@metrics.timed()
+def get_interns_present_every_day(start_date, end_date, department=None):
+    """
+    Get the interns who checked in on every working day of a date range.
+
+    Args:
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD)
+        department: Optional department filter
+
+    Returns:
+        list: User IDs, ascending
+    """
+    with _presence_lock:
+        index, masks = _get_presence_index()
+        bits = index.present_every_day(_parse_date(start_date), _parse_date(end_date), _cohort_mask(index, masks, department))
+    return index.members(bits).tolist()
+
+@metrics.timed()
+def get_interns_absent_streak(length, start_date, end_date, department=None):
+    """
+    Get the interns absent on at least `length` consecutive working days of a date range.
+
+    Args:
+        length: Number of consecutive working days without a check-in
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD)
+        department: Optional department filter
+
+    Returns:
+        list: User IDs, ascending
+    """
+    # Working days that have not come yet are not absences
+    today = datetime.now(pytz.UTC).astimezone(pytz.timezone('Asia/Kolkata')).date()
+    end_date = min(_parse_date(end_date), today)
+    with _presence_lock:
+        index, masks = _get_presence_index()
+        bits = index.absent_streak(_parse_date(start_date), end_date, length,
+                                   _cohort_mask(index, masks, department))
+    return index.members(bits).tolist()
+
+@metrics.timed()
+def get_attendance_rates(start_date, end_date, department=None):
+    """
+    Get the share of intern working days with a check-in, and with a late one, per department.
+
+    Args:
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD)
+        department: Optional department filter
+
+    Returns:
+        list: Dicts with department, interns, working_days, present_rate and late_rate
+    """
+    start, end = _parse_date(start_date), _parse_date(end_date)
+    rates = []
+    with _presence_lock:
+        index, masks = _get_presence_index()
+        working_days = index.working_days(start, end)
+        selected = {dept: mask for dept, mask in masks.items() if department is None or dept == department}
+        for dept, mask in sorted(selected.items(), key=lambda item: item[0] or ""):
+            _, present, late = index.daily_counts(start, end, mask)
+            interns = index.count(mask)
+            possible = interns * working_days
+            rates.append({
+                "department": dept,
+                "interns": interns,
+                "working_days": working_days,
+                "present_rate": int(present.sum()) / possible if possible else 0.0,
+                "late_rate": int(late.sum()) / possible if possible else 0.0,
+            })
+    return rates
+
+@metrics.timed()
+def get_presence_counts(start_date, end_date, department=None):
+    """
+    Count each intern's working days with a check-in, and with a late one.
+
+    Args:
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD)
+        department: Optional department filter
+
+    Returns:
+        dict: User ID -> (present days, late days)
+    """
+    with _presence_lock:
+        index, masks = _get_presence_index()
+        user_ids, present, late = index.user_counts(_parse_date(start_date), _parse_date(end_date),
+                                                    _cohort_mask(index, masks, department))
+    return dict(zip(user_ids.tolist(), zip(present.tolist(), late.tolist())))
 
+@metrics.timed()
+@cache.cached(get_data_version)
 def get_departments():
     """Get all departments."""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM departments ORDER BY name")
-    departments = [dict(row) for row in cursor.fetchall()]
+    cursor.row_factory = None
+    cursor.execute("SELECT id, name FROM departments ORDER BY name")
+    departments = [Department._make(row) for row in cursor.fetchall()]
     conn.close()
 
     return departments
 
+@metrics.timed()
 def add_department(name):
     """Add a new department."""
     conn = get_db_connection()
@@ -338,9 +2485,10 @@ def add_department(name):
 
     try:
         cursor.execute("INSERT INTO departments (name) VALUES (?)", (name,))
+        _bump_data_version(cursor)
         conn.commit()
         success = True
-    except sqlite3.IntegrityError:
+    except storage.IntegrityError:
         success = False
 
     conn.close()
@@ -0,0 +1,240 @@
+"""
+Check-in ingestion service for kiosks and badge readers.
+
+A lightweight asyncio HTTP endpoint that accepts single or batched
+check-in/out events, acknowledges them as soon as they are queued, and
+commits them in grouped transactions through database.record_events.
+
+Run with:
+    python ingest.py [--host HOST] [--port PORT]
+
+Endpoints:
+    POST /events   One event object or a list of them:
+                   {"action": "check_in", "user_id": 7,
+                    "time": "2024-05-01 09:02:11", "request_key": "kiosk-3:1234"}
+                   Returns 202 with the number of accepted events. With
+                   ?wait=1 the response is sent after the commit and
+                   includes one result per event: true/false, or
+                   {"error": "..."} for an event that failed.
+    GET  /health   Queue depth and check-in/out counters.
+    GET  /metrics  Instrumentation in the Prometheus text format.
+"""
+import argparse
+import asyncio
+import hmac
+import logging
+from datetime import datetime
+from aiohttp import web
+import config
+import database as db
+import metrics
+import storage
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("check_in", "check_out")
+
+QUEUE_KEY = web.AppKey("queue", asyncio.Queue)
+WRITER_KEY = web.AppKey("writer", asyncio.Task)
+
+def parse_event(payload):
+    """
+    Validate one event payload and normalize it for database.record_events.
+
+    Args:
+        payload: The decoded JSON object
+
+    Returns:
+        dict: The normalized event
+
+    Raises:
+        ValueError: If the payload is not a valid event
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("event must be an object")
+
+    action = payload.get("action")
+    if action not in ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+
+    user_id = payload.get("user_id")
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise ValueError("user_id must be an integer")
+
+    time = payload.get("time")
+    date = payload.get("date")
+    if time is not None:
+        try:
+            datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            raise ValueError("time must be formatted as YYYY-MM-DD HH:MM:SS") from None
+        # A kiosk timestamp belongs to its own day, even if it arrives after midnight
+        date = date or time[:10]
+    if date is not None:
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError("date must be formatted as YYYY-MM-DD") from None
+
+    request_key = payload.get("request_key")
+    if request_key is not None and not isinstance(request_key, str):
+        raise ValueError("request_key must be a string")
+
+    return {"action": action, "user_id": user_id, "date": date, "time": time, "request_key": request_key}
+
+def _is_authorized(request):
+    """Check the Bearer token when config.INGEST_API_TOKEN is set."""
+    if not config.INGEST_API_TOKEN:
+        return True
+    expected = f"Bearer {config.INGEST_API_TOKEN}"
+    return hmac.compare_digest(request.headers.get("Authorization", ""), expected)
+
+async def handle_events(request):
+    """Queue one or more events and acknowledge them."""
+    if not _is_authorized(request):
+        return web.json_response({"error": "unauthorized"}, status=401)
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        return web.json_response({"error": "body must be JSON"}, status=400)
+
+    payloads = payload if isinstance(payload, list) else [payload]
+    if not payloads:
+        return web.json_response({"error": "no events"}, status=400)
+
+    try:
+        events = [parse_event(item) for item in payloads]
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+
+    queue = request.app[QUEUE_KEY]
+    if queue.maxsize and queue.qsize() + len(events) > queue.maxsize:
+        return web.json_response({"error": "ingestion queue is full, retry later"}, status=503)
+
+    loop = asyncio.get_running_loop()
+    futures = []
+    for event in events:
+        future = loop.create_future()
+        queue.put_nowait((event, future))
+        futures.append(future)
+
+    if request.query.get("wait") in ("1", "true"):
+        results = await asyncio.gather(*futures)
+        return web.json_response({"accepted": len(events), "results": results})
+
+    return web.json_response({"accepted": len(events)}, status=202)
+
+async def handle_health(request):
+    """Report queue depth and check-in/out counters."""
+    return web.json_response({
+        "status": "ok",
+        "queued": request.app[QUEUE_KEY].qsize(),
+        "counters": db.get_action_counters(),
+    })
+
+async def handle_metrics(request):
+    """Export the service's instrumentation in the Prometheus text format."""
+    return web.Response(text=metrics.to_prometheus(), content_type="text/plain")
+
+async def _collect_batch(queue):
+    """
+    Wait for one event, then gather more until the batch is full or its delay expires.
+
+    Returns:
+        tuple: (list of (event, future) pairs, whether shutdown was requested)
+    """
+    loop = asyncio.get_running_loop()
+    item = await queue.get()
+    if item is None:
+        return [], True
+
+    batch = [item]
+    deadline = loop.time() + config.INGEST_BATCH_DELAY_MS / 1000
+    while len(batch) < config.INGEST_BATCH_SIZE:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            break
+        if item is None:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+async def _commit_loop(app):
+    """
+    Commit queued events in grouped transactions, off the event loop.
+
+    Events were acknowledged when queued, so none is dropped: a batch whose
+    transaction fails, and events that failed for a transient reason, are
+    retried with a growing delay until they commit. Only an event that
+    fails on its own (e.g. an unknown user) is resolved with its error.
+    """
+    queue = app[QUEUE_KEY]
+    loop = asyncio.get_running_loop()
+    stopping = False
+    retry = []
+    delay = config.INGEST_RETRY_DELAY_MS / 1000
+    while not stopping or retry:
+        if retry:
+            batch, retry = retry, []
+        else:
+            batch, stopping = await _collect_batch(queue)
+        if not batch:
+            continue
+        events = [event for event, _ in batch]
+        try:
+            results = await loop.run_in_executor(None, db.record_events, events)
+        except Exception:
+            logger.exception("Failed to commit %d events, retrying in %.1fs", len(events), delay)
+            results = [None] * len(batch)
+            retry = batch
+        for (event, future), result in zip(batch, results):
+            if isinstance(result, storage.OperationalError):
+                retry.append((event, future))
+            elif isinstance(result, Exception):
+                logger.error("Failed to record event %s: %s", event, result)
+                if not future.done():
+                    future.set_result({"error": str(result)})
+            elif result is not None and not future.done():
+                future.set_result(result)
+        if retry:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, config.INGEST_RETRY_MAX_DELAY_MS / 1000)
+        else:
+            delay = config.INGEST_RETRY_DELAY_MS / 1000
+
+async def _start_writer(app):
+    app[QUEUE_KEY] = asyncio.Queue(maxsize=config.INGEST_QUEUE_SIZE)
+    app[WRITER_KEY] = asyncio.create_task(_commit_loop(app))
+
+async def _stop_writer(app):
+    # The sentinel is queued behind acknowledged events, so they are committed first
+    await app[QUEUE_KEY].put(None)
+    await app[WRITER_KEY]
+
+def create_app():
+    """Create the ingestion web application."""
+    app = web.Application()
+    app.router.add_post("/events", handle_events)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.on_startup.append(_start_writer)
+    app.on_cleanup.append(_stop_writer)
+    return app
+
+def main():
+    """Run the ingestion service."""
+    parser = argparse.ArgumentParser(description="Check-in ingestion service for kiosks and badge readers.")
+    parser.add_argument("--host", default=config.INGEST_HOST)
+    parser.add_argument("--port", type=int, default=config.INGEST_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
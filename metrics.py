@@ -0,0 +1,235 @@
+"""
+In-process instrumentation for the attendance tracking system.
+
+Functions decorated with timed() (every public database.py function and
+every page's show()) record their duration, the number of rows they
+returned and the shape of their arguments. Samples are aggregated per
+name into histograms with p50/p95/p99 over a sliding window, which can be
+viewed on the admin Performance page or exported as JSON or Prometheus
+text, optionally from a local HTTP endpoint.
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import config
+
+_histograms = {}
+_lock = threading.Lock()
+_server = None
+
+class _Histogram:
+    """Running totals plus a sliding window of recent durations for one name."""
+    __slots__ = ("count", "total", "max", "rows", "samples", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=config.METRICS_WINDOW)
+        self.shapes = Counter()
+
+def record(name, duration, rows=None, args_shape=None):
+    """
+    Record one observation.
+
+    Args:
+        name: Metric name, e.g. "db.get_all_attendance"
+        duration: Duration in seconds
+        rows: Optional number of rows returned
+        args_shape: Optional description of the arguments' shape
+    """
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.count += 1
+        histogram.total += duration
+        histogram.max = max(histogram.max, duration)
+        histogram.samples.append(duration)
+        if rows is not None:
+            histogram.rows += rows
+        if args_shape is not None and (args_shape in histogram.shapes
+                                       or len(histogram.shapes) < config.METRICS_MAX_SHAPES):
+            histogram.shapes[args_shape] += 1
+
+@contextmanager
+def span(name, args_shape=None):
+    """Time a block of code under the given name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, args_shape=args_shape)
+
+def _shape_of(value):
+    """Describe a value by type (and length for containers), never by content."""
+    if value is None:
+        return "None"
+    if isinstance(value, (list, tuple, dict, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+def _args_shape(parameter_names, args, kwargs):
+    """Describe call arguments as name:type pairs, skipping defaults that were not passed."""
+    parts = [f"{name}:{_shape_of(value)}" for name, value in zip(parameter_names, args)]
+    parts.extend(f"{name}:{_shape_of(value)}" for name, value in sorted(kwargs.items()))
+    return ",".join(parts)
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if hasattr(result, "num_rows"):
+        return result.num_rows
+    return None
+
+def timed(name=None):
+    """
+    Decorator that records every call of a function.
+
+    Generator functions are timed until they are exhausted or closed,
+    and their row count is the number of items yielded.
+
+    Args:
+        name: Metric name (default: "<module>.<function>")
+    """
+    def decorator(func):
+        metric_name = name or f"{func.__module__}.{func.__name__}"
+        parameter_names = list(inspect.signature(func).parameters)
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                shape = _args_shape(parameter_names, args, kwargs)
+                start = time.perf_counter()
+                rows = 0
+                try:
+                    for item in func(*args, **kwargs):
+                        rows += 1
+                        yield item
+                finally:
+                    record(metric_name, time.perf_counter() - start, rows, shape)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                record(metric_name, time.perf_counter() - start, _row_count(result),
+                       _args_shape(parameter_names, args, kwargs))
+        return wrapper
+    return decorator
+
+def _percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_samples) - 1))), len(sorted_samples) - 1)
+    return sorted_samples[index]
+
+def snapshot():
+    """
+    Get the aggregated metrics.
+
+    Returns:
+        list: One dict per metric name, sorted by total time (descending);
+        durations are in milliseconds
+    """
+    with _lock:
+        items = [(name, h.count, h.total, h.max, h.rows, sorted(h.samples), h.shapes.most_common(3))
+                 for name, h in _histograms.items()]
+
+    metrics = []
+    for name, count, total, maximum, rows, samples, shapes in items:
+        metrics.append({
+            "name": name,
+            "count": count,
+            "total_ms": round(total * 1000, 3),
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+            "max_ms": round(maximum * 1000, 3),
+            "rows_total": rows,
+            "mean_rows": round(rows / count, 1) if count else 0.0,
+            "top_arg_shapes": [shape for shape, _ in shapes],
+        })
+    metrics.sort(key=lambda metric: metric["total_ms"], reverse=True)
+    return metrics
+
+def reset():
+    """Discard all recorded metrics."""
+    with _lock:
+        _histograms.clear()
+
+def to_json():
+    """Export the aggregated metrics as JSON."""
+    return json.dumps({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "metrics": snapshot()}, indent=2)
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def to_prometheus():
+    """Export the aggregated metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP attendance_call_duration_seconds Duration of instrumented calls.",
+        "# TYPE attendance_call_duration_seconds summary",
+    ]
+    metrics = snapshot()
+    for metric in metrics:
+        label = _label(metric["name"])
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+            lines.append(f'attendance_call_duration_seconds{{name="{label}",quantile="{quantile}"}} '
+                         f'{metric[key] / 1000:.6f}')
+        lines.append(f'attendance_call_duration_seconds_sum{{name="{label}"}} {metric["total_ms"] / 1000:.6f}')
+        lines.append(f'attendance_call_duration_seconds_count{{name="{label}"}} {metric["count"]}')
+
+    lines.append("# HELP attendance_call_rows_total Rows returned by instrumented calls.")
+    lines.append("# TYPE attendance_call_rows_total counter")
+    for metric in metrics:
+        lines.append(f'attendance_call_rows_total{{name="{_label(metric["name"])}"}} {metric["rows_total"]}')
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves /metrics (Prometheus text) and /metrics.json."""
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(host=None, port=None):
+    """
+    Serve the metrics from a background thread; safe to call on every rerun.
+
+    Returns:
+        tuple: The (host, port) the server is bound to
+    """
+    global _server
+    with _lock:
+        if _server is None:
+            address = (host or config.METRICS_HOST, config.METRICS_PORT if port is None else port)
+            _server = ThreadingHTTPServer(address, _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server.server_address
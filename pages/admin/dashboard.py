@@ -2,15 +2,19 @@
 Admin dashboard page for the attendance tracking system.
 """
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime, timedelta
 import database as db
 import auth
 import utils
+import charts
+import analytics
+import metrics
 import config
 
 @auth.require_admin
+@metrics.timed()
 def show():
     """Display the admin dashboard."""
     utils.apply_custom_css()
@@ -43,30 +47,26 @@ def show():
     start_str = start_date.strftime("%Y-%m-%d")
     end_str = end_date.strftime("%Y-%m-%d")
 
-    # Get attendance data
-    if selected_dept == "All":
-        attendance_data = db.get_all_attendance(start_str, end_str)
-    else:
-        attendance_data = db.get_all_attendance(start_str, end_str, selected_dept)
+    # Get attendance data as Arrow
+    department = None if selected_dept == "All" else selected_dept
+    attendance_table = db.get_attendance_table(
+        start_str, end_str, department,
+        columns=['user_id', 'name', 'date', 'check_in_time', 'check_out_time', 'status', 'department']
+    )
 
-    # Get all interns
-    interns = db.get_all_users(role=config.ROLE_INTERN)
+    # Number of interns
+    total_interns = db.count_users(role=config.ROLE_INTERN)
 
     # Display statistics
     st.markdown("<h2 class='sub-header'>Attendance Statistics</h2>", unsafe_allow_html=True)
 
-    if attendance_data:
-        # Convert to DataFrame for analysis
-        df = pd.DataFrame(attendance_data)
-
-        # Calculate statistics
-        total_interns = len(interns)
-        active_interns = len(df['user_id'].unique())
-        total_check_ins = len(df)
+    if attendance_table.num_rows:
+        # Calculate statistics in Arrow compute
+        active_interns = pc.count_distinct(attendance_table['user_id']).as_py()
 
         # Calculate present, late, and absent counts
-        present_count = len(df[df['status'] == config.STATUS_PRESENT])
-        late_count = len(df[df['status'] == config.STATUS_LATE])
+        present_count = pc.sum(pc.equal(attendance_table['status'], config.STATUS_PRESENT)).as_py() or 0
+        late_count = pc.sum(pc.equal(attendance_table['status'], config.STATUS_LATE)).as_py() or 0
 
         # Calculate attendance rate
         if total_interns > 0:
@@ -88,152 +88,67 @@ def show():
         # Attendance trend chart
         st.markdown("<h2 class='sub-header'>Attendance Trend</h2>", unsafe_allow_html=True)
 
-        # Group by date and count
-        df['date'] = pd.to_datetime(df['date'])
-        daily_counts = df.groupby(df['date'].dt.date).size().reset_index(name='count')
-        daily_counts.columns = ['Date', 'Check-ins']
+        # Check-ins per day, week or month depending on the range, counted in SQL
+        bucket, bucket_label = charts.time_bucket(start_date, end_date)
+        trend = analytics.daily_by_status(start_str, end_str, department, bucket=bucket)
+        trend_counts = trend.groupby('Date', as_index=False)['Count'].sum()
+        trend_counts.columns = ['Date', 'Check-ins']
 
         # Create line chart
-        fig = px.line(
-            daily_counts,
+        fig = charts.plot(
+            "line",
+            trend_counts,
             x='Date',
             y='Check-ins',
-            title='Daily Attendance',
-            markers=True
-        )
-        fig.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Number of Check-ins",
-            plot_bgcolor='rgba(0,0,0,0)',
-            xaxis=dict(showgrid=False),
-            yaxis=dict(showgrid=True, gridcolor='rgba(200,200,200,0.2)')
+            title=f'{bucket_label} Attendance',
+            markers=True,
+            layout=dict(
+                xaxis_title="Date",
+                yaxis_title="Number of Check-ins",
+                plot_bgcolor='rgba(0,0,0,0)',
+                xaxis=dict(showgrid=False),
+                yaxis=dict(showgrid=True, gridcolor='rgba(200,200,200,0.2)')
+            )
         )
         st.plotly_chart(fig, use_container_width=True)
 
         # Department distribution
-        if 'department' in df.columns:
+        if 'department' in attendance_table.column_names:
             st.markdown("<h2 class='sub-header'>Department Distribution</h2>", unsafe_allow_html=True)
-            dept_counts = df.groupby('department').size().reset_index(name='count')
-            dept_counts.columns = ['Department', 'Check-ins']
+            dept_counts = attendance_table.group_by('department').aggregate([([], 'count_all')])
+            dept_counts = dept_counts.filter(pc.is_valid(dept_counts['department'])).select(['department', 'count_all'])
+            dept_counts = dept_counts.rename_columns(['Department', 'Check-ins']).sort_by('Department').to_pandas()
 
-            fig = px.pie(
+            fig = charts.plot(
+                "pie",
                 dept_counts,
                 values='Check-ins',
                 names='Department',
                 title='Attendance by Department',
-                hole=0.4
+                hole=0.4,
+                layout=dict(plot_bgcolor='rgba(0,0,0,0)')
             )
-            fig.update_layout(plot_bgcolor='rgba(0,0,0,0)')
             st.plotly_chart(fig, use_container_width=True)
 
         # Attendance Calendar
         st.markdown("<h2 class='sub-header'>Attendance Calendar</h2>", unsafe_allow_html=True)
 
-        # Create a date range for the selected period
-        date_range = pd.date_range(start=start_date, end=end_date)
-
-        # Create a DataFrame with all dates in the range
-        calendar_df = pd.DataFrame({'date': date_range})
-        calendar_df['day'] = calendar_df['date'].dt.day_name()
-        calendar_df['week'] = calendar_df['date'].dt.isocalendar().week
-        calendar_df['month'] = calendar_df['date'].dt.month_name()
-        calendar_df['day_num'] = calendar_df['date'].dt.day
-
-        # Merge with attendance data
-        calendar_df['date_str'] = calendar_df['date'].dt.strftime('%Y-%m-%d')
-        attendance_df = pd.DataFrame(attendance_data)
-        attendance_df['date_str'] = pd.to_datetime(attendance_df['date']).dt.strftime('%Y-%m-%d')
-
-        # Count attendance by date and status
-        status_by_date = attendance_df.groupby(['date_str', 'status']).size().reset_index(name='count')
-
-        # Get the most common status for each date
-        status_by_date = status_by_date.sort_values('count', ascending=False)
-        status_by_date = status_by_date.drop_duplicates('date_str')
-
-        # Merge to get status for each day
-        calendar_df = calendar_df.merge(
-            status_by_date[['date_str', 'status']],
-            on='date_str',
-            how='left'
-        )
-
-        # Fill missing status with 'Absent'
-        calendar_df['status'].fillna(config.STATUS_ABSENT, inplace=True)
-
-        # Define color mapping for different statuses
-        color_map = {
-            config.STATUS_PRESENT: '#28a745',  # Green
-            config.STATUS_LATE: '#ffc107',     # Yellow
-            config.STATUS_HALF_DAY: '#17a2b8', # Blue
-            config.STATUS_ABSENT: '#dc3545'    # Red
-        }
+        # The most common status and the number of check-ins of each day, for at most
+        # config.CHART_CALENDAR_MAX_DAYS days
+        calendar_start = max(start_date, end_date - timedelta(days=config.CHART_CALENDAR_MAX_DAYS - 1))
+        status_by_date = analytics.daily_by_status(calendar_start.strftime("%Y-%m-%d"), end_str, department)
+        status_by_date = status_by_date.assign(date=status_by_date['Date'].dt.strftime('%Y-%m-%d'))
+        days = status_by_date.sort_values('Count', ascending=False, kind='stable').drop_duplicates('date')
+        days = days.set_index('date').rename(columns={'Status': 'status'})
+        days['check_ins'] = status_by_date.groupby('date')['Count'].sum()
 
-        # Create a numeric value for each status for the heatmap
-        status_value_map = {
-            config.STATUS_PRESENT: 3,
-            config.STATUS_LATE: 2,
-            config.STATUS_HALF_DAY: 1,
-            config.STATUS_ABSENT: 0
-        }
-
-        calendar_df['status_value'] = calendar_df['status'].map(status_value_map)
-
-        # Create a heatmap calendar
-        # Group by week and day for the heatmap
-        calendar_pivot = calendar_df.pivot_table(
-            index='week',
-            columns='day',
-            values='status_value',
-            aggfunc='first'
-        )
-
-        # Reorder columns to start with Monday
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        calendar_pivot = calendar_pivot.reindex(columns=day_order)
-
-        # Create the heatmap
-        fig = px.imshow(
-            calendar_pivot,
-            labels=dict(x="Day of Week", y="Week", color="Status"),
-            x=calendar_pivot.columns,
-            y=calendar_pivot.index,
-            color_continuous_scale=[
-                [0.0, color_map[config.STATUS_ABSENT]],
-                [0.33, color_map[config.STATUS_HALF_DAY]],
-                [0.66, color_map[config.STATUS_LATE]],
-                [1.0, color_map[config.STATUS_PRESENT]]
-            ],
-            title="Attendance Calendar"
-        )
-
-        # Add date annotations to the heatmap
-        for i, week in enumerate(calendar_pivot.index):
-            for j, day in enumerate(calendar_pivot.columns):
-                day_data = calendar_df[(calendar_df['week'] == week) & (calendar_df['day'] == day)]
-                if not day_data.empty:
-                    day_num = day_data.iloc[0]['day_num']
-                    status = day_data.iloc[0]['status']
-                    count = attendance_df[attendance_df['date_str'] == day_data.iloc[0]['date_str']].shape[0]
-                    fig.add_annotation(
-                        x=j,
-                        y=i,
-                        text=f"{day_num}<br>{count} {status}",
-                        showarrow=False,
-                        font=dict(color="white" if status in [config.STATUS_ABSENT, config.STATUS_PRESENT] else "black")
-                    )
-
-        # Update layout
-        fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            height=400,
-            xaxis=dict(side="top"),
-            coloraxis_showscale=False
-        )
+        fig, shown_from = charts.calendar_heatmap(days, start_date, end_date)
+        if shown_from > start_date:
+            st.caption(f"Showing the last {config.CHART_CALENDAR_MAX_DAYS} days, from {utils.format_date(shown_from)}.")
 
         # Add a legend/color guide
         st.markdown("<div style='display: flex; justify-content: center; margin-top: 10px;'>", unsafe_allow_html=True)
-        for status, color in color_map.items():
+        for status, color in charts.STATUS_COLORS.items():
             st.markdown(
                 f"<div style='margin: 0 10px;'><span style='display: inline-block; width: 15px; height: 15px; background-color: {color}; margin-right: 5px;'></span>{status}</div>",
                 unsafe_allow_html=True
@@ -244,16 +159,19 @@ def show():
 
         # Recent activity
         st.markdown("<h2 class='sub-header'>Recent Activity</h2>", unsafe_allow_html=True)
-        recent_df = df.sort_values('date', ascending=False).head(10)
-
-        # Format the DataFrame for display
-        display_df = recent_df[['name', 'date', 'check_in_time', 'check_out_time', 'status']].copy()
-        display_df['date'] = display_df['date'].apply(utils.format_date)
-        display_df['check_in_time'] = display_df['check_in_time'].apply(utils.format_time)
-        display_df['check_out_time'] = display_df['check_out_time'].apply(utils.format_time)
-        display_df.columns = ['Name', 'Date', 'Check-in', 'Check-out', 'Status']
-
-        st.dataframe(display_df, use_container_width=True)
+        # Rows come newest first
+        recent = attendance_table.slice(0, 10)
+
+        # Format the table for display
+        display_table = pa.table({
+            'Name': recent['name'],
+            'Date': utils.format_date_column(recent['date']),
+            'Check-in': utils.format_time_column(recent['check_in_time']),
+            'Check-out': utils.format_time_column(recent['check_out_time']),
+            'Status': recent['status'],
+        })
+
+        st.dataframe(display_table, use_container_width=True)
     else:
         st.info("No attendance data available for the selected date range.")
 
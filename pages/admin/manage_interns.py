@@ -3,12 +3,15 @@ Intern management page for the attendance tracking system.
 """
 import streamlit as st
 import pandas as pd
+from datetime import datetime
 import database as db
 import auth
 import utils
+import metrics
 import config
 
 @auth.require_admin
+@metrics.timed()
 def show():
     """Display the intern management page."""
     utils.apply_custom_css()
@@ -16,44 +19,47 @@ def show():
     utils.display_header("Manage Interns")
 
     # Tabs for different management functions
-    tab1, tab2, tab3 = st.tabs(["Intern List", "Add Intern", "Departments"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Intern List", "Add Intern", "Departments", "Attendance Policies"])
 
     # Tab 1: Intern List
     with tab1:
         st.markdown("<h2 class='sub-header'>Intern List</h2>", unsafe_allow_html=True)
 
-        # Get all interns
-        interns = db.get_all_users(role=config.ROLE_INTERN)
+        # Only one page of interns is read and sent to the browser
+        intern_count = db.count_users(role=config.ROLE_INTERN)
 
-        if interns:
-            # Convert to DataFrame for display
-            df = pd.DataFrame(interns)
+        if intern_count:
+            pages = (intern_count - 1) // config.INTERN_PAGE_SIZE + 1
+            page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="intern_list_page") if pages > 1 else 1
+            interns = db.get_users_table(role=config.ROLE_INTERN, limit=config.INTERN_PAGE_SIZE,
+                                         offset=(page - 1) * config.INTERN_PAGE_SIZE)
 
-            # Format the DataFrame
-            display_df = df[['id', 'name', 'username', 'email', 'department', 'created_at']].copy()
-            display_df.columns = ['ID', 'Name', 'Username', 'Email', 'Department', 'Joined Date']
+            # Format the table
+            columns = ['id', 'name', 'username', 'email', 'department', 'created_at']
+            labels = ['ID', 'Name', 'Username', 'Email', 'Department', 'Joined Date']
+            display_table = interns.select(columns).rename_columns(labels)
 
-            # Display the DataFrame
-            st.dataframe(display_df, use_container_width=True)
+            # Display the table
+            st.dataframe(display_table, use_container_width=True)
+            first = (page - 1) * config.INTERN_PAGE_SIZE + 1
+            st.caption(f"Showing interns {first} to {first + interns.num_rows - 1} of {intern_count}.")
 
-            # Export options
+            # Export options; exports include every intern, read only when requested
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Export to Excel"):
-                    st.markdown(utils.export_to_excel(display_df, "interns.xlsx"), unsafe_allow_html=True)
+                    all_interns = db.get_users_table(role=config.ROLE_INTERN).select(columns).rename_columns(labels)
+                    st.markdown(utils.export_to_excel(all_interns.to_pandas(), "interns.xlsx"), unsafe_allow_html=True)
             with col2:
                 if st.button("Export to CSV"):
-                    st.markdown(utils.export_to_csv(display_df, "interns.csv"), unsafe_allow_html=True)
+                    all_interns = db.get_users_table(role=config.ROLE_INTERN).select(columns).rename_columns(labels)
+                    st.markdown(utils.export_to_csv(all_interns.to_pandas(), "interns.csv"), unsafe_allow_html=True)
 
             # Intern details and actions
             st.markdown("<h3>Intern Details</h3>", unsafe_allow_html=True)
 
             # Select intern
-            selected_id = st.selectbox("Select Intern", [f"{intern['id']} - {intern['name']}" for intern in interns])
-            selected_id = int(selected_id.split(" - ")[0])
-
-            # Get selected intern
-            selected_intern = next((intern for intern in interns if intern['id'] == selected_id), None)
+            selected_intern = utils.select_intern(db.search_interns, key="manage_intern")
 
             if selected_intern:
                 col1, col2 = st.columns(2)
@@ -185,4 +191,110 @@ def show():
                     else:
                         st.error("Failed to add department. It may already exist.")
 
+    # Tab 4: Attendance Policies
+    with tab4:
+        st.markdown("<h2 class='sub-header'>Attendance Policies</h2>", unsafe_allow_html=True)
+        st.markdown("Each policy applies from its effective date until a newer one; "
+                    "department policies override the default policy.")
+
+        policies_df = pd.DataFrame(db.get_policies())
+        display_df = policies_df[['department', 'work_start', 'late_threshold', 'effective_from']].copy()
+        display_df['department'] = display_df['department'].fillna("All (default)")
+        display_df.columns = ['Department', 'Work Start', 'Late After (min)', 'Effective From']
+        st.dataframe(display_df, use_container_width=True, hide_index=True)
+
+        # Add new policy
+        st.markdown("<h3>Add Policy</h3>", unsafe_allow_html=True)
+
+        with st.form("add_policy_form"):
+            policy_department = st.selectbox("Department", ["All (default)"] + [dept["name"] for dept in db.get_departments()])
+            work_start = st.time_input("Work Start", value=datetime.strptime(config.WORK_START_TIME, "%H:%M").time())
+            late_threshold = st.number_input("Late After (minutes)", min_value=0, max_value=240, value=config.LATE_THRESHOLD)
+            effective_from = st.date_input("Effective From", value=utils.get_indian_time().date())
+            recompute = st.checkbox("Recompute statuses from the effective date", value=True)
+
+            submit = st.form_submit_button("Add Policy")
+
+            if submit:
+                db.add_policy(
+                    work_start.strftime("%H:%M"),
+                    late_threshold,
+                    effective_from.strftime("%Y-%m-%d"),
+                    None if policy_department == "All (default)" else policy_department
+                )
+                if recompute:
+                    result = db.recompute_statuses(start_date=effective_from.strftime("%Y-%m-%d"))
+                    st.success(f"Policy added. {result['changed']} of {result['rows']} statuses changed.")
+                else:
+                    st.success("Policy added. It applies to new check-ins.")
+
+        # Shift schedules
+        st.markdown("<h2 class='sub-header'>Shift Schedules</h2>", unsafe_allow_html=True)
+        st.markdown("A schedule replaces the policy's work start for a department or one intern. "
+                    "Intern schedules override department schedules, and weekday schedules override "
+                    "every-day ones; among overlapping schedules the latest effective date wins.")
+
+        weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        schedules = db.get_schedules()
+        if schedules:
+            intern_names = db.get_user_names(tuple(sorted({s.user_id for s in schedules if s.user_id is not None})))
+            schedules_df = pd.DataFrame([{
+                'Applies To': intern_names.get(schedule.user_id, f"Intern {schedule.user_id}")
+                              if schedule.user_id is not None else schedule.department,
+                'Days': weekdays[schedule.weekday] if schedule.weekday is not None else "Every day",
+                'Start': schedule.start_time,
+                'End': schedule.end_time,
+                'Effective From': schedule.effective_from,
+                'Effective To': schedule.effective_to or "-",
+            } for schedule in schedules])
+            st.dataframe(schedules_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No schedules yet; every intern follows their policy's work start.")
+
+        # Add new schedule
+        st.markdown("<h3>Add Schedule</h3>", unsafe_allow_html=True)
+
+        # Chosen outside the form so the intern search runs without submitting it
+        applies_to = st.radio("Applies To", ["Department", "Intern"], horizontal=True, key="schedule_applies_to")
+        schedule_intern = utils.select_intern(db.search_interns, key="schedule_intern") if applies_to == "Intern" else None
+
+        with st.form("add_schedule_form"):
+            if applies_to == "Department":
+                schedule_department = st.selectbox("Department", [dept["name"] for dept in db.get_departments()])
+            schedule_days = st.selectbox("Days", ["Every day"] + weekdays)
+            start_time = st.time_input("Start", value=datetime.strptime(config.WORK_START_TIME, "%H:%M").time())
+            end_time = st.time_input("End", value=datetime.strptime(config.WORK_END_TIME, "%H:%M").time())
+            schedule_from = st.date_input("Effective From", value=utils.get_indian_time().date(), key="schedule_from")
+            schedule_to = st.date_input("Effective To (optional)", value=None, key="schedule_to")
+            schedule_recompute = st.checkbox("Recompute statuses from the effective date", value=True,
+                                             key="schedule_recompute")
+
+            submit = st.form_submit_button("Add Schedule")
+
+            if submit:
+                if applies_to == "Intern" and not schedule_intern:
+                    st.error("Please select an intern.")
+                else:
+                    try:
+                        db.add_schedule(
+                            start_time.strftime("%H:%M"),
+                            end_time.strftime("%H:%M"),
+                            schedule_from.strftime("%Y-%m-%d"),
+                            schedule_to.strftime("%Y-%m-%d") if schedule_to else None,
+                            department=schedule_department if applies_to == "Department" else None,
+                            user_id=schedule_intern['id'] if applies_to == "Intern" else None,
+                            weekday=None if schedule_days == "Every day" else weekdays.index(schedule_days)
+                        )
+                    except ValueError as e:
+                        st.error(f"Failed to add schedule: {e}")
+                    else:
+                        if schedule_recompute:
+                            result = db.recompute_statuses(
+                                start_date=schedule_from.strftime("%Y-%m-%d"),
+                                end_date=schedule_to.strftime("%Y-%m-%d") if schedule_to else None
+                            )
+                            st.success(f"Schedule added. {result['changed']} of {result['rows']} statuses changed.")
+                        else:
+                            st.success("Schedule added. It applies to new check-ins.")
+
     utils.display_footer()
@@ -0,0 +1,229 @@
+"""
+Performance page for the attendance tracking system.
+"""
+import os
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import database as db
+import auth
+import utils
+import metrics
+import slow_queries
+import profiling
+import charts
+import cache
+import config
+
+@auth.require_admin
+@metrics.timed()
+def show():
+    """Display the performance page."""
+    utils.apply_custom_css()
+    utils.display_logo()
+    utils.display_header("Performance")
+
+    st.markdown(
+        "Timings of every database call and page render in this server process, "
+        "over the most recent samples of each."
+    )
+
+    snapshot = metrics.snapshot()
+
+    if snapshot:
+        df = pd.DataFrame(snapshot)
+
+        # Filter by kind of call
+        kind = st.radio("Show", ["All", "Database", "Pages"], horizontal=True)
+        if kind == "Database":
+            df = df[df['name'].str.startswith("database.")]
+        elif kind == "Pages":
+            df = df[df['name'].str.startswith("pages.")]
+
+        # Summary cards
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            utils.display_stat_card(int(df['count'].sum()), "Calls")
+        with col2:
+            utils.display_stat_card(f"{df['total_ms'].sum() / 1000:.1f}s", "Total Time")
+        with col3:
+            slowest = df.sort_values('p95_ms', ascending=False).iloc[0]['name'] if not df.empty else "-"
+            utils.display_stat_card(slowest.split(".")[-1], "Slowest (p95)")
+
+        # Timings table
+        st.markdown("<h2 class='sub-header'>Timings</h2>", unsafe_allow_html=True)
+        display_df = df[['name', 'count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'total_ms', 'mean_rows']].copy()
+        display_df.columns = ['Name', 'Calls', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Max (ms)', 'Total (ms)', 'Avg. Rows']
+        st.dataframe(display_df, use_container_width=True, hide_index=True)
+
+        # Latency chart
+        if not df.empty:
+            chart_df = df.head(15).melt(
+                id_vars='name',
+                value_vars=['p50_ms', 'p95_ms', 'p99_ms'],
+                var_name='Percentile',
+                value_name='Milliseconds'
+            )
+            fig = px.bar(
+                chart_df,
+                x='Milliseconds',
+                y='name',
+                color='Percentile',
+                orientation='h',
+                barmode='group',
+                title='Latency Percentiles (top 15 by total time)'
+            )
+            fig.update_layout(
+                yaxis_title="",
+                plot_bgcolor='rgba(0,0,0,0)',
+                height=max(400, 30 * len(chart_df) // 3 + 150)
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        # Argument shapes
+        with st.expander("Argument Shapes"):
+            shapes_df = df[['name', 'top_arg_shapes']].copy()
+            shapes_df['top_arg_shapes'] = shapes_df['top_arg_shapes'].apply(" | ".join)
+            shapes_df.columns = ['Name', 'Most Common Argument Shapes']
+            st.dataframe(shapes_df, use_container_width=True, hide_index=True)
+    else:
+        st.info("No timings recorded yet.")
+
+    # Check-in/out write path
+    st.markdown("<h2 class='sub-header'>Check-in/out Writes</h2>", unsafe_allow_html=True)
+    counters = db.get_action_counters()
+    write_stats = db.get_write_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        utils.display_stat_card(sum(c['recorded'] for c in counters.values()), "Recorded")
+    with col2:
+        utils.display_stat_card(sum(c['deduplicated'] for c in counters.values()), "Deduplicated")
+    with col3:
+        utils.display_stat_card(write_stats['transactions'], "Transactions")
+    with col4:
+        events_per_transaction = write_stats['events'] / write_stats['transactions'] if write_stats['transactions'] else 0
+        utils.display_stat_card(f"{events_per_transaction:.1f}", "Events / Transaction")
+
+    # Query cache
+    st.markdown("<h2 class='sub-header'>Query Cache</h2>", unsafe_allow_html=True)
+    if config.CACHE_ENABLED:
+        st.markdown(f"Shared tier: **{config.CACHE_SHARED}**, data version {db.get_data_version()}.")
+        tier_df = pd.DataFrame(cache.get_cache_stats())
+        tier_df['hit_rate'] = (tier_df['hit_rate'] * 100).round(1)
+        tier_df.columns = ['Tier', 'Entries', 'Hits', 'Misses', 'Hit Rate (%)']
+        st.dataframe(tier_df, use_container_width=True, hide_index=True)
+        if st.button("Clear Query Cache"):
+            cache.clear()
+            st.rerun()
+    else:
+        st.info("The query cache is disabled. Set CACHE_ENABLED=true to enable it.")
+
+    # Figure cache
+    st.markdown("<h2 class='sub-header'>Figure Cache</h2>", unsafe_allow_html=True)
+    cache_stats = charts.get_cache_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        utils.display_stat_card(cache_stats['size'], "Cached Figures")
+    with col2:
+        utils.display_stat_card(cache_stats['hits'], "Hits")
+    with col3:
+        utils.display_stat_card(cache_stats['misses'], "Misses")
+    with col4:
+        lookups = cache_stats['hits'] + cache_stats['misses']
+        utils.display_stat_card(f"{cache_stats['hits'] / lookups * 100 if lookups else 0:.1f}%", "Hit Rate")
+
+    payloads = charts.get_payload_stats()
+    if payloads:
+        st.markdown("Size of the last figure built for each chart while profiling, as sent to the browser.")
+        payload_df = pd.DataFrame(payloads)
+        payload_df['bytes'] = (payload_df['bytes'] / 1024).round(1)
+        payload_df.columns = ['Chart', 'Kind', 'Points', 'WebGL', 'Payload (KiB)']
+        st.dataframe(payload_df, use_container_width=True, hide_index=True)
+    else:
+        st.caption("Chart payload sizes are recorded while profiling is on.")
+
+    # Slow queries
+    st.markdown("<h2 class='sub-header'>Slow Queries</h2>", unsafe_allow_html=True)
+    st.markdown(f"Statements slower than {config.SLOW_QUERY_THRESHOLD_MS} ms, grouped by statement.")
+    offenders = slow_queries.summarize()
+
+    if offenders:
+        slow_df = pd.DataFrame(offenders)
+        display_df = slow_df[['sql', 'count', 'total_ms', 'mean_ms', 'max_ms', 'last_seen']].copy()
+        display_df.columns = ['Statement', 'Count', 'Total (ms)', 'Mean (ms)', 'Max (ms)', 'Last Seen']
+        st.dataframe(display_df, use_container_width=True, hide_index=True)
+
+        # Query plan of a selected offender
+        selected = st.selectbox(
+            "Query Plan",
+            range(len(offenders)),
+            format_func=lambda i: f"#{i + 1} ({offenders[i]['total_ms']:.0f} ms total) {offenders[i]['sql'][:80]}"
+        )
+        offender = offenders[selected]
+        st.code(offender['sql'], language="sql")
+        st.markdown(f"**Last parameters:** {', '.join(offender['last_parameters']) or '-'}")
+        st.code("\n".join(offender['plan']), language="text")
+    elif config.SLOW_QUERY_LOG_ENABLED:
+        st.info("No slow queries logged.")
+    else:
+        st.info("The slow query log is off; set SLOW_QUERY_LOG_ENABLED=true to record slow queries.")
+
+    # Per-rerun profiles
+    st.markdown("<h2 class='sub-header'>Profiles</h2>", unsafe_allow_html=True)
+    if config.PROFILING_ENABLED:
+        st.info("Profiling is enabled for every session (PROFILE_PAGES).")
+    else:
+        enabled = st.toggle(
+            "Profile my page reruns",
+            value=st.session_state.get(profiling.SESSION_KEY, False),
+            help=f"Saves a {config.PROFILER} profile of each page you open to {config.PROFILE_DIR}."
+        )
+        if enabled != st.session_state.get(profiling.SESSION_KEY, False):
+            st.session_state[profiling.SESSION_KEY] = enabled
+            st.rerun()
+
+    runs = profiling.list_profiles()
+
+    if runs:
+        runs_df = pd.DataFrame(runs)
+        display_df = runs_df[['started_at', 'page', 'role', 'duration_ms', 'profiler']].copy()
+        display_df.columns = ['Started', 'Page', 'Role', 'Duration (ms)', 'Profiler']
+        st.dataframe(display_df, use_container_width=True, hide_index=True)
+
+        selected = st.selectbox(
+            "Profile",
+            range(len(runs)),
+            format_func=lambda i: f"{runs[i]['started_at']} {runs[i]['page']} ({runs[i]['duration_ms']:.0f} ms)"
+        )
+        run = runs[selected]
+        if run['parameters']:
+            st.json(run['parameters'], expanded=False)
+
+        summary = profiling.summarize(run)
+        if summary:
+            st.code(summary, language="text")
+
+        # Downloads of the profiler output
+        mime_types = {"pstats": "application/octet-stream", "html": "text/html",
+                      "pyisession": "application/json", "json": "application/json"}
+        columns = st.columns(len(run['files']))
+        for column, (kind, path) in zip(columns, run['files'].items()):
+            with column:
+                with open(path, "rb") as f:
+                    st.download_button(f"Download .{kind}", f.read(), os.path.basename(path), mime_types[kind])
+    else:
+        st.info("No profiles saved.")
+
+    # Export options
+    st.markdown("<h2 class='sub-header'>Export</h2>", unsafe_allow_html=True)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("Download JSON", metrics.to_json(), "metrics.json", "application/json")
+    with col2:
+        st.download_button("Download Prometheus", metrics.to_prometheus(), "metrics.prom", "text/plain")
+    with col3:
+        if st.button("Reset Timings"):
+            metrics.reset()
+            st.rerun()
+
+    utils.display_footer()
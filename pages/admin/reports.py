@@ -2,15 +2,138 @@
 Reports page for the attendance tracking system.
 """
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime, timedelta
+from io import BytesIO
 import database as db
 import auth
 import utils
+import charts
+import analytics
+import metrics
 import config
+import report
+
+@st.fragment
+def show_table(display_table):
+    """
+    Display the attendance table with its export buttons.
+
+    Runs as a fragment, so the export buttons rerun only this section.
+
+    Args:
+        display_table: Formatted attendance table (pyarrow.Table)
+    """
+    st.dataframe(display_table, use_container_width=True)
+
+    # Export options
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Export to Excel"):
+            st.markdown(utils.export_to_excel(display_table.to_pandas(), "attendance_report.xlsx"), unsafe_allow_html=True)
+    with col2:
+        if st.button("Export to CSV"):
+            st.markdown(utils.export_to_csv(display_table.to_pandas(), "attendance_report.csv"), unsafe_allow_html=True)
+
+@st.fragment
+def show_intern_report(start_date, end_date):
+    """
+    Display the attendance report of a selected intern.
+
+    Runs as a fragment: searching for and switching interns reruns only
+    this section, which fetches only the top search matches and the
+    selected intern's records for the date range.
+
+    Args:
+        start_date: First date of the report
+        end_date: Last date of the report
+    """
+    st.markdown("<h2 class='sub-header'>Individual Attendance Report</h2>", unsafe_allow_html=True)
+
+    # Select intern
+    selected_intern = utils.select_intern(db.search_interns, key="report_intern")
+    if selected_intern is None:
+        return
+    selected_id = selected_intern['id']
+
+    # Get the intern's attendance for the date range
+    intern_table = db.get_attendance_table(
+        start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), user_id=selected_id,
+        columns=['date', 'check_in_time', 'check_out_time', 'status']
+    )
+
+    if intern_table.num_rows:
+        # Format for display
+        display_intern_table = pa.table({
+            'Date': intern_table['date'],
+            'Check-in': utils.format_time_column(intern_table['check_in_time']),
+            'Check-out': utils.format_time_column(intern_table['check_out_time']),
+            'Status': intern_table['status'],
+        })
+
+        st.dataframe(display_intern_table, use_container_width=True)
+
+        # Calculate statistics
+        total_days = (end_date - start_date).days + 1
+        present_days = pc.sum(pc.equal(intern_table['status'], config.STATUS_PRESENT)).as_py() or 0
+        late_days = pc.sum(pc.equal(intern_table['status'], config.STATUS_LATE)).as_py() or 0
+        absent_days = total_days - intern_table.num_rows
+
+        # Display statistics
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            utils.display_stat_card(total_days, "Total Days")
+        with col2:
+            utils.display_stat_card(present_days, "Present")
+        with col3:
+            utils.display_stat_card(late_days, "Late")
+        with col4:
+            utils.display_stat_card(absent_days, "Absent")
+
+        # Export individual report
+        if st.button("Export Individual Report"):
+            st.markdown(utils.export_to_excel(display_intern_table.to_pandas(), f"attendance_report_{selected_id}.xlsx"), unsafe_allow_html=True)
+    else:
+        st.info("No attendance records found for the selected intern in this date range.")
+
+@st.fragment
+def show_report_pack(start_str, end_str, department):
+    """
+    Offer every intern's individual report for the date range as one zip archive.
+
+    Runs as a fragment, so building the archive reruns only this section.
+    The workbooks are built in a process pool from one range scan (see
+    report.build_report_pack()).
+
+    Args:
+        start_str: First date of the report (YYYY-MM-DD)
+        end_str: Last date of the report (YYYY-MM-DD)
+        department: Optional department name filter
+    """
+    if not st.button("Export All Individual Reports"):
+        return
+
+    progress_bar = st.progress(0.0, text="Building reports...")
+
+    def progress(done, total):
+        progress_bar.progress(done / total, text=f"Building reports... {done}/{total} interns")
+
+    output = BytesIO()
+    result = report.build_report_pack(output, start_str, end_str, department, progress=progress)
+    progress_bar.empty()
+
+    st.download_button(
+        "Download Reports (ZIP)",
+        output.getvalue(),
+        file_name=f"attendance_reports_{report.slug(department or 'all')}_{start_str}_{end_str}.zip",
+        mime="application/zip",
+        on_click="ignore",
+    )
+    st.caption(f"{result['interns']} interns, {result['rows']} attendance rows, built in {result['seconds']:.1f} s")
 
 @auth.require_admin
+@metrics.timed()
 def show():
     """Display the reports page."""
     utils.apply_custom_css()
@@ -38,145 +161,98 @@ def show():
     start_str = start_date.strftime("%Y-%m-%d")
     end_str = end_date.strftime("%Y-%m-%d")
 
-    # Get attendance data
-    if selected_dept == "All":
-        attendance_data = db.get_all_attendance(start_str, end_str)
-    else:
-        attendance_data = db.get_all_attendance(start_str, end_str, selected_dept)
-
-    if attendance_data:
-        # Convert to DataFrame for analysis
-        df = pd.DataFrame(attendance_data)
-
-        # Format the DataFrame for display
-        display_df = df[['name', 'date', 'check_in_time', 'check_out_time', 'status', 'department']].copy()
-        display_df['date'] = pd.to_datetime(display_df['date']).dt.strftime('%Y-%m-%d')
-        display_df['check_in_time'] = display_df['check_in_time'].apply(utils.format_time)
-        display_df['check_out_time'] = display_df['check_out_time'].apply(utils.format_time)
-        display_df.columns = ['Name', 'Date', 'Check-in', 'Check-out', 'Status', 'Department']
+    # Get attendance data as Arrow, formatted in Arrow compute
+    department = None if selected_dept == "All" else selected_dept
+    attendance_table = db.get_attendance_table(
+        start_str, end_str, department,
+        columns=['name', 'date', 'check_in_time', 'check_out_time', 'status', 'department']
+    )
 
-        # Display the DataFrame
-        st.dataframe(display_df, use_container_width=True)
+    if attendance_table.num_rows:
+        # Format the table for display
+        display_table = pa.table({
+            'Name': attendance_table['name'],
+            'Date': attendance_table['date'],
+            'Check-in': utils.format_time_column(attendance_table['check_in_time']),
+            'Check-out': utils.format_time_column(attendance_table['check_out_time']),
+            'Status': attendance_table['status'],
+            'Department': attendance_table['department'],
+        })
 
-        # Export options
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("Export to Excel"):
-                st.markdown(utils.export_to_excel(display_df, "attendance_report.xlsx"), unsafe_allow_html=True)
-        with col2:
-            if st.button("Export to CSV"):
-                st.markdown(utils.export_to_csv(display_df, "attendance_report.csv"), unsafe_allow_html=True)
+        # Display the table
+        show_table(display_table)
 
         # Visualizations
         st.markdown("<h2 class='sub-header'>Attendance Analysis</h2>", unsafe_allow_html=True)
 
+        # Aggregations run in the analytics engine (config.ANALYTICS_ENGINE)
+
         # Status distribution
-        status_counts = df.groupby('status').size().reset_index(name='count')
-        status_counts.columns = ['Status', 'Count']
+        status_counts = analytics.status_distribution(start_str, end_str, department)
 
-        fig = px.pie(
+        fig = charts.plot(
+            "pie",
             status_counts,
             values='Count',
             names='Status',
             title='Attendance Status Distribution',
-            hole=0.4
+            hole=0.4,
+            layout=dict(plot_bgcolor='rgba(0,0,0,0)')
         )
-        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)')
         st.plotly_chart(fig, use_container_width=True)
 
-        # Daily attendance trend
-        df['date'] = pd.to_datetime(df['date'])
-        daily_counts = df.groupby([df['date'].dt.date, 'status']).size().reset_index(name='count')
-        daily_counts.columns = ['Date', 'Status', 'Count']
+        # Attendance trend, by day, week or month depending on the range
+        bucket, bucket_label = charts.time_bucket(start_date, end_date)
+        trend_counts = analytics.daily_by_status(start_str, end_str, department, bucket=bucket)
 
-        fig = px.line(
-            daily_counts,
+        fig = charts.plot(
+            "line",
+            trend_counts,
             x='Date',
             y='Count',
             color='Status',
-            title='Daily Attendance by Status',
-            markers=True
-        )
-        fig.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Count",
-            plot_bgcolor='rgba(0,0,0,0)',
-            xaxis=dict(showgrid=False),
-            yaxis=dict(showgrid=True, gridcolor='rgba(200,200,200,0.2)')
+            title=f'{bucket_label} Attendance by Status',
+            markers=True,
+            layout=dict(
+                xaxis_title="Date",
+                yaxis_title="Count",
+                plot_bgcolor='rgba(0,0,0,0)',
+                xaxis=dict(showgrid=False),
+                yaxis=dict(showgrid=True, gridcolor='rgba(200,200,200,0.2)')
+            )
         )
         st.plotly_chart(fig, use_container_width=True)
 
         # Department-wise attendance
-        if 'department' in df.columns:
-            dept_status = df.groupby(['department', 'status']).size().reset_index(name='count')
-            dept_status.columns = ['Department', 'Status', 'Count']
+        if 'department' in attendance_table.column_names:
+            dept_status = analytics.department_by_status(start_str, end_str, department)
 
-            fig = px.bar(
+            fig = charts.plot(
+                "bar",
                 dept_status,
                 x='Department',
                 y='Count',
                 color='Status',
                 title='Department-wise Attendance Status',
-                barmode='group'
-            )
-            fig.update_layout(
-                xaxis_title="Department",
-                yaxis_title="Count",
-                plot_bgcolor='rgba(0,0,0,0)',
-                xaxis=dict(showgrid=False),
-                yaxis=dict(showgrid=True, gridcolor='rgba(200,200,200,0.2)')
+                barmode='group',
+                layout=dict(
+                    xaxis_title="Department",
+                    yaxis_title="Count",
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    xaxis=dict(showgrid=False),
+                    yaxis=dict(showgrid=True, gridcolor='rgba(200,200,200,0.2)')
+                )
             )
             st.plotly_chart(fig, use_container_width=True)
 
-        # Individual attendance report
-        st.markdown("<h2 class='sub-header'>Individual Attendance Report</h2>", unsafe_allow_html=True)
-
-        # Get all interns
-        interns = db.get_all_users(role=config.ROLE_INTERN)
+        # Per-intern summary
+        st.markdown("<h2 class='sub-header'>Intern Summary</h2>", unsafe_allow_html=True)
+        summaries = analytics.intern_summaries(start_str, end_str, department)
+        st.dataframe(summaries.drop(columns=['User ID']), use_container_width=True, hide_index=True)
 
-        if interns:
-            # Select intern
-            selected_intern = st.selectbox(
-                "Select Intern",
-                [f"{intern['id']} - {intern['name']}" for intern in interns]
-            )
-            selected_id = int(selected_intern.split(" - ")[0])
-
-            # Filter data for selected intern
-            intern_df = df[df['user_id'] == selected_id]
-
-            if not intern_df.empty:
-                # Format for display
-                display_intern_df = intern_df[['date', 'check_in_time', 'check_out_time', 'status']].copy()
-                display_intern_df['date'] = display_intern_df['date'].dt.strftime('%Y-%m-%d')
-                display_intern_df['check_in_time'] = display_intern_df['check_in_time'].apply(utils.format_time)
-                display_intern_df['check_out_time'] = display_intern_df['check_out_time'].apply(utils.format_time)
-                display_intern_df.columns = ['Date', 'Check-in', 'Check-out', 'Status']
-
-                st.dataframe(display_intern_df, use_container_width=True)
-
-                # Calculate statistics
-                total_days = (end_date - start_date).days + 1
-                present_days = len(intern_df[intern_df['status'] == config.STATUS_PRESENT])
-                late_days = len(intern_df[intern_df['status'] == config.STATUS_LATE])
-                absent_days = total_days - len(intern_df)
-
-                # Display statistics
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    utils.display_stat_card(total_days, "Total Days")
-                with col2:
-                    utils.display_stat_card(present_days, "Present")
-                with col3:
-                    utils.display_stat_card(late_days, "Late")
-                with col4:
-                    utils.display_stat_card(absent_days, "Absent")
-
-                # Export individual report
-                if st.button("Export Individual Report"):
-                    st.markdown(utils.export_to_excel(display_intern_df, f"attendance_report_{selected_id}.xlsx"), unsafe_allow_html=True)
-            else:
-                st.info("No attendance records found for the selected intern in this date range.")
+        # Individual attendance report
+        show_intern_report(start_date, end_date)
+        show_report_pack(start_str, end_str, department)
     else:
         st.info("No attendance data available for the selected date range.")
 
@@ -6,9 +6,12 @@ from datetime import datetime
 import database as db
 import auth
 import utils
-# config not used directly in this file
+import metrics
+import config
+import punches
 
 @auth.require_intern
+@metrics.timed()
 def show():
     """Display the attendance page for interns."""
     utils.apply_custom_css()
@@ -34,23 +37,40 @@ def show():
     # Check today's attendance status
     today_date = now.strftime("%Y-%m-%d")
     attendance = db.get_attendance(user['id'], today_date, today_date)
+    check_in, check_out, status = (attendance[0]['check_in_time'], attendance[0]['check_out_time'],
+                                   attendance[0]['status']) if attendance else (None, None, None)
+
+    # With the punch log, a day can have several sessions. The log itself is
+    # read here, since attendance is derived from it in the background
+    day_punches = db.get_punches(user['id'], today_date) if config.PUNCH_LOG_ENABLED else []
+    state = punches.fold(None, [(punch['kind'], punch['time']) for punch in day_punches])
+    if state:
+        check_in, check_out = state.check_in_time, state.check_out_time
+        status = status or "Processing"
 
     # Display attendance status
     st.markdown("<h2 class='sub-header'>Today's Attendance Status</h2>", unsafe_allow_html=True)
 
-    if attendance:
-        attendance_record = attendance[0]
-        check_in_time = utils.format_time(attendance_record['check_in_time']) if attendance_record['check_in_time'] else "Not checked in"
-        check_out_time = utils.format_time(attendance_record['check_out_time']) if attendance_record['check_out_time'] else "Not checked out"
-        status = attendance_record['status']
-
+    if check_in:
         st.markdown(f"""
         <div class="card">
             <p><strong>Status:</strong> {status}</p>
-            <p><strong>Check-in Time:</strong> {check_in_time}</p>
-            <p><strong>Check-out Time:</strong> {check_out_time}</p>
+            <p><strong>Check-in Time:</strong> {utils.format_time(check_in)}</p>
+            <p><strong>Check-out Time:</strong> {utils.format_time(check_out) if check_out else "Not checked out"}</p>
         </div>
         """, unsafe_allow_html=True)
+
+        if state:
+            sessions = sum(punch['kind'] == punches.PUNCH_IN for punch in day_punches)
+            worked, breaks = state.worked_seconds, state.break_seconds
+            st.markdown(f"""
+            <div class="card">
+                <p><strong>Punches:</strong> {sessions} in, {len(day_punches) - sessions} out</p>
+                <p><strong>Worked:</strong> {worked // 3600}h {worked % 3600 // 60:02d}m
+                   (completed sessions)</p>
+                <p><strong>Breaks:</strong> {breaks // 3600}h {breaks % 3600 // 60:02d}m</p>
+            </div>
+            """, unsafe_allow_html=True)
     else:
         st.markdown("""
         <div class="card">
@@ -60,18 +80,31 @@ def show():
         </div>
         """, unsafe_allow_html=True)
 
+    # Today's shift, if a schedule applies
+    schedule = db.get_schedule(user['id'], today_date)
+    if schedule:
+        st.markdown(f"""
+        <div class="card">
+            <p><strong>Today's Shift:</strong> {schedule['start_time']} - {schedule['end_time']}</p>
+        </div>
+        """, unsafe_allow_html=True)
+
     # Check-in/out actions
     st.markdown("<h2 class='sub-header'>Actions</h2>", unsafe_allow_html=True)
 
+    # Each punch gets its own request key, so later sessions are not deduplicated
+    request_date = f"{today_date}#{len(day_punches)}" if config.PUNCH_LOG_ENABLED else today_date
+
     col1, col2 = st.columns(2)
 
     with col1:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("<h3>Check In</h3>", unsafe_allow_html=True)
 
-        if not attendance or not attendance[0]['check_in_time']:
-            if st.button("Check In Now", key="check_in_now"):
-                if db.record_check_in(user['id']):
+        if not check_in or (config.PUNCH_LOG_ENABLED and check_out):
+            label = "Check In Again" if check_out else "Check In Now"
+            if st.button(label, key="check_in_now"):
+                if db.record_check_in(user['id'], request_key=utils.get_request_key("check_in", request_date)):
                     utils.success_message("Check-in recorded successfully!")
                     st.rerun()
                 else:
@@ -85,14 +118,14 @@ def show():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("<h3>Check Out</h3>", unsafe_allow_html=True)
 
-        if attendance and attendance[0]['check_in_time'] and not attendance[0]['check_out_time']:
+        if check_in and not check_out:
             if st.button("Check Out Now", key="check_out_now"):
-                if db.record_check_out(user['id']):
+                if db.record_check_out(user['id'], request_key=utils.get_request_key("check_out", request_date)):
                     utils.success_message("Check-out recorded successfully!")
                     st.rerun()
                 else:
                     utils.error_message("Failed to record check-out.")
-        elif not attendance or not attendance[0]['check_in_time']:
+        elif not check_in:
             utils.warning_message("You need to check in first.")
         else:
             utils.warning_message("You have already checked out today.")
@@ -3,14 +3,16 @@ Intern dashboard page for the attendance tracking system.
 """
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta
 import database as db
 import auth
 import utils
+import charts
+import metrics
 import config
 
 @auth.require_intern
+@metrics.timed()
 def show():
     """Display the intern dashboard."""
     utils.apply_custom_css()
@@ -74,7 +76,7 @@ def show():
         # Check-in button
         if not attendance or not attendance[0]['check_in_time']:
             if st.button("Check In", key="check_in"):
-                if db.record_check_in(user['id']):
+                if db.record_check_in(user['id'], request_key=utils.get_request_key("check_in", today_date)):
                     st.success("Check-in recorded successfully!")
                     st.rerun()
                 else:
@@ -83,7 +85,7 @@ def show():
         # Check-out button
         if attendance and attendance[0]['check_in_time'] and not attendance[0]['check_out_time']:
             if st.button("Check Out", key="check_out"):
-                if db.record_check_out(user['id']):
+                if db.record_check_out(user['id'], request_key=utils.get_request_key("check_out", today_date)):
                     st.success("Check-out recorded successfully!")
                     st.rerun()
                 else:
@@ -137,151 +139,74 @@ def show():
             if st.button("Export to CSV"):
                 st.markdown(utils.export_to_csv(display_df, "my_attendance.csv"), unsafe_allow_html=True)
 
-        # Attendance statistics
-        st.markdown("<h2 class='sub-header'>Attendance Statistics</h2>", unsafe_allow_html=True)
+        # Calendar-like attendance visualization
+        st.markdown("<h3>Attendance Calendar</h3>", unsafe_allow_html=True)
+
+        # Status of each day, for at most config.CHART_CALENDAR_MAX_DAYS days
+        days = pd.DataFrame({
+            'date': pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d'),
+            'status': df['status'],
+        }).drop_duplicates('date').set_index('date')
 
-        # Calculate statistics
-        total_days = (end_date - start_date).days + 1
-        present_days = len(df[df['status'] == config.STATUS_PRESENT])
-        late_days = len(df[df['status'] == config.STATUS_LATE])
-        absent_days = total_days - len(df)
+        fig, shown_from = charts.calendar_heatmap(days, start_date, end_date)
+        if shown_from > start_date:
+            st.caption(f"Showing the last {config.CHART_CALENDAR_MAX_DAYS} days, from {utils.format_date(shown_from)}.")
 
-        # Display statistics
+        # Add a legend/color guide
+        st.markdown("<div style='display: flex; justify-content: center; margin-top: 10px;'>", unsafe_allow_html=True)
+        for status, color in charts.STATUS_COLORS.items():
+            st.markdown(
+                f"<div style='margin: 0 10px;'><span style='display: inline-block; width: 15px; height: 15px; background-color: {color}; margin-right: 5px;'></span>{status}</div>",
+                unsafe_allow_html=True
+            )
+        st.markdown("</div>", unsafe_allow_html=True)
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No attendance data available for the selected date range.")
+
+    # Attendance statistics, precomputed on every check-in/out
+    st.markdown("<h2 class='sub-header'>Attendance Statistics</h2>", unsafe_allow_html=True)
+    stats = db.get_intern_stats(user['id'])
+
+    if stats:
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            utils.display_stat_card(total_days, "Total Days")
+            utils.display_stat_card(stats.days_recorded, "Days Attended")
         with col2:
-            utils.display_stat_card(present_days, "Present")
+            utils.display_stat_card(stats.present_count, "Present")
         with col3:
-            utils.display_stat_card(late_days, "Late")
+            utils.display_stat_card(stats.late_count, "Late")
         with col4:
-            utils.display_stat_card(absent_days, "Absent")
+            utils.display_stat_card(stats.absent_count, "Absent")
 
-        # Attendance trend chart
-        df['date'] = pd.to_datetime(df['date'])
-        df['day'] = df['date'].dt.day_name()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            utils.display_stat_card(stats.current_streak, "Current Streak")
+        with col2:
+            utils.display_stat_card(stats.longest_streak, "Longest Streak")
+        with col3:
+            utils.display_stat_card(utils.format_time(stats.average_check_in), "Avg. Check-in")
+        with col4:
+            utils.display_stat_card(stats.total_hours, "Total Hours")
 
         # Status distribution
-        status_counts = df.groupby('status').size().reset_index(name='count')
-        status_counts.columns = ['Status', 'Count']
-
-        fig = px.pie(
+        status_counts = pd.DataFrame({
+            'Status': [config.STATUS_PRESENT, config.STATUS_LATE, config.STATUS_HALF_DAY, config.STATUS_ABSENT],
+            'Count': [stats.present_count, stats.late_count, stats.half_day_count, stats.absent_count]
+        })
+        status_counts = status_counts[status_counts['Count'] > 0]
+
+        fig = charts.plot(
+            "pie",
             status_counts,
             values='Count',
             names='Status',
             title='Attendance Status Distribution',
-            hole=0.4
+            hole=0.4,
+            layout=dict(plot_bgcolor='rgba(0,0,0,0)')
         )
-        fig.update_layout(plot_bgcolor='rgba(0,0,0,0)')
-        st.plotly_chart(fig, use_container_width=True)
-
-        # Calendar-like attendance visualization
-        st.markdown("<h3>Attendance Calendar</h3>", unsafe_allow_html=True)
-
-        # Create a date range for the selected period
-        date_range = pd.date_range(start=start_date, end=end_date)
-
-        # Create a DataFrame with all dates in the range
-        calendar_df = pd.DataFrame({'date': date_range})
-        calendar_df['day'] = calendar_df['date'].dt.day_name()
-        calendar_df['week'] = calendar_df['date'].dt.isocalendar().week
-        calendar_df['month'] = calendar_df['date'].dt.month_name()
-        calendar_df['day_num'] = calendar_df['date'].dt.day
-
-        # Merge with attendance data
-        calendar_df['date_str'] = calendar_df['date'].dt.strftime('%Y-%m-%d')
-        attendance_df = pd.DataFrame(attendance_data)
-        attendance_df['date_str'] = pd.to_datetime(attendance_df['date']).dt.strftime('%Y-%m-%d')
-
-        # Merge to get status for each day
-        calendar_df = calendar_df.merge(
-            attendance_df[['date_str', 'status']],
-            on='date_str',
-            how='left'
-        )
-
-        # Fill missing status with 'Absent'
-        calendar_df['status'].fillna(config.STATUS_ABSENT, inplace=True)
-
-        # Define color mapping for different statuses
-        color_map = {
-            config.STATUS_PRESENT: '#28a745',  # Green
-            config.STATUS_LATE: '#ffc107',     # Yellow
-            config.STATUS_HALF_DAY: '#17a2b8', # Blue
-            config.STATUS_ABSENT: '#dc3545'    # Red
-        }
-
-        # Create a numeric value for each status for the heatmap
-        status_value_map = {
-            config.STATUS_PRESENT: 3,
-            config.STATUS_LATE: 2,
-            config.STATUS_HALF_DAY: 1,
-            config.STATUS_ABSENT: 0
-        }
-
-        calendar_df['status_value'] = calendar_df['status'].map(status_value_map)
-
-        # Create a heatmap calendar
-        # Group by week and day for the heatmap
-        calendar_pivot = calendar_df.pivot_table(
-            index='week',
-            columns='day',
-            values='status_value',
-            aggfunc='first'
-        )
-
-        # Reorder columns to start with Monday
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        calendar_pivot = calendar_pivot.reindex(columns=day_order)
-
-        # Create the heatmap
-        fig = px.imshow(
-            calendar_pivot,
-            labels=dict(x="Day of Week", y="Week", color="Status"),
-            x=calendar_pivot.columns,
-            y=calendar_pivot.index,
-            color_continuous_scale=[
-                [0.0, color_map[config.STATUS_ABSENT]],
-                [0.33, color_map[config.STATUS_HALF_DAY]],
-                [0.66, color_map[config.STATUS_LATE]],
-                [1.0, color_map[config.STATUS_PRESENT]]
-            ],
-            title="Attendance Calendar"
-        )
-
-        # Add date annotations to the heatmap
-        for i, week in enumerate(calendar_pivot.index):
-            for j, day in enumerate(calendar_pivot.columns):
-                day_data = calendar_df[(calendar_df['week'] == week) & (calendar_df['day'] == day)]
-                if not day_data.empty:
-                    day_num = day_data.iloc[0]['day_num']
-                    status = day_data.iloc[0]['status']
-                    fig.add_annotation(
-                        x=j,
-                        y=i,
-                        text=f"{day_num}<br>{status}",
-                        showarrow=False,
-                        font=dict(color="white" if status in [config.STATUS_ABSENT, config.STATUS_PRESENT] else "black")
-                    )
-
-        # Update layout
-        fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            height=400,
-            xaxis=dict(side="top"),
-            coloraxis_showscale=False
-        )
-
-        # Add a legend/color guide
-        st.markdown("<div style='display: flex; justify-content: center; margin-top: 10px;'>", unsafe_allow_html=True)
-        for status, color in color_map.items():
-            st.markdown(
-                f"<div style='margin: 0 10px;'><span style='display: inline-block; width: 15px; height: 15px; background-color: {color}; margin-right: 5px;'></span>{status}</div>",
-                unsafe_allow_html=True
-            )
-        st.markdown("</div>", unsafe_allow_html=True)
         st.plotly_chart(fig, use_container_width=True)
     else:
-        st.info("No attendance data available for the selected date range.")
+        st.info("No attendance statistics yet. Check in to start tracking.")
 
     utils.display_footer()
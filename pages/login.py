@@ -4,9 +4,11 @@ Login page for the attendance tracking system.
 import streamlit as st
 import auth
 import utils
+import metrics
 import time
 import config  # Import config for debugging
 
+@metrics.timed()
 def show():
     """Display the login page."""
     utils.apply_custom_css()
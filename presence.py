@@ -0,0 +1,232 @@
+"""
+Bitmap index of daily attendance for cohort queries.
+
+For every working day (Monday to Friday) the index keeps two bit arrays
+with one bit per user ID: whether the user checked in that day, and
+whether the check-in was late. The arrays form two NumPy uint8 matrices
+of shape (working days, user bytes), so questions such as "who was
+present every day this week", "who was absent three working days in a
+row" or "attendance rate per department" are answered with vectorized
+AND/OR/popcount over a few kilobytes instead of scanning attendance rows.
+
+User sets (all interns, one department) are passed to the queries as
+masks of the same width, built with mask().
+
+The index is saved to config.PRESENCE_INDEX_PATH with the highest
+attendance row ID it covers; database.py loads it, catches up on newer
+rows and rebuilds it when needed (see database.get_presence_index()).
+"""
+import os
+from datetime import date, timedelta
+import numpy as np
+
+# np.bitwise_count is new in NumPy 2.0; older versions count the bits of each byte with a lookup table
+_BIT_COUNTS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1, dtype=np.uint8)
+_bitwise_count = getattr(np, "bitwise_count", lambda bits: _BIT_COUNTS[bits])
+
+# Rows and columns are allocated in chunks, so appending days or users rarely reallocates
+_DAY_CHUNK = 64
+_USER_CHUNK = 1024
+
+def _to_days(dates):
+    """Convert ISO date strings or dates to an array of datetime64[D]."""
+    return np.asarray(dates, dtype="datetime64[D]")
+
+class PresenceIndex:
+    """
+    Per-working-day presence and late bitmaps.
+
+    Args:
+        epoch: Monday on or before the first indexed date
+        present: Optional existing presence matrix
+        late: Optional existing late matrix
+        watermark: Highest attendance row ID already indexed
+        database_id: ID of the database the index was built from
+        status_version: Status version of the database when the index was built
+    """
+
+    def __init__(self, epoch, present=None, late=None, watermark=0, database_id=None, status_version=0):
+        if epoch.weekday() != 0:
+            raise ValueError("epoch must be a Monday")
+        self.epoch = epoch
+        self.present = present if present is not None else np.zeros((0, 0), dtype=np.uint8)
+        self.late = late if late is not None else np.zeros_like(self.present)
+        self.watermark = watermark
+        self.database_id = database_id
+        self.status_version = status_version
+
+    # Working days
+    def day_index(self, day):
+        """Return the row of a date, counting working days from the epoch (weekends map to the next Monday)."""
+        days = (day - self.epoch).days
+        weeks, weekday = divmod(days, 7)
+        return weeks * 5 + min(weekday, 5)
+
+    def day_of(self, index):
+        """Return the date of a row."""
+        weeks, weekday = divmod(index, 5)
+        return self.epoch + timedelta(days=weeks * 7 + weekday)
+
+    def day_slice(self, start_date, end_date):
+        """Return the rows of the working days from start_date to end_date, inclusive."""
+        start = max(self.day_index(start_date), 0)
+        # A weekend end date maps to the following Monday, which is not included
+        end = self.day_index(end_date) + (1 if end_date.weekday() < 5 else 0)
+        return slice(start, max(end, start))
+
+    def working_days(self, start_date, end_date):
+        """Number of working days from start_date to end_date, inclusive."""
+        rows = self.day_slice(start_date, end_date)
+        return rows.stop - rows.start
+
+    # Updates
+    def _reserve(self, days, user_bytes):
+        """Grow both matrices to at least days x user_bytes."""
+        rows, columns = self.present.shape
+        if days <= rows and user_bytes <= columns:
+            return
+        rows = max(rows, -(-days // _DAY_CHUNK) * _DAY_CHUNK)
+        columns = max(columns, -(-user_bytes * 8 // _USER_CHUNK) * _USER_CHUNK // 8)
+        for name in ("present", "late"):
+            old = getattr(self, name)
+            new = np.zeros((rows, columns), dtype=np.uint8)
+            new[:old.shape[0], :old.shape[1]] = old
+            setattr(self, name, new)
+
+    def add(self, ids, user_ids, dates, late):
+        """
+        Index check-ins; weekend dates are ignored.
+
+        Args:
+            ids: Attendance row IDs, to advance the watermark
+            user_ids: User ID of each check-in
+            dates: Date of each check-in (ISO strings or dates)
+            late: Whether each check-in was late
+
+        Returns:
+            bool: False if a date precedes the epoch, so the index must be rebuilt
+        """
+        if len(ids) == 0:
+            return True
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        late = np.asarray(late, dtype=bool)
+        days = (_to_days(dates) - np.datetime64(self.epoch, "D")).astype(np.int64)
+        if days.min() < 0:
+            return False
+
+        weeks, weekday = np.divmod(days, 7)
+        working = weekday < 5
+        rows = (weeks * 5 + weekday)[working]
+        user_ids = user_ids[working]
+        late = late[working]
+
+        if len(rows):
+            self._reserve(int(rows.max()) + 1, int(user_ids.max()) // 8 + 1)
+            columns = user_ids >> 3
+            bits = np.left_shift(1, user_ids & 7).astype(np.uint8)
+            np.bitwise_or.at(self.present, (rows, columns), bits)
+            np.bitwise_or.at(self.late, (rows[late], columns[late]), bits[late])
+        self.watermark = max(self.watermark, int(np.max(ids)))
+        return True
+
+    # User sets
+    def mask(self, user_ids):
+        """Return a bit mask of the given user IDs, as wide as the index."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if len(user_ids):
+            self._reserve(self.present.shape[0], int(user_ids.max()) // 8 + 1)
+        mask = np.zeros(self.present.shape[1], dtype=np.uint8)
+        np.bitwise_or.at(mask, user_ids >> 3, np.left_shift(1, user_ids & 7).astype(np.uint8))
+        return mask
+
+    @staticmethod
+    def members(bits):
+        """Return the user IDs set in a bit mask."""
+        return np.flatnonzero(np.unpackbits(bits, bitorder="little"))
+
+    @staticmethod
+    def count(bits):
+        """Return the number of user IDs set in a bit mask."""
+        return int(_bitwise_count(bits).sum())
+
+    def _rows(self, matrix, rows):
+        """Rows of a matrix, including working days past the allocated ones as all zeros."""
+        selected = matrix[rows]
+        missing = (rows.stop - rows.start) - len(selected)
+        if missing > 0:
+            selected = np.vstack([selected, np.zeros((missing, matrix.shape[1]), dtype=np.uint8)])
+        return selected
+
+    # Queries
+    def present_every_day(self, start_date, end_date, mask):
+        """Return the masked users who checked in on every working day of the range."""
+        rows = self.day_slice(start_date, end_date)
+        if rows.stop == rows.start:
+            return mask.copy()
+        return np.bitwise_and.reduce(self._rows(self.present, rows), axis=0) & mask
+
+    def absent_streak(self, start_date, end_date, length, mask):
+        """Return the masked users absent on at least length consecutive working days of the range."""
+        absent = ~self._rows(self.present, self.day_slice(start_date, end_date))
+        windows = len(absent) - length + 1
+        if length < 1 or windows < 1:
+            return np.zeros_like(mask)
+        run = absent[:windows].copy()
+        for offset in range(1, length):
+            run &= absent[offset:offset + windows]
+        return np.bitwise_or.reduce(run, axis=0) & mask
+
+    def daily_counts(self, start_date, end_date, mask):
+        """
+        Count the masked users present and late on each working day.
+
+        Returns:
+            tuple: (dates, present counts, late counts)
+        """
+        rows = self.day_slice(start_date, end_date)
+        present = _bitwise_count(self._rows(self.present, rows) & mask).sum(axis=1, dtype=np.int64)
+        late = _bitwise_count(self._rows(self.late, rows) & mask).sum(axis=1, dtype=np.int64)
+        return [self.day_of(i) for i in range(rows.start, rows.stop)], present, late
+
+    def user_counts(self, start_date, end_date, mask):
+        """
+        Count each masked user's present and late working days.
+
+        Returns:
+            tuple: (user IDs, present days, late days)
+        """
+        rows = self.day_slice(start_date, end_date)
+        user_ids = self.members(mask)
+        if rows.stop == rows.start:
+            zeros = np.zeros(len(user_ids), dtype=np.int64)
+            return user_ids, zeros, zeros
+        columns, shifts = user_ids >> 3, (user_ids & 7).astype(np.uint8)
+        present = (self._rows(self.present, rows)[:, columns] >> shifts) & 1
+        late = (self._rows(self.late, rows)[:, columns] >> shifts) & 1
+        return user_ids, present.sum(axis=0, dtype=np.int64), late.sum(axis=0, dtype=np.int64)
+
+    # Persistence
+    def save(self, path):
+        """Write the index to path atomically."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, present=self.present, late=self.late,
+                     epoch=self.epoch.toordinal(), watermark=self.watermark,
+                     database_id=-1 if self.database_id is None else self.database_id,
+                     status_version=self.status_version)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index saved with save(), or return None if there is none."""
+        try:
+            with np.load(path) as data:
+                return cls(date.fromordinal(int(data["epoch"])), data["present"], data["late"],
+                           int(data["watermark"]), int(data["database_id"]), int(data["status_version"]))
+        except (OSError, KeyError, ValueError):
+            return None
+
+def monday_of(day):
+    """Return the Monday on or before a date."""
+    return day - timedelta(days=day.weekday())
@@ -0,0 +1,169 @@
+"""
+Opt-in profiling of page reruns.
+
+When enabled (PROFILE_PAGES=true, or the toggle on the admin Performance
+page for that admin's session), app.main() runs the page dispatch under a
+profiler and saves one profile per rerun to config.PROFILE_DIR, named
+after the page, together with a JSON file describing the rerun. The
+deterministic cProfile profiler is used by default. Set PROFILER=pyinstrument
+to use the sampling pyinstrument profiler (if installed), which also
+writes an HTML flame view.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+import streamlit as st
+import config
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+SESSION_KEY = "profiling_enabled"
+
+def is_enabled():
+    """Check whether reruns of the current session should be profiled (False outside `streamlit run`)."""
+    return config.PROFILING_ENABLED or (st.runtime.exists() and st.session_state.get(SESSION_KEY, False))
+
+def _slug(value):
+    return re.sub(r"[^a-z0-9]+", "-", str(value).lower()).strip("-")
+
+def _session_parameters():
+    """Collect simple session values that describe what the rerun displayed."""
+    parameters = {}
+    for key, value in st.session_state.to_dict().items():
+        if key in (config.USER_SESSION_KEY, SESSION_KEY) or key.startswith("$$"):
+            continue
+        if isinstance(value, (date, datetime)):
+            parameters[key] = value.isoformat()
+        elif isinstance(value, (str, int, float, bool)) or value is None:
+            parameters[key] = value
+    return parameters
+
+def _prune():
+    """Keep only the newest config.PROFILE_MAX_RUNS profiles."""
+    runs = list_profiles()
+    for run in runs[config.PROFILE_MAX_RUNS:]:
+        for path in run["files"].values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _start_profiler():
+    """Start the configured profiler; returns None if one is already running in this process."""
+    if config.PROFILER == "pyinstrument" and SamplingProfiler is not None:
+        profiler = SamplingProfiler(async_mode="disabled")
+        try:
+            profiler.start()
+        except RuntimeError:
+            return None
+        return profiler
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+def _save(profiler, base_path):
+    """Stop the profiler and write its output files; returns {kind: path}."""
+    files = {}
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        files["pstats"] = f"{base_path}.pstats"
+        profiler.dump_stats(files["pstats"])
+    else:
+        session = profiler.stop()
+        files["html"] = f"{base_path}.html"
+        with open(files["html"], "w") as f:
+            f.write(profiler.output_html())
+        files["pyisession"] = f"{base_path}.pyisession"
+        session.save(files["pyisession"])
+    return files
+
+@contextmanager
+def profile_rerun(page, role=None):
+    """
+    Profile the enclosed page dispatch if profiling is enabled.
+
+    Streamlit's rerun/stop control-flow exceptions pass through; the
+    profile of the interrupted rerun is still saved.
+
+    Args:
+        page: Name of the page being rendered
+        role: Role of the current user
+    """
+    if not is_enabled():
+        yield
+        return
+
+    profiler = _start_profiler()
+    if profiler is None:
+        yield
+        return
+
+    started_at = datetime.now()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        name = f"{started_at:%Y%m%d-%H%M%S-%f}-{_slug(role or 'anonymous')}-{_slug(page)}"
+        base_path = os.path.join(config.PROFILE_DIR, name)
+        files = _save(profiler, base_path)
+        with open(f"{base_path}.json", "w") as f:
+            json.dump({
+                "name": name,
+                "page": page,
+                "role": role,
+                "parameters": _session_parameters(),
+                "started_at": started_at.isoformat(timespec="seconds"),
+                "duration_ms": round(duration * 1000, 1),
+                "profiler": "cProfile" if "pstats" in files else "pyinstrument",
+                "files": {kind: os.path.basename(path) for kind, path in files.items()},
+            }, f, indent=2)
+        _prune()
+
+def list_profiles():
+    """
+    List saved profiles, newest first.
+
+    Returns:
+        list: Run descriptions with absolute paths of their files (including the .json)
+    """
+    if not os.path.isdir(config.PROFILE_DIR):
+        return []
+    runs = []
+    for filename in sorted(os.listdir(config.PROFILE_DIR), reverse=True):
+        if not filename.endswith(".json"):
+            continue
+        path = os.path.join(config.PROFILE_DIR, filename)
+        try:
+            with open(path) as f:
+                run = json.load(f)
+        except (OSError, ValueError):
+            continue
+        run["files"] = {kind: os.path.join(config.PROFILE_DIR, name) for kind, name in run["files"].items()}
+        run["files"]["json"] = path
+        runs.append(run)
+    return runs
+
+def summarize(run, limit=30, sort="cumulative"):
+    """Return the top functions of a cProfile run as text, or None for other profilers."""
+    path = run["files"].get("pstats")
+    if not path or not os.path.exists(path):
+        return None
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
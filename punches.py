@@ -0,0 +1,78 @@
+"""
+Folding of punch events into daily attendance.
+
+With config.PUNCH_LOG_ENABLED, check-ins and check-outs are appended to
+the punch_events table as they happen, without reading anything first,
+and database.derive_attendance() folds them into the attendance table
+afterwards. Each attendance row then carries the state of its user-day:
+
+- check_in_time: the first punch in,
+- check_out_time: the last punch out, or None while a session is open,
+- open_since: the punch in of the open session, if any,
+- worked_seconds: time inside sessions,
+- break_seconds: time between a punch out and the next punch in.
+
+New punches later than the row's last one are folded onto that state
+directly; a punch that arrives out of order makes the user-day fold again
+from all of its punches.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+PUNCH_IN = "in"
+PUNCH_OUT = "out"
+
+DayState = namedtuple("DayState", ("check_in_time", "check_out_time", "open_since", "worked_seconds", "break_seconds"))
+
+def _seconds_between(start, end):
+    return max(int((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()), 0)
+
+def state_from_row(check_in_time, check_out_time, open_since, worked_seconds, break_seconds):
+    """
+    Return the fold state of an attendance row, or None if it has no check-in.
+
+    Rows written before the punch log (worked_seconds NULL) count as one
+    session from check-in to check-out.
+    """
+    if not check_in_time:
+        return None
+    if worked_seconds is None:
+        if check_out_time:
+            return DayState(check_in_time, check_out_time, None, _seconds_between(check_in_time, check_out_time), 0)
+        return DayState(check_in_time, None, check_in_time, 0, 0)
+    return DayState(check_in_time, check_out_time, open_since, worked_seconds, break_seconds or 0)
+
+def last_punch_time(state):
+    """Return the time of the latest punch folded into a state."""
+    return state.open_since or state.check_out_time
+
+def fold(state, punches):
+    """
+    Fold punches, sorted by time, into a user-day's state.
+
+    A punch in while a session is open and a punch out before any punch in
+    are ignored; a punch out after a closed session extends that session.
+
+    Args:
+        state: DayState, or None for a day without check-in
+        punches: (kind, time) pairs, sorted by time
+
+    Returns:
+        DayState: The new state, or None if the day still has no check-in
+    """
+    for kind, time in punches:
+        if kind == PUNCH_IN:
+            if state is None:
+                state = DayState(time, None, time, 0, 0)
+            elif state.open_since is None:
+                state = state._replace(
+                    check_out_time=None, open_since=time,
+                    break_seconds=state.break_seconds + _seconds_between(state.check_out_time, time))
+        elif state is not None:
+            if state.open_since is not None:
+                worked = _seconds_between(state.open_since, time)
+            else:
+                worked = _seconds_between(state.check_out_time, time)
+            state = state._replace(check_out_time=time, open_since=None,
+                                   worked_seconds=state.worked_seconds + worked)
+    return state
@@ -0,0 +1,457 @@
+"""
+Headless monthly attendance reports.
+
+Generates one report per department (or per intern) for a month without
+the Streamlit pages, e.g. from cron. Each report holds the month's
+attendance rows, streamed from database.iter_attendance() straight into
+the file, and the per-intern summary of analytics.intern_summaries().
+Reports are generated in parallel, one per task of a process pool, and
+each file is written under a temporary name and renamed when complete,
+so readers never see a partial report.
+
+Formats:
+
+- csv: <name>.csv with the rows and <name>_summary.csv
+- xlsx: <name>.xlsx with Attendance and Summary sheets, written in
+  xlsxwriter's constant-memory mode
+- parquet: <name>.parquet written in row groups and <name>_summary.parquet
+
+Files go to <output dir>/<YYYY-MM>/. A timing summary of every report is
+printed at the end, and the exit status is non-zero if any report failed.
+
+With --pack, build_report_pack() instead writes one zip archive holding a
+workbook per intern, as the Reports page's "Export Individual Report"
+produces for one intern: the month is read in a single range scan ordered
+by intern, the workbooks are built by the process pool in chunks of
+interns, and each is added to the archive as it comes back. The Reports
+page builds the same archive for its date range.
+
+Usage:
+    python -m report [--month 2026-09] [--by department|intern] [--format csv|xlsx|parquet]
+                     [--output-dir data/reports] [--workers 4] [--summary-json timings.json]
+    python -m report --pack [--month 2026-09] [--department IT] [--output-dir data/reports] [--workers 4]
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from itertools import groupby
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+import config
+
+FORMATS = ("csv", "xlsx", "parquet")
+
+# Attendance record fields and their column labels, as on the Reports page
+REPORT_COLUMNS = (
+    ("date", "Date"),
+    ("username", "Username"),
+    ("name", "Name"),
+    ("department", "Department"),
+    ("check_in_time", "Check-in"),
+    ("check_out_time", "Check-out"),
+    ("status", "Status"),
+)
+
+_BATCH_ROWS = 10000  # Rows per Parquet row group
+_PACK_CHUNK = 25  # Interns per report pack task
+_PACK_IN_FLIGHT = 4  # Report pack tasks queued per worker before waiting for results
+
+def month_range(month=None):
+    """
+    Return the first and last date of a month.
+
+    Args:
+        month: Optional month (YYYY-MM); defaults to the previous month
+
+    Returns:
+        tuple: (first date, last date) as YYYY-MM-DD strings
+    """
+    if month:
+        first = date.fromisoformat(f"{month}-01")
+    else:
+        first = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+def slug(value):
+    """Make a name safe for file names."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(value)).strip("_") or "none"
+
+def _write_csv(path, header, rows):
+    """Write rows to a CSV file; returns the number of rows."""
+    count = 0
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    os.replace(temp_path, path)
+    return count
+
+def _write_parquet(path, header, rows):
+    """Write rows of strings to a Parquet file in row groups; returns the number of rows."""
+    schema = pa.schema([(label, pa.string()) for label in header])
+    count = 0
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with pq.ParquetWriter(temp_path, schema, compression="zstd") as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == _BATCH_ROWS:
+                writer.write_batch(pa.record_batch(list(map(list, zip(*batch))), schema=schema))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            columns = list(map(list, zip(*batch))) if batch else [[] for _ in header]
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            count += len(batch)
+    os.replace(temp_path, path)
+    return count
+
+def _write_xlsx(path, sheets):
+    """
+    Write sheets to a workbook without holding their rows in memory.
+
+    Args:
+        path: Output path
+        sheets: List of (sheet name, header, rows)
+
+    Returns:
+        int: Number of rows in the first sheet
+    """
+    counts = []
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    workbook = xlsxwriter.Workbook(temp_path, {"constant_memory": True})
+    try:
+        bold = workbook.add_format({"bold": True})
+        for name, header, rows in sheets:
+            sheet = workbook.add_worksheet(name)
+            sheet.write_row(0, 0, header, bold)
+            sheet.set_column(0, len(header) - 1, 18)
+            count = 0
+            for count, row in enumerate(rows, start=1):
+                sheet.write_row(count, 0, row)
+            counts.append(count)
+    finally:
+        workbook.close()
+    os.replace(temp_path, path)
+    return counts[0]
+
+def _attendance_rows(start_date, end_date, department=None, user_id=None):
+    """Stream the report's attendance rows as tuples."""
+    import database as db
+
+    fields = [field for field, _ in REPORT_COLUMNS]
+    for record in db.iter_attendance(start_date, end_date, department=department, user_id=user_id):
+        yield tuple(getattr(record, field) for field in fields)
+
+def _summary(start_date, end_date, department=None, user_id=None):
+    """Return the per-intern summary of the report as a DataFrame."""
+    import analytics
+
+    summary = analytics.intern_summaries(start_date, end_date, department)
+    if user_id is not None:
+        summary = summary[summary["User ID"] == user_id]
+    return summary
+
+def generate_report(task):
+    """
+    Generate one report; runs in a worker process.
+
+    Args:
+        task: Dict with name, department, user_id, start_date, end_date, format and directory
+
+    Returns:
+        dict: The report's name, rows, interns, files, bytes and seconds, or its error
+    """
+    start = time.perf_counter()
+    header = [label for _, label in REPORT_COLUMNS]
+    base = os.path.join(task["directory"], slug(task["name"]))
+    filters = (task["start_date"], task["end_date"], task["department"], task["user_id"])
+    try:
+        rows = _attendance_rows(*filters)
+        summary = _summary(*filters)
+        summary_rows = summary.itertuples(index=False, name=None)
+        if task["format"] == "xlsx":
+            paths = [f"{base}.xlsx"]
+            row_count = _write_xlsx(paths[0], [("Attendance", header, rows),
+                                               ("Summary", list(summary.columns), summary_rows)])
+        else:
+            write = _write_csv if task["format"] == "csv" else _write_parquet
+            paths = [f"{base}.{task['format']}", f"{base}_summary.{task['format']}"]
+            row_count = write(paths[0], header, rows)
+            if task["format"] == "csv":
+                _write_csv(paths[1], list(summary.columns), summary_rows)
+            else:
+                temp_path = f"{paths[1]}.{os.getpid()}.tmp"
+                pq.write_table(pa.Table.from_pandas(summary, preserve_index=False), temp_path)
+                os.replace(temp_path, paths[1])
+    except Exception as e:
+        return {"name": task["name"], "error": f"{type(e).__name__}: {e}",
+                "seconds": round(time.perf_counter() - start, 3)}
+
+    return {
+        "name": task["name"],
+        "rows": row_count,
+        "interns": len(summary),
+        "files": paths,
+        "bytes": sum(os.path.getsize(path) for path in paths),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+def plan_reports(by, start_date, end_date, fmt, output_dir):
+    """
+    List the report tasks of a run.
+
+    Args:
+        by: "department" or "intern"
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD)
+        fmt: Output format
+        output_dir: Base output directory
+
+    Returns:
+        list: Task dicts for generate_report()
+    """
+    import database as db
+
+    directory = os.path.join(output_dir, start_date[:7])
+    os.makedirs(directory, exist_ok=True)
+    task = {"start_date": start_date, "end_date": end_date, "format": fmt, "directory": directory}
+    if by == "department":
+        return [{**task, "name": department["name"], "department": department["name"], "user_id": None}
+                for department in db.get_departments()]
+    return [{**task, "name": f"{intern.id}_{intern.username}", "department": intern.department, "user_id": intern.id}
+            for intern in db.iter_users(role="intern")]
+
+def run_reports(tasks, workers=None, progress=None):
+    """
+    Generate reports in a process pool.
+
+    Args:
+        tasks: Tasks from plan_reports()
+        workers: Optional number of worker processes (default: config.REPORT_WORKERS)
+        progress: Optional callable(done, total, result) called as reports complete
+
+    Returns:
+        list: generate_report() results, in task order
+    """
+    results = [None] * len(tasks)
+    # Spawned workers open their own database connections instead of inheriting the parent's
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers or config.REPORT_WORKERS, mp_context=context) as pool:
+        futures = {pool.submit(generate_report, task): i for i, task in enumerate(tasks)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress:
+                progress(done, len(tasks), results[futures[future]])
+    return results
+
+def _intern_workbook(intern, rows, start_date, end_date):
+    """
+    Build one intern's workbook in memory.
+
+    Args:
+        intern: (user ID, username, name, department)
+        rows: The intern's (date, check-in, check-out, status) rows, oldest first
+        start_date: First date of the report (YYYY-MM-DD)
+        end_date: Last date of the report (YYYY-MM-DD)
+
+    Returns:
+        tuple: (file name, workbook bytes)
+    """
+    user_id, username, name, department = intern
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"in_memory": True})
+    bold = workbook.add_format({"bold": True})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    time_format = workbook.add_format({"num_format": "hh:mm AM/PM"})
+
+    # Newest first, as on the Reports page
+    sheet = workbook.add_worksheet("Attendance")
+    sheet.write_row(0, 0, ["Date", "Check-in", "Check-out", "Status"], bold)
+    sheet.set_column(0, 3, 14)
+    for i, (day, check_in_time, check_out_time, status) in enumerate(reversed(rows), start=1):
+        sheet.write_datetime(i, 0, datetime.fromisoformat(str(day)[:10]), date_format)
+        for column, timestamp in ((1, check_in_time), (2, check_out_time)):
+            if timestamp:
+                sheet.write_datetime(i, column, datetime.fromisoformat(str(timestamp)), time_format)
+            else:
+                sheet.write_string(i, column, "-")
+        sheet.write_string(i, 3, status or "")
+
+    statuses = [status for _, _, _, status in rows]
+    total_days = (date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1
+    summary = workbook.add_worksheet("Summary")
+    summary.set_column(0, 1, 18)
+    for i, (label, value) in enumerate((
+        ("Name", name), ("Username", username), ("Department", department or ""),
+        ("From", start_date), ("To", end_date), ("Total Days", total_days),
+        ("Present", statuses.count(config.STATUS_PRESENT)), ("Late", statuses.count(config.STATUS_LATE)),
+        ("Absent", total_days - len(rows)),
+    )):
+        summary.write_string(i, 0, label, bold)
+        summary.write(i, 1, value)
+    workbook.close()
+    return f"{slug(f'{user_id}_{username}')}.xlsx", output.getvalue()
+
+def _intern_workbooks(chunk, start_date, end_date):
+    """Build the workbooks of a chunk of (intern, rows) pairs; runs in a worker process."""
+    return [_intern_workbook(intern, rows, start_date, end_date) for intern, rows in chunk]
+
+def _pack_chunks(start_date, end_date, department=None):
+    """
+    Yield chunks of (intern, rows) pairs from one range scan ordered by intern.
+
+    Interns without attendance in the range follow, with no rows.
+    """
+    import database as db
+
+    interns = {intern.id: (intern.id, intern.username, intern.name, intern.department)
+               for intern in db.iter_users(role="intern")
+               if department is None or intern.department == department}
+    chunk = []
+    records = db.iter_attendance(start_date, end_date, department=department, by_user=True)
+    for user_id, user_records in groupby(records, key=lambda record: record.user_id):
+        intern = interns.pop(user_id, None)
+        if intern is None:
+            continue
+        chunk.append((intern, [(record.date, record.check_in_time, record.check_out_time, record.status)
+                               for record in user_records]))
+        if len(chunk) == _PACK_CHUNK:
+            yield chunk
+            chunk = []
+    for intern in interns.values():
+        chunk.append((intern, []))
+        if len(chunk) == _PACK_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def build_report_pack(output, start_date, end_date, department=None, workers=None, progress=None):
+    """
+    Write a zip archive with one attendance workbook per intern.
+
+    The workbooks are built in a process pool and written to the archive as
+    they complete, with at most a few chunks per worker in flight, so the
+    archive is streamed rather than assembled in memory.
+
+    Args:
+        output: Path or writable file object for the zip archive
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD)
+        department: Optional department name filter
+        workers: Optional number of worker processes (default: config.REPORT_WORKERS)
+        progress: Optional callable(done, total) called as workbooks are added
+
+    Returns:
+        dict: Number of interns and rows, and seconds taken
+    """
+    import database as db
+
+    start = time.perf_counter()
+    workers = workers or config.REPORT_WORKERS
+    total = sum(1 for intern in db.iter_users(role="intern")
+                if department is None or intern.department == department)
+    done = 0
+    rows = 0
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool, \
+            zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        pending = set()
+
+        def collect(limit):
+            nonlocal done
+            while len(pending) > limit:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pending.remove(future)
+                    for name, data in future.result():
+                        archive.writestr(name, data)
+                        done += 1
+                    if progress:
+                        progress(done, max(total, done))
+
+        for chunk in _pack_chunks(start_date, end_date, department):
+            rows += sum(len(intern_rows) for _, intern_rows in chunk)
+            pending.add(pool.submit(_intern_workbooks, chunk, start_date, end_date))
+            collect(workers * _PACK_IN_FLIGHT)
+        collect(0)
+
+    return {"interns": done, "rows": rows, "seconds": round(time.perf_counter() - start, 3)}
+
+def format_summary(results, seconds):
+    """Format a timing table of report results."""
+    width = max([len(result["name"]) for result in results] + [6])
+    lines = [f"{'Report':<{width}}  {'Rows':>9}  {'Interns':>7}  {'KiB':>9}  {'Seconds':>8}"]
+    for result in sorted(results, key=lambda result: result["seconds"], reverse=True):
+        if "error" in result:
+            lines.append(f"{result['name']:<{width}}  FAILED: {result['error']}")
+        else:
+            lines.append(f"{result['name']:<{width}}  {result['rows']:>9}  {result['interns']:>7}  "
+                         f"{result['bytes'] / 1024:>9.1f}  {result['seconds']:>8.3f}")
+    report_seconds = sum(result["seconds"] for result in results)
+    lines.append(f"{len(results)} reports in {seconds:.3f} s wall time ({report_seconds:.3f} s of report time)")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate monthly attendance reports.")
+    parser.add_argument("--month", help="YYYY-MM (default: the previous month)")
+    parser.add_argument("--by", choices=["department", "intern"], default="department")
+    parser.add_argument("--format", choices=FORMATS, default="xlsx")
+    parser.add_argument("--output-dir", default=config.REPORT_DIR)
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Worker processes (default {config.REPORT_WORKERS})")
+    parser.add_argument("--summary-json", help="Also write the timing summary to this JSON file")
+    parser.add_argument("--pack", action="store_true", help="Write one zip archive of per-intern workbooks")
+    parser.add_argument("--department", help="Only this department's interns (with --pack)")
+    args = parser.parse_args()
+
+    start_date, end_date = month_range(args.month)
+    if args.pack:
+        directory = os.path.join(args.output_dir, start_date[:7])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"interns_{slug(args.department or 'all')}.zip")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+
+        def pack_progress(done, total):
+            print(f"\r[{done}/{total}] interns", end="", flush=True)
+
+        result = build_report_pack(temp_path, start_date, end_date, args.department, args.workers, pack_progress)
+        os.replace(temp_path, path)
+        print(f"\n{path}: {result['interns']} interns, {result['rows']} rows, "
+              f"{os.path.getsize(path) / 1024:.1f} KiB in {result['seconds']:.3f} s")
+        return
+    tasks = plan_reports(args.by, start_date, end_date, args.format, args.output_dir)
+
+    def progress(done, total, result):
+        outcome = "failed" if "error" in result else f"{result['rows']} rows"
+        print(f"[{done}/{total}] {result['name']}: {outcome} in {result['seconds']:.3f} s", flush=True)
+
+    start = time.perf_counter()
+    results = run_reports(tasks, args.workers, progress)
+    seconds = time.perf_counter() - start
+
+    print(format_summary(results, seconds))
+    if args.summary_json:
+        with open(args.summary_json, "w") as f:
+            json.dump({"month": start_date[:7], "by": args.by, "format": args.format,
+                       "seconds": round(seconds, 3), "reports": results}, f, indent=2)
+    if any("error" in result for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Compiled lookup of work schedules.
+
+A schedule sets the start and end of the working day for a department or
+one intern, optionally on one weekday only, from effective_from until
+effective_to (inclusive; open-ended when None). Schedules may overlap: on
+any date the one with the latest effective_from (then the highest ID)
+wins, so a temporary shift can be laid over a permanent one.
+
+ScheduleIndex compiles the schedule rows into, for every (intern or
+department, weekday) key, a sorted list of non-overlapping date segments
+with their winning schedule. Resolving the schedule of a check-in is then
+a dictionary lookup and a bisect per key, in the order:
+
+1. the intern's schedule for that weekday,
+2. the intern's schedule for every day,
+3. the department's schedule for that weekday,
+4. the department's schedule for every day.
+
+lookup_many() does the same for NumPy arrays of check-ins at once.
+"""
+import bisect
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+_OPEN_END = "9999-12-31"
+
+def _next_day(day):
+    """Return the ISO date after an ISO date."""
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+def _compile_segments(intervals):
+    """
+    Flatten overlapping (effective_from, effective_to, rank, position) intervals.
+
+    Returns:
+        tuple: (segment starts, segment ends, winning positions), sorted by start
+    """
+    boundaries = sorted({start for start, _, _, _ in intervals}
+                        | {_next_day(end) for _, end, _, _ in intervals if end < _OPEN_END})
+    starts, ends, winners = [], [], []
+    for i, start in enumerate(boundaries):
+        end = boundaries[i + 1] if i + 1 < len(boundaries) else None
+        covering = [interval for interval in intervals
+                    if interval[0] <= start and interval[1] >= start]
+        if not covering:
+            continue
+        winner = max(covering, key=lambda interval: interval[2])[3]
+        last = (date.fromisoformat(end) - timedelta(days=1)).isoformat() if end else _OPEN_END
+        if winners and winners[-1] == winner and _next_day(ends[-1]) == start:
+            ends[-1] = last
+        else:
+            starts.append(start)
+            ends.append(last)
+            winners.append(winner)
+    return starts, ends, winners
+
+class ScheduleIndex:
+    """
+    Interval index of schedules by intern or department, weekday and date.
+
+    Args:
+        schedules: Schedule records with department, user_id, weekday,
+            effective_from, effective_to and id fields
+    """
+
+    def __init__(self, schedules):
+        self.schedules = list(schedules)
+        intervals = {}
+        for position, schedule in enumerate(self.schedules):
+            if schedule.user_id is not None:
+                key = ("user", schedule.user_id, schedule.weekday)
+            else:
+                key = ("department", schedule.department, schedule.weekday)
+            intervals.setdefault(key, []).append((
+                str(schedule.effective_from)[:10],
+                str(schedule.effective_to)[:10] if schedule.effective_to else _OPEN_END,
+                (str(schedule.effective_from)[:10], schedule.id),
+                position,
+            ))
+        self._segments = {key: _compile_segments(key_intervals) for key, key_intervals in intervals.items()}
+
+    def __len__(self):
+        return len(self.schedules)
+
+    def _keys(self, user_id, department, weekday):
+        return (("user", user_id, weekday), ("user", user_id, None),
+                ("department", department, weekday), ("department", department, None))
+
+    def lookup(self, user_id, department, day):
+        """
+        Return the schedule in effect for an intern on a date, or None.
+
+        Args:
+            user_id: The intern's user ID
+            department: The intern's department
+            day: The date (YYYY-MM-DD)
+        """
+        day = day[:10]
+        weekday = date.fromisoformat(day).weekday()
+        for key in self._keys(user_id, department, weekday):
+            segments = self._segments.get(key)
+            if segments is None:
+                continue
+            starts, ends, winners = segments
+            i = bisect.bisect_right(starts, day) - 1
+            if i >= 0 and day <= ends[i]:
+                return self.schedules[winners[i]]
+        return None
+
+    def lookup_many(self, user_ids, departments, dates):
+        """
+        Resolve the schedules of many check-ins at once.
+
+        Args:
+            user_ids: NumPy array of user IDs
+            departments: NumPy object array of departments
+            dates: NumPy array of dates (YYYY-MM-DD strings)
+
+        Returns:
+            numpy.ndarray: Index into self.schedules per check-in, -1 where none applies
+        """
+        dates = np.asarray(dates, dtype="U10")
+        # 1970-01-01 was a Thursday
+        weekdays = (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+        result = np.full(len(dates), -1, dtype=np.int64)
+        rows_by = {
+            "department": pd.Series(departments, dtype=object).groupby(departments, sort=False).indices,
+            "user": pd.Series(user_ids).groupby(user_ids, sort=False).indices,
+        }
+
+        # Lowest precedence first, so more specific schedules overwrite
+        for kind, by_weekday in (("department", False), ("department", True), ("user", False), ("user", True)):
+            for key, (starts, ends, winners) in self._segments.items():
+                if key[0] != kind or (key[2] is not None) != by_weekday or key[1] not in rows_by[kind]:
+                    continue
+                rows = rows_by[kind][key[1]]
+                if by_weekday:
+                    rows = rows[weekdays[rows] == key[2]]
+                segment = np.searchsorted(np.asarray(starts, dtype="U10"), dates[rows], side="right") - 1
+                covered = segment >= 0
+                covered[covered] &= dates[rows[covered]] <= np.asarray(ends, dtype="U10")[segment[covered]]
+                result[rows[covered]] = np.asarray(winners)[segment[covered]]
+        return result
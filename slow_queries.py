@@ -0,0 +1,186 @@
+"""
+Slow query log for the attendance tracking system.
+
+With the SQLite backend, connections created by database.get_db_connection()
+are TracedConnection instances (on PostgreSQL, use the server's
+log_min_duration_statement and auto_explain instead). SQLite's trace callback marks the start of every statement
+and a progress handler records the last moment the statement was
+executing in SQLite's VM. A statement's duration runs from its start to
+its last VM step, so a result set that is consumed slowly counts as slow
+too; it also holds its read snapshot that long.
+
+Statements slower than config.SLOW_QUERY_THRESHOLD_MS are written, with
+their EXPLAIN QUERY PLAN and parameters, to a rotating JSON-lines file
+(config.SLOW_QUERY_LOG_PATH). Plans are captured on a separate
+connection when the traced connection commits or closes, so capturing
+never runs inside SQLite callbacks or holds up the statement itself.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+import config
+
+_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def normalize(sql):
+    """
+    Replace literal values in an expanded statement with placeholders.
+
+    Returns:
+        tuple: (normalized SQL, list of the literal values as they appeared)
+    """
+    parameters = []
+
+    def replace(match):
+        parameters.append(match.group(0))
+        return "?"
+
+    normalized = _LITERAL_PATTERN.sub(replace, sql)
+    return " ".join(normalized.split()), parameters
+
+def _get_logger():
+    """Return the slow query logger, creating its rotating file handler on first use."""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            os.makedirs(os.path.dirname(config.SLOW_QUERY_LOG_PATH), exist_ok=True)
+            handler = RotatingFileHandler(
+                config.SLOW_QUERY_LOG_PATH,
+                maxBytes=config.SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=config.SLOW_QUERY_LOG_BACKUPS
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("attendance.slow_queries")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+def explain(database, sql):
+    """Return the EXPLAIN QUERY PLAN of a statement as indented lines."""
+    conn = sqlite3.connect(database)
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    except sqlite3.Error as e:
+        return [f"(plan unavailable: {e})"]
+    finally:
+        conn.close()
+
+    depth = {0: -1}
+    plan = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        plan.append("  " * depth[node_id] + detail)
+    return plan
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3 connection that records statements slower than the configured threshold."""
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self._database = database
+        self._threshold = config.SLOW_QUERY_THRESHOLD_MS / 1000
+        self._statement = None
+        self._started = self._last_step = 0.0
+        self._slow = []
+        self.set_trace_callback(self._on_statement)
+        self.set_progress_handler(self._on_progress, config.SLOW_QUERY_PROGRESS_STEPS)
+
+    def _on_statement(self, sql):
+        # Trigger sub-statements are reported as comments; they belong to their parent
+        if sql.startswith("--"):
+            return
+        self._finish_statement()
+        self._statement = sql
+        self._started = self._last_step = time.perf_counter()
+
+    def _on_progress(self):
+        self._last_step = time.perf_counter()
+        return 0
+
+    def _finish_statement(self):
+        if self._statement is None:
+            return
+        duration = self._last_step - self._started
+        if duration >= self._threshold and self._statement.lstrip().upper().startswith(_EXPLAINABLE):
+            self._slow.append((self._statement, duration, time.time()))
+        self._statement = None
+
+    def flush_slow_queries(self):
+        """Write the slow statements seen so far to the slow query log."""
+        self._finish_statement()
+        slow, self._slow = self._slow, []
+        if not slow:
+            return
+        logger = _get_logger()
+        for sql, duration, started_at in slow:
+            normalized, parameters = normalize(sql)
+            logger.info(json.dumps({
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started_at)),
+                "duration_ms": round(duration * 1000, 3),
+                "threshold_ms": config.SLOW_QUERY_THRESHOLD_MS,
+                "sql": normalized,
+                "parameters": parameters,
+                "plan": explain(self._database, sql),
+            }))
+
+    def commit(self):
+        super().commit()
+        self.flush_slow_queries()
+
+    def close(self):
+        self._finish_statement()
+        super().close()
+        self.flush_slow_queries()
+
+def read_log():
+    """Yield logged slow queries from the current log file and its backups, oldest first."""
+    paths = [f"{config.SLOW_QUERY_LOG_PATH}.{i}" for i in range(config.SLOW_QUERY_LOG_BACKUPS, 0, -1)]
+    paths.append(config.SLOW_QUERY_LOG_PATH)
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def summarize(limit=20):
+    """
+    Group logged slow queries by normalized statement.
+
+    Returns:
+        list: Dicts with the statement, count, total/mean/max duration, the
+        most recent parameters and plan, sorted by total time (descending)
+    """
+    groups = {}
+    for entry in read_log():
+        group = groups.get(entry["sql"])
+        if group is None:
+            group = groups[entry["sql"]] = {
+                "sql": entry["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0
+            }
+        group["count"] += 1
+        group["total_ms"] += entry["duration_ms"]
+        group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+        group["last_seen"] = entry["ts"]
+        group["last_parameters"] = entry["parameters"]
+        group["plan"] = entry["plan"]
+
+    summary = sorted(groups.values(), key=lambda group: group["total_ms"], reverse=True)[:limit]
+    for group in summary:
+        group["total_ms"] = round(group["total_ms"], 3)
+        group["mean_ms"] = round(group["total_ms"] / group["count"], 3)
+    return summary
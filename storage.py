@@ -0,0 +1,363 @@
+"""
+Storage backends for the attendance tracking system.
+
+database.py talks to the database through DB-API connections obtained from
+the configured backend (config.DB_BACKEND):
+
+- "sqlite": the single file at config.DB_PATH (the default).
+- "postgres": a PostgreSQL server at config.DATABASE_URL, through a psycopg
+  connection pool, so several application replicas can share one database.
+
+Both backends hand out connections that accept the same SQL: "?"
+placeholders, rows readable by index and by column name, and
+cursor.row_factory = None for plain tuples. The few operations whose SQL
+differs between the two (transaction start, bulk import, streaming large
+results, VACUUM, user search, schema changes) are methods of the backend,
+and the schema's column types are the backend's `types`.
+"""
+import sqlite3
+import uuid
+from functools import lru_cache
+import config
+import slow_queries
+
+try:
+    import psycopg
+    from psycopg.rows import tuple_row
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    psycopg = None
+
+# Exceptions raised for constraint violations by either backend
+IntegrityError = (sqlite3.IntegrityError,) + ((psycopg.IntegrityError,) if psycopg else ())
+# Exceptions raised for transient failures (locked database, lost connection) by either backend
+OperationalError = (sqlite3.OperationalError,) + ((psycopg.OperationalError,) if psycopg else ())
+
+class SQLiteBackend:
+    """The SQLite database file at config.DB_PATH."""
+    name = "sqlite"
+    # Column types and the current timestamp, as used by database.init_db()
+    types = {
+        "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "date": "DATE",
+        "timestamp": "TIMESTAMP",
+        "now": "CURRENT_TIMESTAMP",
+    }
+
+    def connect(self):
+        """Open a connection, traced for the slow query log if enabled."""
+        factory = slow_queries.TracedConnection if config.SLOW_QUERY_LOG_ENABLED else sqlite3.Connection
+        conn = sqlite3.connect(config.DB_PATH, factory=factory)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA synchronous = {config.DB_SYNCHRONOUS}")
+        return conn
+
+    def init_database(self, cursor):
+        """Apply database-wide settings before the schema is created."""
+        # Journal mode is persistent, so it only needs to be set once per database file
+        cursor.execute(f"PRAGMA journal_mode = {config.DB_JOURNAL_MODE}")
+
+    def add_column(self, cursor, table, column, definition):
+        """Add a column to an existing table unless it is already there; returns True if it was added."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column in (row[1] for row in cursor.fetchall()):
+            return False
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+
+    def init_user_search(self, cursor):
+        """Create the FTS5 index of users, kept in sync with the users table by triggers."""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'")
+        exists = cursor.fetchone() is not None
+        cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            name, username, email, department,
+            content = 'users', content_rowid = 'id', tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts (rowid, name, username, email, department)
+            VALUES (new.id, new.name, new.username, new.email, new.department);
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, username, email, department)
+            VALUES ('delete', old.id, old.name, old.username, old.email, old.department);
+        END
+        """)
+        # Password changes do not touch the index
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, username, email, department ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, username, email, department)
+            VALUES ('delete', old.id, old.name, old.username, old.email, old.department);
+            INSERT INTO users_fts (rowid, name, username, email, department)
+            VALUES (new.id, new.name, new.username, new.email, new.department);
+        END
+        """)
+        if not exists:
+            # Index users created before the index existed
+            cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+    def search_users(self, cursor, columns, terms, role, limit):
+        """Run a search for users matching every term as a word prefix, best matches first."""
+        # Each term is quoted, so FTS5 operators typed by the user are matched literally
+        match = " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        cursor.execute(
+            f"""
+            SELECT {", ".join(f"u.{column}" for column in columns)}
+            FROM users_fts JOIN users u ON u.id = users_fts.rowid
+            WHERE users_fts MATCH ? AND (CAST(? AS TEXT) IS NULL OR u.role = ?)
+            ORDER BY users_fts.rank, u.name
+            LIMIT ?
+            """,
+            (match, role, role, limit)
+        )
+
+    def begin(self, cursor, lock_table=None):
+        """Start a transaction; with lock_table, take the write lock up front."""
+        cursor.execute("BEGIN IMMEDIATE" if lock_table else "BEGIN")
+
+    def stream(self, conn):
+        """Return a cursor for reading a large result in fetchmany() batches."""
+        return conn.cursor()
+
+    def bulk_insert(self, cursor, table, columns, rows):
+        """Insert many rows into a table."""
+        placeholders = ", ".join("?" for _ in columns)
+        cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+    def vacuum(self, conn):
+        """Reclaim space freed by deletes."""
+        conn.execute("VACUUM")
+
+@lru_cache(maxsize=512)
+def _translate(query):
+    """Convert "?" placeholders to psycopg's "%s", escaping literal percent signs."""
+    return query.replace("%", "%%").replace("?", "%s")
+
+@lru_cache(maxsize=64)
+def _row_type(names):
+    """Row class for a result with the given column names."""
+    index = {name: i for i, name in enumerate(names)}
+
+    class Row(tuple):
+        """A result row, readable by index and by column name like sqlite3.Row."""
+        __slots__ = ()
+
+        def __getitem__(self, key):
+            if isinstance(key, str):
+                key = index[key]
+            return tuple.__getitem__(self, key)
+
+        def keys(self):
+            return list(names)
+
+    return Row
+
+def _mapping_row(cursor):
+    """psycopg row factory producing Row objects."""
+    names = tuple(column.name for column in cursor.description or ())
+    make = _row_type(names)
+    return lambda values: make(values)
+
+class _PostgresCursor:
+    """psycopg cursor accepting "?" placeholders and a row_factory of None for tuples."""
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self.connection = connection
+
+    @property
+    def row_factory(self):
+        return None if self._cursor.row_factory is tuple_row else _mapping_row
+
+    @row_factory.setter
+    def row_factory(self, factory):
+        self._cursor.row_factory = tuple_row if factory is None else _mapping_row
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, params=()):
+        self._cursor.execute(_translate(query), params)
+        return self
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(_translate(query), rows)
+        return self
+
+    def copy(self, statement):
+        return self._cursor.copy(statement)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+class _PostgresConnection:
+    """Pooled psycopg connection; close() returns it to the pool."""
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = pool.getconn()
+
+    def cursor(self, name=None):
+        return _PostgresCursor(self._conn.cursor(name=name) if name else self._conn.cursor(), self)
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def autocommit(self):
+        return self._conn.autocommit
+
+    @autocommit.setter
+    def autocommit(self, value):
+        self._conn.autocommit = value
+
+    def close(self):
+        if self._conn is None:
+            return
+        # Uncommitted work is discarded, as when closing an SQLite connection
+        self._conn.rollback()
+        self._pool.putconn(self._conn)
+        self._conn = None
+
+class PostgresBackend:
+    """A PostgreSQL server at config.DATABASE_URL, through a connection pool."""
+    name = "postgres"
+    # Dates and timestamps are stored as ISO strings in UTC, as SQLite stores them
+    types = {
+        "id": "BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY",
+        "date": "TEXT",
+        "timestamp": "TEXT",
+        "now": "(to_char(CURRENT_TIMESTAMP AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS'))",
+    }
+
+    def __init__(self):
+        if psycopg is None:
+            raise RuntimeError("DB_BACKEND=postgres requires the psycopg and psycopg_pool packages")
+        if not config.DATABASE_URL:
+            raise RuntimeError("DB_BACKEND=postgres requires DATABASE_URL")
+        self._pool = ConnectionPool(
+            config.DATABASE_URL,
+            min_size=config.DB_POOL_MIN_SIZE,
+            max_size=config.DB_POOL_MAX_SIZE,
+            kwargs={"row_factory": _mapping_row},
+            open=True,
+        )
+
+    def connect(self):
+        """Check a connection out of the pool."""
+        return _PostgresConnection(self._pool)
+
+    def init_database(self, cursor):
+        """Nothing to configure; durability settings belong to the server."""
+
+    def add_column(self, cursor, table, column, definition):
+        """Add a column to an existing table unless it is already there; returns True if it was added."""
+        cursor.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = ? AND column_name = ?",
+            (table, column)
+        )
+        if cursor.fetchone() is not None:
+            return False
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+
+    def init_user_search(self, cursor):
+        """Nothing to create; searches scan the users table (see search_users)."""
+
+    def search_users(self, cursor, columns, terms, role, limit):
+        """
+        Run a search for users containing every term, by name.
+
+        Uses ILIKE over the searched columns, which scans the users table;
+        that is fast enough for tens of thousands of users without requiring
+        the pg_trgm extension.
+        """
+        conditions = []
+        params = []
+        for term in terms:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append(
+                "(u.name || ' ' || u.username || ' ' || u.email || ' ' || COALESCE(u.department, '')) "
+                "ILIKE ? ESCAPE '\\'"
+            )
+            params.append(f"%{escaped}%")
+        cursor.execute(
+            f"""
+            SELECT {", ".join(f"u.{column}" for column in columns)}
+            FROM users u
+            WHERE {" AND ".join(conditions)} AND (CAST(? AS TEXT) IS NULL OR u.role = ?)
+            ORDER BY u.name
+            LIMIT ?
+            """,
+            (*params, role, role, limit)
+        )
+
+    def begin(self, cursor, lock_table=None):
+        """psycopg starts transactions implicitly; with lock_table, block its writers up front."""
+        if lock_table:
+            cursor.execute(f"LOCK TABLE {lock_table} IN SHARE ROW EXCLUSIVE MODE")
+
+    def stream(self, conn):
+        """Return a server-side cursor, so large results are not buffered by the client."""
+        return conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+
+    def bulk_insert(self, cursor, table, columns, rows):
+        """Insert many rows with COPY."""
+        with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+
+    def vacuum(self, conn):
+        """Reclaim space freed by deletes; VACUUM cannot run inside a transaction."""
+        conn.commit()
+        conn.autocommit = True
+        try:
+            conn.execute("VACUUM attendance")
+        finally:
+            conn.autocommit = False
+
+    def close(self):
+        self._pool.close()
+
+_BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "postgres": PostgresBackend,
+}
+_backend = None
+
+def get_backend():
+    """Return the configured storage backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        if config.DB_BACKEND not in _BACKENDS:
+            raise ValueError(f"Unknown DB_BACKEND: {config.DB_BACKEND}")
+        _backend = _BACKENDS[config.DB_BACKEND]()
+    return _backend
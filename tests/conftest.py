@@ -0,0 +1,57 @@
+"""
+Shared fixtures for the test suite.
+
+The application reads its configuration at import time, so the database
+(and the archive, cache and index files next to it) is pointed at a
+temporary directory before any application module is imported.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["ATTENDANCE_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="attendance-test-"), "attendance.db")
+os.environ["CACHE_ENABLED"] = "false"
+os.environ["SLOW_QUERY_LOG_ENABLED"] = "false"
+
+import itertools
+import pytest
+
+_usernames = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def history():
+    """
+    A seeded database: synthetic interns and attendance up to today, with
+    the months before the last two moved to the Parquet archive.
+
+    Returns:
+        dict: The dataset counts from benchmarks.synthetic.generate, plus
+        the archived months
+    """
+    from benchmarks import synthetic
+    import database as db
+
+    dataset = synthetic.generate(40, 150, seed=7)
+    dataset["archived"] = db.archive_closed_months(keep_months=2)
+    return dataset
+
+@pytest.fixture
+def new_intern():
+    """
+    A factory of interns with unique usernames.
+
+    Returns:
+        function: Takes an optional department and returns the new intern's user ID
+    """
+    import config
+    import database as db
+
+    def create(department="QA"):
+        username = f"test_intern_{next(_usernames)}"
+        assert db.add_user(username, "intern", config.ROLE_INTERN, username, f"{username}@example.com", department)
+        return db.verify_user(username, "intern").id
+
+    return create
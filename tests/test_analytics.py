@@ -0,0 +1,130 @@
+"""
+Engine parity of the report aggregations in analytics.py.
+
+Every aggregation is run on the sqlite and duckdb engines, over a history
+that is partly archived to Parquet, and compared with a pandas reference
+computed from database.get_all_attendance() records.
+"""
+from datetime import date, timedelta
+import pandas as pd
+import pytest
+import analytics
+import config
+import database as db
+import storage
+
+pytestmark = pytest.mark.usefixtures("history")
+
+FILTERS = [
+    pytest.param(None, None, None, id="all"),
+    pytest.param(60, None, None, id="60d"),
+    pytest.param(None, None, "IT", id="department"),
+    pytest.param(120, 30, "HR", id="window-department"),
+]
+
+def _range(days, until):
+    """Return (start_date, end_date) strings: days before today up to until days before today."""
+    today = date.today()
+    start = (today - timedelta(days=days)).isoformat() if days else None
+    end = (today - timedelta(days=until)).isoformat() if until else None
+    return start, end
+
+def _records(start_date, end_date, department):
+    """Attendance records of the range as a DataFrame, live and archived."""
+    frame = pd.DataFrame(db.get_all_attendance(start_date, end_date, department),
+                         columns=db.AttendanceRecord._fields)
+    return frame.assign(date=pd.to_datetime(frame["date"]))
+
+def _truncate(dates, bucket):
+    """Truncate a datetime Series to the first day of its bucket; weeks start on Monday."""
+    if bucket == "week":
+        return dates - pd.to_timedelta(dates.dt.weekday, unit="D")
+    if bucket == "month":
+        return dates.dt.to_period("M").dt.start_time
+    if bucket == "year":
+        return dates.dt.to_period("Y").dt.start_time
+    return dates
+
+def _reference_count(keys, start_date, end_date, department, bucket="day"):
+    """Count records by the given key columns in pandas."""
+    frame = _records(start_date, end_date, department)
+    frame = frame.assign(date=_truncate(frame["date"], bucket))
+    counts = frame.groupby(list(keys)).size().reset_index(name="Count")
+    labels = {"date": "Date", "status": "Status", "department": "Department"}
+    counts = counts.rename(columns=labels)
+    return counts.sort_values([labels[key] for key in keys]).reset_index(drop=True)
+
+def _assert_matches(result, expected):
+    """Compare an engine's result with the reference, ignoring how missing strings are typed."""
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(result.astype(object), expected.astype(object), check_dtype=False)
+
+def test_history_is_partly_archived(history):
+    assert history["archived"], "the fixture should archive closed months"
+    assert db.get_all_attendance(date.today().replace(day=1).isoformat()), "the current month should be live"
+
+@pytest.mark.parametrize("engine", analytics.ENGINES)
+@pytest.mark.parametrize("days, until, department", FILTERS)
+def test_status_distribution(engine, days, until, department):
+    start_date, end_date = _range(days, until)
+    _assert_matches(analytics.status_distribution(start_date, end_date, department, engine=engine),
+                    _reference_count(("status",), start_date, end_date, department))
+
+@pytest.mark.parametrize("engine", analytics.ENGINES)
+@pytest.mark.parametrize("days, until, department", FILTERS)
+def test_daily_by_status(engine, days, until, department):
+    start_date, end_date = _range(days, until)
+    _assert_matches(analytics.daily_by_status(start_date, end_date, department, engine=engine),
+                    _reference_count(("date", "status"), start_date, end_date, department))
+
+@pytest.mark.parametrize("engine", analytics.ENGINES)
+@pytest.mark.parametrize("bucket", ["week", "month", "year"])
+@pytest.mark.parametrize("days, until, department", FILTERS)
+def test_daily_by_status_buckets(engine, bucket, days, until, department):
+    start_date, end_date = _range(days, until)
+    _assert_matches(analytics.daily_by_status(start_date, end_date, department, engine=engine, bucket=bucket),
+                    _reference_count(("date", "status"), start_date, end_date, department, bucket))
+
+def test_postgres_bucket_sql_is_not_translated():
+    for expression in analytics._BUCKET_SQL["postgres"].values():
+        assert storage._translate(expression) == expression
+
+@pytest.mark.parametrize("engine", analytics.ENGINES)
+@pytest.mark.parametrize("days, until, department", FILTERS)
+def test_department_by_status(engine, days, until, department):
+    start_date, end_date = _range(days, until)
+    _assert_matches(analytics.department_by_status(start_date, end_date, department, engine=engine),
+                    _reference_count(("department", "status"), start_date, end_date, department))
+
+@pytest.mark.parametrize("engine", analytics.ENGINES)
+@pytest.mark.parametrize("days, until, department", FILTERS)
+def test_intern_summaries(engine, days, until, department):
+    start_date, end_date = _range(days, until)
+    frame = _records(start_date, end_date, department)
+    frame = frame.assign(date=frame["date"].dt.strftime("%Y-%m-%d"))
+    expected = frame.groupby("user_id").agg(
+        days=("id", "size"),
+        present=("status", lambda statuses: (statuses == config.STATUS_PRESENT).sum()),
+        late=("status", lambda statuses: (statuses == config.STATUS_LATE).sum()),
+        half_day=("status", lambda statuses: (statuses == config.STATUS_HALF_DAY).sum()),
+        first_date=("date", "min"),
+        last_date=("date", "max"),
+        name=("name", "first"),
+        department=("department", "first"),
+    ).reset_index()
+    expected = expected[["user_id", "name", "department", "days", "present", "late", "half_day",
+                         "first_date", "last_date"]]
+    expected.columns = ["User ID", "Name", "Department", "Days", "Present", "Late", "Half Day",
+                        "First Date", "Last Date"]
+    expected = expected.sort_values(["Name", "User ID"]).reset_index(drop=True)
+
+    _assert_matches(analytics.intern_summaries(start_date, end_date, department, engine=engine), expected)
+
+@pytest.mark.parametrize("function", ["status_distribution", "daily_by_status", "department_by_status",
+                                      "intern_summaries"])
+@pytest.mark.parametrize("days, until, department", FILTERS)
+def test_engines_return_identical_frames(function, days, until, department):
+    start_date, end_date = _range(days, until)
+    aggregate = getattr(analytics, function)
+    pd.testing.assert_frame_equal(aggregate(start_date, end_date, department, engine="sqlite"),
+                                  aggregate(start_date, end_date, department, engine="duckdb"))
@@ -0,0 +1,135 @@
+"""
+Check-ins and check-outs on the direct write path, and the statistics
+and statuses derived from them.
+"""
+from datetime import date, timedelta
+import pytest
+import config
+import database as db
+
+@pytest.fixture
+def day():
+    return db._previous_working_day(date.today()).isoformat()
+
+def _check_out_time(user_id, day):
+    (record,) = db.get_attendance(user_id, day, day)
+    return record.check_out_time
+
+def test_repeated_requests_are_deduplicated(new_intern, day):
+    user_id = new_intern()
+    assert db.record_check_in(user_id, day, f"{day} 09:00:00", request_key=f"{user_id}:in-1")
+    assert db.record_check_out(user_id, day, f"{day} 17:00:00", request_key=f"{user_id}:out-1")
+    deduplicated = db.get_action_counters()["check_out"]["deduplicated"]
+
+    # The same key within the window is answered from memory
+    assert db.record_check_out(user_id, day, f"{day} 17:05:00", request_key=f"{user_id}:out-1")
+    assert _check_out_time(user_id, day) == f"{day} 17:00:00"
+    assert db.get_action_counters()["check_out"]["deduplicated"] == deduplicated + 1
+    assert len(db.get_attendance(user_id, day, day)) == 1
+
+    # Another key goes through
+    assert db.record_check_out(user_id, day, f"{day} 17:10:00", request_key=f"{user_id}:out-2")
+    assert _check_out_time(user_id, day) == f"{day} 17:10:00"
+
+def test_deduplication_window_expires(new_intern, day, monkeypatch):
+    user_id = new_intern()
+    assert db.record_check_in(user_id, day, f"{day} 09:00:00")
+    assert db.record_check_out(user_id, day, f"{day} 17:00:00")
+    monkeypatch.setattr(config, "ACTION_DEDUP_WINDOW", 0)
+    assert db.record_check_out(user_id, day, f"{day} 17:05:00")
+    assert _check_out_time(user_id, day) == f"{day} 17:05:00"
+
+def test_failed_events_are_not_remembered(new_intern, day):
+    user_id = new_intern()
+    # Not checked in yet
+    assert db.record_check_out(user_id, day, f"{day} 17:00:00", request_key=f"{user_id}:early") is False
+    assert db.record_check_in(user_id, day, f"{day} 09:00:00")
+    assert db.record_check_out(user_id, day, f"{day} 17:00:00", request_key=f"{user_id}:early")
+    assert _check_out_time(user_id, day) == f"{day} 17:00:00"
+
+def _stats_row(user_id):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM intern_stats WHERE user_id = ?", (user_id,))
+    row = dict(cursor.fetchone())
+    conn.close()
+    del row["updated_at"]
+    return row
+
+def _last_week():
+    """Monday to Sunday of last week, as dates."""
+    monday = date.today() - timedelta(days=date.today().weekday() + 7)
+    return [monday + timedelta(days=offset) for offset in range(7)]
+
+def test_weekend_records_do_not_hide_absences(new_intern):
+    user_id = new_intern()
+    week = _last_week()
+    # Monday, Tuesday, Thursday and Saturday
+    for day in (week[0], week[1], week[3], week[5]):
+        assert db.record_check_in(user_id, day.isoformat(), f"{day} 09:00:00")
+
+    stats = db.get_intern_stats(user_id, as_of=week[6] + timedelta(days=1))
+    assert stats.days_recorded == 4
+    # Wednesday and Friday
+    assert stats.absent_count == 2
+
+def test_incremental_stats_match_a_recompute(new_intern):
+    user_id = new_intern()
+    week = _last_week()
+    for day, check_in, check_outs in [
+        (week[0], "09:00:00", ["17:00:00"]),
+        (week[1], "09:50:00", ["13:00:00", "18:00:00"]),  # Late, checked out twice
+        (week[2], "09:10:00", []),
+        (week[5], "09:00:00", ["12:00:00"]),  # Saturday
+    ]:
+        assert db.record_check_in(user_id, day.isoformat(), f"{day} {check_in}")
+        for i, check_out in enumerate(check_outs):
+            assert db.record_check_out(user_id, day.isoformat(), f"{day} {check_out}",
+                                       request_key=f"{user_id}:{day}:out-{i}")
+
+    incremental = _stats_row(user_id)
+    db.rebuild_intern_stats(user_id)
+    assert _stats_row(user_id) == incremental
+    assert incremental["late_count"] == 1
+    assert incremental["working_days_recorded"] == 3
+    assert incremental["worked_seconds_total"] == (8 + 8 + 3) * 3600 + 10 * 60
+
+    # A back-filled day is folded in too
+    assert db.record_check_in(user_id, week[3].isoformat(), f"{week[3]} 09:00:00")
+    backfilled = _stats_row(user_id)
+    db.rebuild_intern_stats(user_id)
+    assert _stats_row(user_id) == backfilled
+    assert backfilled["days_recorded"] == 5
+
+def test_recompute_applies_a_new_policy(new_intern):
+    department = "Policy Recompute"
+    user_id = new_intern(department)
+    week = _last_week()
+    for day, check_in in ((week[0], "09:20:00"), (week[1], "09:20:00"), (week[2], "09:05:00")):
+        assert db.record_check_in(user_id, day.isoformat(), f"{day} {check_in}")
+    assert {record.status for record in db.get_attendance(user_id)} == {config.STATUS_PRESENT}
+
+    # From Tuesday on, more than 10 minutes after 09:00 is late
+    db.add_policy("09:00", 10, week[1].isoformat(), department)
+    result = db.recompute_statuses(department=department)
+
+    assert result["changed"] == 1
+    statuses = {record.date: record.status for record in db.get_attendance(user_id)}
+    assert statuses == {week[0].isoformat(): config.STATUS_PRESENT, week[1].isoformat(): config.STATUS_LATE,
+                        week[2].isoformat(): config.STATUS_PRESENT}
+    stats = db.get_intern_stats(user_id)
+    assert (stats.present_count, stats.late_count) == (2, 1)
+
+def test_statuses_of_irregular_timestamps():
+    conn = db.get_db_connection()
+    rules = db._get_work_rules(conn.cursor())
+    conn.close()
+    times = ["2024-03-04 09:40:00", "2024-03-04T09:40:00", "2024-03-04 09:40:00.250", "2024-03-04 09:40",
+             "2024-03-04 09:10:00", "2024-03-04T09:10"]
+    statuses, _, _ = db._evaluate_statuses(rules, [0] * len(times), [None] * len(times), ["2024-03-04"] * len(times),
+                                           times)
+    assert statuses.tolist() == [db.determine_status(time) for time in times]
+    assert statuses.tolist() == [config.STATUS_LATE] * 4 + [config.STATUS_PRESENT] * 2
+
+    with pytest.raises(ValueError):
+        db._evaluate_statuses(rules, [0], [None], ["2024-03-04"], ["04/03/2024 09:40:00"])
@@ -0,0 +1,172 @@
+"""
+The PostgreSQL backend (DB_BACKEND=postgres) against a local server.
+
+Skipped unless psycopg and psycopg_pool are installed and a server answers
+at TEST_DATABASE_URL (default: postgresql://localhost/postgres). The tests
+run in a schema of their own, dropped afterwards.
+"""
+import os
+import re
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+import pandas as pd
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+pytest.importorskip("psycopg_pool")
+from psycopg.conninfo import make_conninfo
+
+import analytics
+import config
+import database as db
+import report
+import storage
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL", "postgresql://localhost/postgres")
+
+@pytest.fixture(scope="module")
+def postgres(tmp_path_factory):
+    """Point the application at a fresh schema on the PostgreSQL server; returns the schema name."""
+    try:
+        admin = psycopg.connect(DATABASE_URL, autocommit=True, connect_timeout=3)
+    except psycopg.OperationalError as e:
+        pytest.skip(f"no PostgreSQL server at TEST_DATABASE_URL: {e}")
+    schema = f"attendance_test_{uuid.uuid4().hex[:12]}"
+    admin.execute(f"CREATE SCHEMA {schema}")
+    directory = tmp_path_factory.mktemp("postgres")
+    try:
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(config, "DB_BACKEND", "postgres")
+            patch.setattr(config, "DATABASE_URL",
+                          make_conninfo(DATABASE_URL, options=f"-c search_path={schema}"))
+            patch.setattr(config, "ARCHIVE_DIR", str(directory / "archive"))
+            patch.setattr(config, "PRESENCE_INDEX_PATH", str(directory / "presence.npz"))
+            patch.setattr(storage, "_backend", None)
+            patch.setattr(analytics, "_sqlite_extension_available", None)
+            # Remembered check-ins of other tests' databases must not answer for this one
+            db._recent_actions.clear()
+            try:
+                db.init_db()
+                yield schema
+            finally:
+                if storage._backend is not None:
+                    storage._backend.close()
+                db._recent_actions.clear()
+    finally:
+        admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+@pytest.fixture(scope="module")
+def interns(postgres):
+    """Three interns in two departments, with ten working days of check-ins and check-outs."""
+    users = [("pg_asha", "Asha", "IT"), ("pg_bilal", "Bilal", "IT"), ("pg_chen", "Chen", "HR")]
+    for username, name, department in users:
+        assert db.add_user(username, "intern", config.ROLE_INTERN, name, f"{username}@example.com", department)
+    ids = {user.username: user.id for user in db.get_all_users(role=config.ROLE_INTERN)}
+
+    day = date.today() - timedelta(days=1)
+    days = []
+    while len(days) < 10:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day -= timedelta(days=1)
+    for i, day in enumerate(days):
+        # Asha is on time, Bilal is late every other day, Chen skips every third day
+        check_ins = {"pg_asha": "08:55:00", "pg_bilal": "09:45:00" if i % 2 else "09:10:00"}
+        if i % 3:
+            check_ins["pg_chen"] = "09:00:00"
+        for username, time in check_ins.items():
+            assert db.record_check_in(ids[username], day, f"{day} {time}")
+            assert db.record_check_out(ids[username], day, f"{day} 17:30:00")
+    return {"ids": ids, "start_date": days[-1], "end_date": days[0]}
+
+def test_schema(postgres):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()")
+    tables = {row[0] for row in cursor.fetchall()}
+    cursor.execute(
+        """
+        SELECT column_name, data_type, is_identity FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'attendance'
+        """
+    )
+    columns = {name: (data_type, identity) for name, data_type, identity in cursor.fetchall()}
+    conn.close()
+
+    assert {"users", "attendance", "attendance_policies", "schedules", "punch_events", "archive_manifest",
+            "meta", "intern_stats", "departments"} <= tables
+    assert columns["id"] == ("bigint", "YES")
+    # Dates and timestamps are ISO strings, as in SQLite
+    assert columns["date"][0] == "text"
+    assert columns["check_in_time"][0] == "text"
+    assert {"policy_id", "schedule_id", "open_since", "worked_seconds", "break_seconds"} <= set(columns)
+
+    # Creating the schema again changes nothing
+    db.init_db()
+    assert db.verify_user("admin", "admin123").role == config.ROLE_ADMIN
+
+def test_check_in_and_out(interns):
+    records = db.get_attendance(interns["ids"]["pg_bilal"], interns["start_date"], interns["end_date"])
+    assert len(records) == 10
+    assert Counter(record.status for record in records) == {config.STATUS_PRESENT: 5, config.STATUS_LATE: 5}
+    assert all(record.check_out_time.endswith("17:30:00") for record in records)
+
+    # The first check-in of a day is kept
+    day = interns["end_date"]
+    assert db.record_check_in(interns["ids"]["pg_asha"], day, f"{day} 11:00:00", request_key="retry")
+    (record,) = db.get_attendance(interns["ids"]["pg_asha"], day, day)
+    assert record.check_in_time == f"{day} 08:55:00"
+
+    user = db.get_user(interns["ids"]["pg_asha"])
+    assert re.fullmatch(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d", user.created_at)
+
+def test_report(interns, tmp_path):
+    task = {"name": "all", "department": None, "user_id": None, "start_date": interns["start_date"],
+            "end_date": interns["end_date"], "format": "csv", "directory": str(tmp_path)}
+    result = report.generate_report(task)
+
+    assert "error" not in result, result.get("error")
+    assert result["rows"] == len(db.get_all_attendance(interns["start_date"], interns["end_date"]))
+    assert result["interns"] == 3
+
+@pytest.mark.parametrize("engine", analytics.ENGINES)
+def test_analytics(interns, engine):
+    start_date, end_date = interns["start_date"], interns["end_date"]
+    records = db.get_all_attendance(start_date, end_date)
+
+    statuses = analytics.status_distribution(start_date, end_date, engine=engine)
+    assert dict(zip(statuses["Status"], statuses["Count"])) == Counter(record.status for record in records)
+
+    departments = analytics.department_by_status(start_date, end_date, engine=engine)
+    assert dict(zip(zip(departments["Department"], departments["Status"]), departments["Count"])) == Counter(
+        (record.department, record.status) for record in records)
+
+    daily = analytics.daily_by_status(start_date, end_date, "IT", engine=engine)
+    assert daily["Count"].sum() == sum(record.department == "IT" for record in records)
+
+    summaries = analytics.intern_summaries(start_date, end_date, engine=engine)
+    assert dict(zip(summaries["Name"], summaries["Days"])) == {"Asha": 10, "Bilal": 10, "Chen": 6}
+
+@pytest.mark.parametrize("bucket", ["week", "month", "year"])
+def test_daily_by_status_buckets(interns, bucket):
+    start_date, end_date = interns["start_date"], interns["end_date"]
+    starts = {
+        "week": lambda day: day - timedelta(days=day.weekday()),
+        "month": lambda day: day.replace(day=1),
+        "year": lambda day: day.replace(month=1, day=1),
+    }
+    expected = Counter((starts[bucket](date.fromisoformat(record.date)), record.status)
+                       for record in db.get_all_attendance(start_date, end_date))
+
+    for engine in analytics.ENGINES:
+        daily = analytics.daily_by_status(start_date, end_date, engine=engine, bucket=bucket)
+        assert dict(zip(zip(daily["Date"].dt.date, daily["Status"]), daily["Count"])) == expected
+
+def test_engines_agree(interns):
+    for function in (analytics.status_distribution, analytics.daily_by_status, analytics.department_by_status,
+                     analytics.intern_summaries):
+        pd.testing.assert_frame_equal(function(interns["start_date"], interns["end_date"], engine="sqlite"),
+                                      function(interns["start_date"], interns["end_date"], engine="duckdb"))
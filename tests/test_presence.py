@@ -0,0 +1,62 @@
+"""
+The presence bitmap index against the equivalent SQL over the attendance
+table, after writes that change rows the index has already seen.
+"""
+from datetime import date, timedelta
+import pytest
+import config
+import database as db
+from benchmarks.presence import sql_presence_counts
+
+DEPARTMENT = "Presence Index"
+
+@pytest.fixture
+def week():
+    """Monday to Friday of last week, as YYYY-MM-DD strings."""
+    monday = date.today() - timedelta(days=date.today().weekday() + 7)
+    return [(monday + timedelta(days=offset)).isoformat() for offset in range(5)]
+
+def _assert_index_matches_sql(week):
+    assert db.get_presence_counts(week[0], week[-1], DEPARTMENT) == sql_presence_counts(week[0], week[-1], DEPARTMENT)
+
+def test_check_in_filling_in_an_existing_row(new_intern, week):
+    user_id = new_intern(DEPARTMENT)
+    # A row without a check-in, e.g. entered by an administrator
+    conn = db.get_db_connection()
+    conn.execute("INSERT INTO attendance (user_id, date, status) VALUES (?, ?, ?)",
+                 (user_id, week[0], config.STATUS_PRESENT))
+    conn.commit()
+    conn.close()
+    assert db.record_check_in(user_id, week[1], f"{week[1]} 09:00:00")
+    _assert_index_matches_sql(week)
+
+    # Below the index's watermark now
+    assert db.record_check_in(user_id, week[0], f"{week[0]} 09:00:00")
+    _assert_index_matches_sql(week)
+    assert db.get_presence_counts(week[0], week[-1], DEPARTMENT)[user_id] == (2, 0)
+
+def test_refolded_punches(new_intern, week, monkeypatch):
+    monkeypatch.setattr(config, "PUNCH_LOG_ENABLED", True)
+    user_id = new_intern(DEPARTMENT)
+    assert db.record_events([{"action": "check_in", "user_id": user_id, "date": week[2],
+                              "time": f"{week[2]} 09:45:00", "request_key": f"{user_id}:late"}]) == [True]
+    db.derive_attendance()
+    _assert_index_matches_sql(week)
+
+    # An earlier punch arriving late makes the day Present
+    assert db.record_events([{"action": "check_in", "user_id": user_id, "date": week[2],
+                              "time": f"{week[2]} 08:55:00", "request_key": f"{user_id}:early"}]) == [True]
+    db.derive_attendance()
+    db.stop_punch_deriver()
+    _assert_index_matches_sql(week)
+    assert db.get_presence_counts(week[0], week[-1], DEPARTMENT)[user_id] == (1, 0)
+
+def test_recomputed_statuses(new_intern, week):
+    user_id = new_intern(DEPARTMENT)
+    assert db.record_check_in(user_id, week[3], f"{week[3]} 09:20:00")
+    _assert_index_matches_sql(week)
+
+    db.add_policy("09:00", 10, week[0], DEPARTMENT)
+    db.recompute_statuses(department=DEPARTMENT)
+    _assert_index_matches_sql(week)
+    assert db.get_presence_counts(week[0], week[-1], DEPARTMENT)[user_id] == (1, 1)
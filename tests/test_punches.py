@@ -0,0 +1,102 @@
+"""
+Derivation of attendance from the punch log (config.PUNCH_LOG_ENABLED).
+
+Punches are appended through database.record_events() and folded with
+database.derive_attendance(); the derived attendance row and the intern's
+statistics are checked against the sessions of the day.
+"""
+from datetime import date
+import pytest
+import config
+import database as db
+import punches
+
+@pytest.fixture
+def punch_log(monkeypatch):
+    monkeypatch.setattr(config, "PUNCH_LOG_ENABLED", True)
+    yield
+    db.stop_punch_deriver()
+
+@pytest.fixture
+def day():
+    return db._previous_working_day(date.today()).isoformat()
+
+def _punch(user_id, day, *punches_):
+    """Append (kind, HH:MM:SS) punches of a day, each with a request key of its own."""
+    results = db.record_events([
+        {"action": "check_in" if kind == punches.PUNCH_IN else "check_out", "user_id": user_id, "date": day,
+         "time": f"{day} {clock}", "request_key": f"{user_id}:{day}:{kind}:{clock}:{i}"}
+        for i, (kind, clock) in enumerate(punches_)
+    ])
+    assert results == [True] * len(punches_)
+
+def _attendance_row(user_id, day):
+    conn = db.get_db_connection()
+    row = conn.execute(
+        "SELECT check_in_time, check_out_time, open_since, worked_seconds, break_seconds, status "
+        "FROM attendance WHERE user_id = ? AND date = ?",
+        (user_id, day)
+    ).fetchone()
+    conn.close()
+    return tuple(row)
+
+def _worked_seconds_total(user_id):
+    conn = db.get_db_connection()
+    total = conn.execute("SELECT worked_seconds_total FROM intern_stats WHERE user_id = ?", (user_id,)).fetchone()[0]
+    conn.close()
+    return total
+
+def test_fold_ignores_duplicates_and_sorts_out_sessions():
+    state = punches.fold(None, [
+        (punches.PUNCH_IN, "2024-03-04 09:10:00"),
+        (punches.PUNCH_IN, "2024-03-04 09:10:00"),
+        (punches.PUNCH_OUT, "2024-03-04 12:00:00"),
+        (punches.PUNCH_OUT, "2024-03-04 12:00:00"),
+        (punches.PUNCH_IN, "2024-03-04 13:00:00"),
+        (punches.PUNCH_OUT, "2024-03-04 17:00:00"),
+    ])
+    assert state == punches.DayState("2024-03-04 09:10:00", "2024-03-04 17:00:00", None, 6 * 3600 + 50 * 60, 3600)
+
+def test_out_of_order_and_duplicate_punches(punch_log, new_intern, day):
+    user_id = new_intern()
+    _punch(user_id, day, ("in", "09:10:00"), ("out", "12:00:00"), ("out", "12:00:00"),
+           ("in", "13:00:00"), ("out", "17:00:00"))
+    db.derive_attendance()
+    # Arrives after the day was folded, earlier than its first punch
+    _punch(user_id, day, ("in", "08:30:00"))
+    db.derive_attendance()
+
+    assert _attendance_row(user_id, day) == (f"{day} 08:30:00", f"{day} 17:00:00", None, 7.5 * 3600, 3600,
+                                             config.STATUS_PRESENT)
+    stats = db.get_intern_stats(user_id)
+    assert stats.total_hours == 7.5
+    assert stats.days_recorded == 1
+
+    # A full recompute agrees with the stats kept while folding
+    db.rebuild_intern_stats(user_id)
+    assert _worked_seconds_total(user_id) == 7.5 * 3600
+
+def test_sessions_folded_across_passes(punch_log, new_intern, day):
+    user_id = new_intern()
+    _punch(user_id, day, ("in", "09:00:00"), ("out", "12:00:00"))
+    db.derive_attendance()
+    assert _worked_seconds_total(user_id) == 3 * 3600
+
+    # The break between the sessions is not worked time
+    _punch(user_id, day, ("in", "13:00:00"), ("out", "17:00:00"))
+    db.derive_attendance()
+    assert _worked_seconds_total(user_id) == 7 * 3600
+
+    db.rebuild_intern_stats(user_id)
+    assert _worked_seconds_total(user_id) == 7 * 3600
+
+def test_repeated_punches_are_appended_once(punch_log, new_intern, day):
+    user_id = new_intern()
+    event = {"action": "check_in", "user_id": user_id, "date": day, "time": f"{day} 09:00:00",
+             "request_key": f"{user_id}:in-1"}
+    assert db.record_events([event]) == [True]
+    assert db.record_events([dict(event, time=f"{day} 09:01:00")]) == [True]
+    assert len(db.get_punches(user_id, day)) == 1
+
+    assert db.record_events([dict(event, time=f"{day} 13:00:00", request_key=f"{user_id}:in-2")]) == [True]
+    assert len(db.get_punches(user_id, day)) == 2
@@ -0,0 +1,99 @@
+"""
+Schedule resolution (schedules.ScheduleIndex, database.get_schedule) and
+how check-ins are judged against the schedule in effect.
+"""
+from datetime import date, timedelta
+import numpy as np
+import pytest
+import config
+import database as db
+from schedules import ScheduleIndex
+
+MONDAY = "2024-03-04"
+
+def _schedule(id, start_time, effective_from, effective_to=None, department=None, user_id=None, weekday=None):
+    return db.Schedule(id, department, user_id, weekday, start_time, "17:00", effective_from, effective_to)
+
+def _resolve(index, user_id, department, day):
+    """The schedule ID from lookup(), checked against lookup_many()."""
+    schedule = index.lookup(user_id, department, day)
+    found = index.lookup_many(np.array([user_id]), np.array([department], dtype=object), np.array([day]))[0]
+    assert found == (-1 if schedule is None else index.schedules.index(schedule))
+    return schedule and schedule.id
+
+def test_most_specific_schedule_wins():
+    index = ScheduleIndex([
+        _schedule(1, "08:00", "2024-01-01", department="IT"),
+        _schedule(2, "08:30", "2024-01-01", department="IT", weekday=0),
+        _schedule(3, "09:30", "2024-01-01", user_id=7),
+        _schedule(4, "10:00", "2024-01-01", user_id=7, weekday=0),
+    ])
+    tuesday = "2024-03-05"
+    assert _resolve(index, 7, "IT", MONDAY) == 4
+    assert _resolve(index, 7, "IT", tuesday) == 3
+    assert _resolve(index, 8, "IT", MONDAY) == 2
+    assert _resolve(index, 8, "IT", tuesday) == 1
+    assert _resolve(index, 8, "HR", MONDAY) is None
+
+def test_effective_dates_are_inclusive():
+    index = ScheduleIndex([_schedule(1, "10:00", "2024-03-04", "2024-03-08", department="IT")])
+    assert _resolve(index, 1, "IT", "2024-03-03") is None
+    assert _resolve(index, 1, "IT", "2024-03-04") == 1
+    assert _resolve(index, 1, "IT", "2024-03-08") == 1
+    assert _resolve(index, 1, "IT", "2024-03-09") is None
+
+def test_later_schedule_is_laid_over_an_earlier_one():
+    index = ScheduleIndex([
+        _schedule(1, "09:00", "2024-01-01", department="IT"),
+        _schedule(2, "07:00", "2024-03-04", "2024-03-08", department="IT"),
+        _schedule(3, "07:30", "2024-03-04", "2024-03-05", department="IT"),
+    ])
+    assert _resolve(index, 1, "IT", "2024-03-01") == 1
+    # Same effective date: the higher ID wins
+    assert _resolve(index, 1, "IT", "2024-03-05") == 3
+    assert _resolve(index, 1, "IT", "2024-03-06") == 2
+    # The permanent schedule resumes after the temporary one ends
+    assert _resolve(index, 1, "IT", "2024-03-11") == 1
+
+def test_get_schedule(new_intern):
+    department = "Schedule Lookup"
+    user_id = new_intern(department)
+    other_id = new_intern(department)
+    for_department = db.add_schedule("08:00", "16:00", MONDAY, department=department)
+    for_intern = db.add_schedule("10:00", "18:00", MONDAY, "2024-03-31", user_id=user_id, weekday=0)
+
+    assert db.get_schedule(user_id, MONDAY).id == for_intern
+    assert db.get_schedule(user_id, "2024-03-05").id == for_department
+    assert db.get_schedule(user_id, "2024-04-01").id == for_department
+    assert db.get_schedule(other_id, MONDAY).id == for_department
+    assert db.get_schedule(new_intern("No Schedule"), MONDAY) is None
+
+@pytest.mark.parametrize("punch_log", [False, True], ids=["direct", "punch-log"])
+def test_lateness_is_judged_against_the_schedule(new_intern, monkeypatch, punch_log):
+    monkeypatch.setattr(config, "PUNCH_LOG_ENABLED", punch_log)
+    user_id = new_intern("Schedule Lateness")
+    monday = date.today() - timedelta(days=date.today().weekday() + 7)
+    week = [(monday + timedelta(days=offset)).isoformat() for offset in range(5)]
+    # Tuesday to Thursday start at 10:00; the default policy starts at 09:00
+    schedule_id = db.add_schedule("10:00", "18:00", week[1], week[3], user_id=user_id)
+
+    check_ins = {week[0]: "09:45:00", week[1]: "10:25:00", week[2]: "10:45:00", week[4]: "09:25:00"}
+    for day, time in check_ins.items():
+        assert db.record_check_in(user_id, day, f"{day} {time}", request_key=f"{user_id}:{day}")
+    if punch_log:
+        db.derive_attendance()
+        db.stop_punch_deriver()
+
+    records = {record.date: record for record in db.get_attendance(user_id)}
+    assert {day: record.status for day, record in records.items()} == {
+        week[0]: config.STATUS_LATE,     # 45 minutes after 09:00
+        week[1]: config.STATUS_PRESENT,  # 25 minutes after 10:00
+        week[2]: config.STATUS_LATE,     # 45 minutes after 10:00
+        week[4]: config.STATUS_PRESENT,  # Schedule ended; 25 minutes after 09:00
+    }
+    conn = db.get_db_connection()
+    schedule_ids = dict(conn.execute("SELECT date, schedule_id FROM attendance WHERE user_id = ?", (user_id,)))
+    conn.close()
+    assert schedule_ids == {week[0]: None, week[1]: schedule_id, week[2]: schedule_id, week[4]: None}
+    # Recomputing agrees with the statuses given at check-in
+    assert db.recompute_statuses(department="Schedule Lateness")["changed"] == 0
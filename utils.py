@@ -3,22 +3,29 @@ Utility functions for the attendance tracking system.
 """
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import streamlit as st
 from datetime import datetime, timedelta, timezone
 import base64
+import uuid
 from io import BytesIO
 import config
 import pytz
 
 def format_time(timestamp):
     """Format timestamp for display."""
-    if not timestamp:
+    if not timestamp or pd.isna(timestamp):
         return "-"
 
     if isinstance(timestamp, str):
-        try:
-            dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%H:%M"):
+            try:
+                dt = datetime.strptime(timestamp, fmt)
+                break
+            except ValueError:
+                continue
+        else:
             return timestamp
     else:
         dt = timestamp
@@ -45,6 +52,21 @@ def format_date(date_val):
     # Return as is for other types
     return str(date_val)
 
+def format_time_column(values):
+    """
+    Format a pyarrow column of timestamps (YYYY-MM-DD HH:MM:SS) for display, like format_time().
+
+    Formatting runs in Arrow compute; values that do not parse are kept as
+    they are and missing ones become "-".
+    """
+    parsed = pc.strptime(values, format="%Y-%m-%d %H:%M:%S", unit="s", error_is_null=True)
+    return pc.coalesce(pc.strftime(parsed, format="%I:%M %p"), values, pa.scalar("-"))
+
+def format_date_column(values):
+    """Format a pyarrow column of dates (YYYY-MM-DD) for display, like format_date()."""
+    parsed = pc.strptime(values, format="%Y-%m-%d", unit="s", error_is_null=True)
+    return pc.coalesce(pc.strftime(parsed, format="%b %d, %Y"), values, pa.scalar("-"))
+
 def get_date_range(days=30):
     """Get date range for filtering (default: last 30 days)."""
     end_date = datetime.now().date()
@@ -62,6 +84,23 @@ def get_indian_time():
 
     return india_time
 
+def get_request_key(action, date):
+    """
+    Get this session's idempotency key for an attendance action on a date.
+
+    The key stays the same across reruns, so double clicks and reruns of
+    the same action are deduplicated by the database layer.
+
+    Args:
+        action: The action name (check_in or check_out)
+        date: The attendance date (YYYY-MM-DD)
+
+    Returns:
+        str: The request key
+    """
+    keys = st.session_state.setdefault("request_keys", {})
+    return keys.setdefault(f"{action}:{date}", f"{action}:{uuid.uuid4()}")
+
 def export_to_excel(df, filename="export.xlsx"):
     """
     Export DataFrame to Excel file and provide download link.
@@ -215,6 +254,36 @@ def display_stat_card(value, label):
     </div>
     ''', unsafe_allow_html=True)
 
+def select_intern(search, label="Select Intern", key="intern"):
+    """
+    Display a search box and a picker of the interns matching it.
+
+    Only the top matches of the search text are fetched and offered, so the
+    picker stays small however many interns there are. Streamlit sends a
+    text input's value when Enter is pressed or the box loses focus, so the
+    matches refresh then rather than on every keystroke; the selectbox
+    itself narrows its options as you type.
+
+    Args:
+        search: Callable taking the search text and returning matching interns,
+            e.g. a wrapper of database.search_users
+        label: Label of the selectbox
+        key: Widget key prefix, unique per picker on a page
+
+    Returns:
+        User: The selected intern, or None if no intern matches
+    """
+    query = st.text_input("Search Interns", key=f"{key}_search",
+                          placeholder="Name, username, email or department, then press Enter")
+    matches = search(query)
+    if not matches:
+        st.info("No interns match your search.")
+        return None
+
+    options = {f"{intern['id']} - {intern['name']}": intern for intern in matches}
+    selected = st.selectbox(label, list(options), key=f"{key}_select")
+    return options[selected]
+
 def display_footer():
     """Display the footer."""
     st.markdown(f'''